@@ -13,7 +13,12 @@ consider the process for requiring the Milestone.
 Note the terminology difference at this layer vs. Data -- add/edit/get/remove
 """
 
-from . import data, exceptions, validators
+import base64
+from functools import partial
+
+from django.db import transaction
+
+from . import data, exceptions, propagation, transfer, validators
 
 # PRIVATE/INTERNAL FUNCTIONS
 
@@ -68,6 +73,56 @@ def _validate_user(user):
         )
 
 
+def _validate_user_ids(user_ids):
+    """ Batch validation helper; returns the user ids as ints, which is how they are stored """
+    if not validators.user_ids_are_valid(user_ids):
+        exceptions.raise_exception(
+            "User",
+            user_ids,
+            exceptions.InvalidUserException
+        )
+    return [int(user_id) for user_id in user_ids]
+
+
+def _validate_milestone_ids(milestone_ids):
+    """ Batch validation helper; returns the milestone ids as ints, which is how they are stored """
+    if not validators.milestone_ids_are_valid(milestone_ids):
+        exceptions.raise_exception(
+            "Milestone",
+            milestone_ids,
+            exceptions.InvalidMilestoneException
+        )
+    return [int(milestone_id) for milestone_id in milestone_ids]
+
+
+def _decode_cursor(cursor):
+    """ Page cursor validation helper; returns the primary key the page starts after """
+    if cursor is None:
+        return None
+    try:
+        after_pk = int(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii'))
+    except (AttributeError, ValueError):
+        after_pk = -1
+    if after_pk < 0:
+        exceptions.raise_exception("Page cursor", cursor, exceptions.InvalidPageException)
+    return after_pk
+
+
+def _validate_page_size(page_size):
+    """ Page size validation helper """
+    if page_size is not None and (not isinstance(page_size, int) or page_size < 1):
+        exceptions.raise_exception("Page size", page_size, exceptions.InvalidPageException)
+
+
+def _serialize_page(results, last_pk):
+    """ Builds a page of results, with the (opaque) cursor of the next page, if any """
+    return {
+        'results': results,
+        'next_cursor': base64.urlsafe_b64encode(str(last_pk).encode('ascii')).decode('ascii')
+        if last_pk is not None else None,
+    }
+
+
 # PUBLIC FUNCTIONS
 def get_milestone_relationship_types():
     """
@@ -76,22 +131,56 @@ def get_milestone_relationship_types():
     return data.fetch_milestone_relationship_types()
 
 
-def add_milestone(milestone, propagate=True):
+def add_milestone(milestone, propagate=True, background=False):
     """
     Passes a new milestone to the data layer for storage
 
     Arguments:
         milestone (dict): The milestone to persist
         propagate (bool): False to prevent reactivation of soft-deleted milestone relationships
+        background (bool): True to reactivate the relationships of a soft-deleted milestone in a
+            resumable background job (ref: propagate_milestone), rather than before returning
 
     Returns:
         dict: The persisted milestone dict
     """
     _validate_milestone_data(milestone)
-    milestone = data.create_milestone(milestone, propagate)
+    milestone = data.create_milestone(milestone, propagate, background)
+    if background and propagation.fetch_milestone_propagation(milestone['id']) is not None:
+        transaction.on_commit(partial(propagation.submit, milestone['id']))
     return milestone
 
 
+def propagate_milestone(milestone_id, max_batches=None, progress=None):
+    """
+    Runs (or resumes) the job which reactivates the relationships of a milestone
+    reactivated with add_milestone(..., background=True)
+
+    Arguments:
+        milestone_id (int): The id of the milestone
+        max_batches (int): Optional number of batches of records after which to stop
+        progress (callable): Optional callable invoked with the checkpoint after each batch
+
+    Returns:
+        dict: The last checkpoint of the job, with per-model 'counts' and a 'done' flag
+    """
+    return propagation.propagate_milestone(milestone_id, max_batches=max_batches, progress=progress)
+
+
+def get_milestone_propagation(milestone_id):
+    """
+    Retrieves the checkpoint of the pending propagation job of a milestone, or None
+    """
+    return propagation.fetch_milestone_propagation(milestone_id)
+
+
+def get_pending_milestone_propagations():
+    """
+    Retrieves the ids of the milestones with a pending propagation job
+    """
+    return propagation.fetch_pending_milestone_propagations()
+
+
 def edit_milestone(milestone):
     """
     Passes an updated milestone to the data layer for storage
@@ -118,14 +207,33 @@ def get_milestones(namespace):
     return data.fetch_milestones(milestone)
 
 
+def get_milestones_page(namespace, *, cursor=None, page_size=None):
+    """
+    Retrieves one page of the milestones in a namespace, in a stable order
+
+    Arguments:
+        namespace (str): Namespace of the milestones
+        cursor (str): Opaque cursor of the page to retrieve, as returned with the previous page
+        page_size (int): Optional number of milestones per page (default 100, at most 1000)
+
+    Returns:
+        dict: 'results' (list of milestone dicts) and 'next_cursor' (None on the last page)
+    """
+    _validate_milestone_data({'namespace': namespace})
+    after_pk = _decode_cursor(cursor)
+    _validate_page_size(page_size)
+    return _serialize_page(*data.fetch_milestones_page(namespace, after_pk=after_pk, page_size=page_size))
+
+
 def remove_milestone(milestone_id):
     """
-    Removes the specified milestone
+    Removes the specified milestone, along with its course, course content and user links
+    Returns a dict of model name -> number of records which were removed
     """
     milestone = {
         'id': milestone_id,
     }
-    data.delete_milestone(milestone)
+    return data.delete_milestone(milestone)
 
 
 def add_course_milestone(course_key, relationship, milestone):
@@ -172,6 +280,37 @@ def get_course_required_milestones(course_key, user):
     return required_milestones
 
 
+def get_course_required_milestones_for_users(course_key, user_ids):
+    """
+    A batch version of get_course_required_milestones, for many users at once (ex. gradebook exports)
+
+    The course's required milestones are retrieved once, and the collected milestones of the users
+    in one query per chunk of users (ref: MILESTONES_BATCH_SIZE)
+
+    Arguments:
+        course_key (CourseKey|str): CourseKey of the course
+        user_ids (list): List of user ids
+
+    Returns:
+        dict: Maps each user id (as an int) to the list of required milestone dicts the user has not
+        yet collected; each user gets copies of the dicts
+    """
+    _validate_course_key(course_key)
+    user_ids = _validate_user_ids(user_ids)
+    required_milestones = data.fetch_courses_milestones(
+        [course_key],
+        get_milestone_relationship_types()['REQUIRES']
+    )
+    users_milestone_ids = data.fetch_users_milestone_ids(
+        user_ids,
+        [milestone['id'] for milestone in required_milestones]
+    )
+    return {
+        user_id: [dict(milestone) for milestone in required_milestones if milestone['id'] not in collected]
+        for user_id, collected in users_milestone_ids.items()
+    }
+
+
 def get_course_milestones_fulfillment_paths(course_key, user):
     """
     Returns a collection composed of the possible fulfillment/collection options/opportunites
@@ -206,36 +345,62 @@ def get_course_milestones_fulfillment_paths(course_key, user):
     """
     _validate_course_key(course_key)
     _validate_user(user)
+    relationship_types = get_milestone_relationship_types()
 
     # Retrieve the outstanding milestones for this course, for this user
     required_milestones = data.fetch_courses_milestones(
         [course_key],
-        get_milestone_relationship_types()['REQUIRES'],
+        relationship_types['REQUIRES'],
         user
     )
+    if not required_milestones:
+        return {}
 
     # Build the set of fulfillment paths for the outstanding milestones
-    fulfillment_paths = {}
-    for milestone in required_milestones:
-        dict_key = f"{milestone['namespace']}.{milestone['name']}"
-        fulfillment_paths[dict_key] = {}
-        milestone_courses = data.fetch_milestone_courses(
-            milestone,
-            get_milestone_relationship_types()['FULFILLS']
-        )
-        if milestone_courses:
-            fulfillment_paths[dict_key]['courses'] = [
-                milestone['course_id'] for milestone in milestone_courses]
-        milestone_course_content = data.fetch_milestone_course_content(
-            milestone,
-            get_milestone_relationship_types()['FULFILLS']
-        )
-        if milestone_course_content:
-            fulfillment_paths[dict_key]['content'] = [
-                milestone['content_id'] for milestone in milestone_course_content]
+    # The fulfilling courses and content for the whole set are retrieved in one query apiece
+    dict_keys = {
+        milestone['id']: f"{milestone['namespace']}.{milestone['name']}"
+        for milestone in required_milestones
+    }
+    fulfillment_paths = {dict_key: {} for dict_key in dict_keys.values()}
+    for milestone in data.fetch_milestones_courses(required_milestones, relationship_types['FULFILLS']):
+        fulfillment_paths[dict_keys[milestone['id']]].setdefault('courses', []).append(milestone['course_id'])
+    for milestone in data.fetch_milestones_course_content(required_milestones, relationship_types['FULFILLS']):
+        fulfillment_paths[dict_keys[milestone['id']]].setdefault('content', []).append(milestone['content_id'])
     return fulfillment_paths
 
 
+def get_course_prerequisites(course_key):
+    """
+    Retrieves the transitive prerequisite chain of a course: the courses which fulfill the
+    milestones it requires, the courses which fulfill the milestones those require, and so on
+    Courses whose content fulfills a milestone count as fulfilling it
+
+    Arguments:
+        course_key (CourseKey|str): CourseKey of the course
+
+    Returns:
+        list: Course ids (as strings), nearest prerequisites first
+    """
+    _validate_course_key(course_key)
+    return data.fetch_course_prerequisites(course_key)
+
+
+def get_user_unlocked_courses(user):
+    """
+    Retrieves the courses with milestone requirements which a user has unlocked, along with those
+    the user would go on to unlock by completing them (i.e. by collecting the milestones they fulfill)
+
+    Arguments:
+        user (dict): Dict containing at least an 'id' key mapped to a user id
+
+    Returns:
+        list: Course ids (as strings), in the order they are unlocked
+    """
+    _validate_user(user)
+    return data.fetch_user_unlocked_courses(user)
+
+
 def get_courses_milestones(course_keys, relationship=None, user=None):
     """
     Retrieves the set of milestones for list of courses
@@ -256,6 +421,31 @@ def get_courses_milestones(course_keys, relationship=None, user=None):
     return milestones
 
 
+def get_courses_milestones_by_course(course_keys, relationship=None, user=None):
+    """
+    Retrieves the milestones of many courses at once (ex. a catalog or dashboard page)
+
+    Arguments:
+        course_keys (list): List of CourseKeys of the courses
+        relationship (str): Optional filter on milestone relationship type (e.g. 'requires')
+        user (dict): Optional filter, as for get_courses_milestones
+
+    Returns:
+        dict: Maps each course key (as a string) to a list of milestone dicts
+    """
+    [_validate_course_key(course_key) for course_key in course_keys]  # pylint: disable=expression-not-assigned
+    try:
+        milestones = data.fetch_courses_milestones_by_course(
+            course_keys=course_keys,
+            relationship=relationship,
+            user=user
+        )
+    except exceptions.InvalidMilestoneRelationshipTypeException:
+        milestones = {str(course_key): [] for course_key in course_keys}
+
+    return milestones
+
+
 def remove_course_milestone(course_key, milestone):
     """
     Removes the specfied milestone from the specified course
@@ -292,6 +482,27 @@ def add_course_content_milestone(course_key, content_key, relationship, mileston
     )
 
 
+def add_course_content_milestones(course_key, content_milestones):
+    """
+    Adds (or updates) many course-content-milestone links for one course at once (ex. course publish)
+
+    Arguments:
+        course_key (CourseKey|str): CourseKey of the course containing the content
+        content_milestones (list): List of (content_key, relationship, milestone, requirements) tuples,
+            with the same meaning as the arguments of add_course_content_milestone
+
+    Returns:
+        dict: Counts of 'created', 'reactivated', 'updated' and 'unchanged' links
+    """
+    _validate_course_key(course_key)
+    for content_key, _, milestone, requirements in content_milestones:
+        _validate_content_key(content_key)
+        _validate_milestone_data(milestone)
+        _validate_milestone_ids([milestone.get('id')])
+        _validate_course_content_milestone_requirements(requirements)
+    return data.create_course_content_milestones(course_key, content_milestones)
+
+
 def get_course_content_milestones(course_key=None, content_key=None, relationship=None, user=None):
     """
     Retrieves the set of milestones related to course content
@@ -322,6 +533,180 @@ def get_course_content_milestones(course_key=None, content_key=None, relationshi
     return milestones
 
 
+def get_course_content_milestones_by_content(course_key, content_keys, relationship=None, user=None):
+    """
+    Retrieves the milestones related to many pieces of course content at once (ex. a course outline)
+
+    Arguments:
+        course_key (CourseKey|str): CourseKey of the course containing the content
+        content_keys (list): List of UsageKeys of the content
+        relationship (str): The type of relationship that the content shares with the milestone (e.g. 'requires')
+        user (dict): Dict containing at least an 'id' key mapped to a user id
+
+    Returns:
+        dict: Maps each content key (as a string) to a list of milestone dicts
+    """
+    _validate_course_key(course_key)
+    for content_key in content_keys:
+        _validate_content_key(content_key)
+    try:
+        milestones = data.fetch_course_content_milestones_by_content(
+            course_key=course_key,
+            content_keys=content_keys,
+            relationship=relationship,
+            user=user
+        )
+    except exceptions.InvalidMilestoneRelationshipTypeException:
+        milestones = {str(content_key): [] for content_key in content_keys}
+
+    return milestones
+
+
+def get_course_content_milestones_page(  # pylint: disable=too-many-arguments
+    course_key=None, content_key=None, relationship=None, user=None, *, cursor=None, page_size=None
+):
+    """
+    Retrieves one page of the milestones related to course content, in a stable order
+
+    Arguments:
+        course_key (CourseKey|str): CourseKey of the course containing the content
+        content_key (UsageKey|str): UsageKey of the content
+        relationship (str): The type of relationship that the content shares with the milestone (e.g. 'requires')
+        user (dict): Dict containing at least an 'id' key mapped to a user id
+        cursor (str): Opaque cursor of the page to retrieve, as returned with the previous page
+        page_size (int): Optional number of milestones per page (default 100, at most 1000)
+
+    Returns:
+        dict: 'results' (list of milestone dicts) and 'next_cursor' (None on the last page)
+    """
+    if course_key is not None:
+        _validate_course_key(course_key)
+    if content_key is not None:
+        _validate_content_key(content_key)
+    after_pk = _decode_cursor(cursor)
+    _validate_page_size(page_size)
+    try:
+        page = data.fetch_course_content_milestones_page(
+            course_key=course_key,
+            content_key=content_key,
+            relationship=relationship,
+            user=user,
+            after_pk=after_pk,
+            page_size=page_size
+        )
+    except exceptions.InvalidMilestoneRelationshipTypeException:
+        page = ([], None)
+
+    return _serialize_page(*page)
+
+
+def iter_course_content_milestones(course_key=None, content_key=None, relationship=None, user=None,
+                                   batch_size=None):
+    """
+    Streams the set of milestones related to course content, for results too large to hold in memory
+
+    Arguments:
+        course_key (CourseKey|str): CourseKey of the course containing the content
+        content_key (UsageKey|str): UsageKey of the content
+        relationship (str): The type of relationship that the content shares with the milestone (e.g. 'requires')
+        user (dict): Dict containing at least an 'id' key mapped to a user id
+        batch_size (int): Optional number of rows read from the datastore at a time
+
+    Returns:
+        iterator: Milestone dicts, as listed by get_course_content_milestones
+    """
+    if course_key is not None:
+        _validate_course_key(course_key)
+    if content_key is not None:
+        _validate_content_key(content_key)
+    try:
+        return data.iter_course_content_milestones(
+            course_key=course_key,
+            content_key=content_key,
+            relationship=relationship,
+            user=user,
+            batch_size=batch_size
+        )
+    except exceptions.InvalidMilestoneRelationshipTypeException:
+        return iter(())
+
+
+def iter_milestone_courses(milestone, relationship=None, batch_size=None):
+    """
+    Streams the courses linked to the specified milestone
+
+    Arguments:
+        milestone (dict): Milestone dict containing at least an 'id' key
+        relationship (str): The type of relationship that the courses share with the milestone (e.g. 'fulfills')
+        batch_size (int): Optional number of rows read from the datastore at a time
+
+    Returns:
+        iterator: Milestone dicts, each with the 'course_id' of a linked course
+    """
+    _validate_milestone_data(milestone)
+    return data.iter_milestone_courses(milestone, relationship=relationship, batch_size=batch_size)
+
+
+def iter_milestone_course_content(milestone, relationship=None, batch_size=None):
+    """
+    Streams the course content linked to the specified milestone
+
+    Arguments:
+        milestone (dict): Milestone dict containing at least an 'id' key
+        relationship (str): The type of relationship that the content shares with the milestone (e.g. 'fulfills')
+        batch_size (int): Optional number of rows read from the datastore at a time
+
+    Returns:
+        iterator: Milestone dicts, each with the 'course_id' and 'content_id' of linked content
+    """
+    _validate_milestone_data(milestone)
+    return data.iter_milestone_course_content(milestone, relationship=relationship, batch_size=batch_size)
+
+
+def get_milestone_courses_page(milestone, relationship=None, *, cursor=None, page_size=None):
+    """
+    Retrieves one page of the courses linked to the specified milestone (ex. the courses which
+    fulfill it), in a stable order
+
+    Arguments:
+        milestone (dict): Milestone dict containing at least an 'id' key
+        relationship (str): The type of relationship that the courses share with the milestone (e.g. 'fulfills')
+        cursor (str): Opaque cursor of the page to retrieve, as returned with the previous page
+        page_size (int): Optional number of courses per page (default 100, at most 1000)
+
+    Returns:
+        dict: 'results' (list of milestone dicts, each with a 'course_id') and 'next_cursor'
+    """
+    _validate_milestone_data(milestone)
+    after_pk = _decode_cursor(cursor)
+    _validate_page_size(page_size)
+    return _serialize_page(*data.fetch_milestone_courses_page(
+        milestone, relationship=relationship, after_pk=after_pk, page_size=page_size
+    ))
+
+
+def get_milestone_course_content_page(milestone, relationship=None, *, cursor=None, page_size=None):
+    """
+    Retrieves one page of the course content linked to the specified milestone (ex. the content
+    which fulfills it), in a stable order
+
+    Arguments:
+        milestone (dict): Milestone dict containing at least an 'id' key
+        relationship (str): The type of relationship that the content shares with the milestone (e.g. 'fulfills')
+        cursor (str): Opaque cursor of the page to retrieve, as returned with the previous page
+        page_size (int): Optional number of content links per page (default 100, at most 1000)
+
+    Returns:
+        dict: 'results' (list of milestone dicts, each with a 'course_id' and 'content_id') and 'next_cursor'
+    """
+    _validate_milestone_data(milestone)
+    after_pk = _decode_cursor(cursor)
+    _validate_page_size(page_size)
+    return _serialize_page(*data.fetch_milestone_course_content_page(
+        milestone, relationship=relationship, after_pk=after_pk, page_size=page_size
+    ))
+
+
 def remove_course_content_milestone(course_key, content_key, milestone):
     """
     Removes the specified milestone from the specified course content module
@@ -345,6 +730,38 @@ def add_user_milestone(user, milestone):
     data.create_user_milestone(user, milestone)
 
 
+def add_user_milestones(users, milestone):
+    """
+    Adds a milestone to many users at once (ex. awarding a milestone to a cohort after a regrade)
+
+    Arguments:
+        users (list): List of dicts, each containing at least an 'id' key mapped to a user id
+        milestone (dict): The milestone to award, which must include its 'id'
+
+    Returns:
+        dict: Counts of 'created', 'reactivated' and 'unchanged' User-Milestone relationships
+    """
+    return add_users_milestones(users, [milestone])
+
+
+def add_users_milestones(users, milestones):
+    """
+    Adds every one of the specified milestones to every one of the specified users
+
+    Arguments:
+        users (list): List of dicts, each containing at least an 'id' key mapped to a user id
+        milestones (list): List of milestone dicts, each including its 'id'
+
+    Returns:
+        dict: Counts of 'created', 'reactivated' and 'unchanged' User-Milestone relationships
+    """
+    [_validate_user(user) for user in users]  # pylint: disable=expression-not-assigned
+    _validate_user_ids([user['id'] for user in users])
+    [_validate_milestone_data(milestone) for milestone in milestones]  # pylint: disable=expression-not-assigned
+    _validate_milestone_ids([milestone.get('id') for milestone in milestones])
+    return data.create_user_milestones(users, milestones)
+
+
 def get_user_milestones(user, namespace):
     """
     Retrieves the set of milestones for a given user
@@ -361,7 +778,48 @@ def user_has_milestone(user, milestone):
     """
     _validate_user(user)
     _validate_milestone_data(milestone)
-    return bool(data.fetch_user_milestones(user, milestone))
+    return data.fetch_user_has_milestone(user, milestone)
+
+
+def users_have_milestone(user_ids, milestone):
+    """
+    A batch version of user_has_milestone, for checking many users at once (ex. reports)
+
+    Arguments:
+        user_ids (list): List of user ids
+        milestone (dict): The milestone to check for, which must include its 'id'
+
+    Returns:
+        dict: Maps each user id (as an int) to True if the user has collected the milestone, otherwise False
+    """
+    user_ids = _validate_user_ids(user_ids)
+    _validate_milestone_data(milestone)
+    if not milestone.get('id'):
+        exceptions.raise_exception("Milestone", milestone, exceptions.InvalidMilestoneException)
+    milestone_id = _validate_milestone_ids([milestone['id']])[0]
+    users_milestone_ids = data.fetch_users_milestone_ids(user_ids, [milestone_id])
+    return {user_id: milestone_id in collected for user_id, collected in users_milestone_ids.items()}
+
+
+def users_have_milestones(user_ids, milestone_ids):
+    """
+    A matrix version of user_has_milestone, for checking many users against many milestones
+
+    Arguments:
+        user_ids (list): List of user ids
+        milestone_ids (list): List of milestone ids
+
+    Returns:
+        dict: Maps each user id to a dict which maps each milestone id to True if the user
+        has collected the milestone, otherwise False (ids as ints)
+    """
+    user_ids = _validate_user_ids(user_ids)
+    milestone_ids = _validate_milestone_ids(milestone_ids)
+    users_milestone_ids = data.fetch_users_milestone_ids(user_ids, milestone_ids)
+    return {
+        user_id: {milestone_id: milestone_id in collected for milestone_id in milestone_ids}
+        for user_id, collected in users_milestone_ids.items()
+    }
 
 
 def remove_user_milestone(user, milestone):
@@ -377,15 +835,45 @@ def remove_course_references(course_key):
     """
     Removes course references from application state
     See edx-platform/lms/djangoapps/courseware/management/commands/delete_course_references.py
+    Returns a dict of model name -> number of records which were removed
     """
     _validate_course_key(course_key)
-    data.delete_course_references(course_key)
+    return data.delete_course_references(course_key)
 
 
 def remove_content_references(content_key):
     """
     Removes content references from application state
     See edx-platform/cms/djangoapps/contentstore/views/entrance_exam.py:_delete_entrance_exam
+    Returns a dict of model name -> number of records which were removed
     """
     _validate_content_key(content_key)
-    data.delete_content_references(content_key)
+    return data.delete_content_references(content_key)
+
+
+def export_milestone_records(batch_size=None):
+    """
+    Streams the whole milestone graph (milestones and their course, course content and
+    user links, active or not) as plain dicts, for import_milestone_records
+
+    Arguments:
+        batch_size (int): Optional number of rows read from the datastore at a time
+
+    Returns:
+        generator: One dict per row, with a 'model' key naming its model
+    """
+    return transfer.fetch_milestone_records(batch_size=batch_size)
+
+
+def import_milestone_records(records, batch_size=None):
+    """
+    Writes records as streamed by export_milestone_records, overwriting the rows which exist
+
+    Arguments:
+        records (iterable): Record dicts; milestones must come before the links which refer to them
+        batch_size (int): Optional number of records of a model written at a time
+
+    Returns:
+        dict: Maps each model name to the number of records written
+    """
+    return transfer.create_milestone_records(records, batch_size=batch_size)
@@ -0,0 +1,19 @@
+"""
+Milestones Django application configuration
+"""
+
+from django.apps import AppConfig
+
+
+class MilestonesConfig(AppConfig):
+    """
+    Application configuration for the Milestones app
+    """
+    name = 'milestones'
+    verbose_name = 'Milestones'
+
+    def ready(self):
+        """
+        Connects the signal handlers declared in receivers.py
+        """
+        from . import receivers  # pylint: disable=import-outside-toplevel,unused-import
@@ -0,0 +1,542 @@
+# pylint: disable=no-member
+"""
+Caching primitives used by the data layer (data.py and its helper modules) to avoid repeated
+round-trips to the backend datastore for state which rarely changes.
+
+The following caches live here:
+* Process-local registries for effectively-static rows (relationship types)
+* Versioned entries in the shared Django cache for per-course data; writers
+  bump a course's version, which orphans every entry built under the old one
+* Versioned per-user entries in the shared Django cache for collected milestones;
+  writers bump a user's version, and milestone-wide changes bump a global generation
+* A process-local index of the courses which have any active milestone links,
+  so that lookups for the (many) courses without milestones can be answered
+  without touching the backend datastore
+* A process-local course prerequisite graph (ref: graph.py)
+* The index and the graph are kept in step with other processes through a log of
+  the courses whose links changed, so that a write only causes the links of the
+  courses it touched to be reloaded
+* An opt-in, request-scoped memo (ref: middleware.py) which is discarded at the
+  end of the request, or as soon as the request writes milestone state
+
+Settings:
+* MILESTONES_CACHE_ALIAS: Django cache alias to use (default: 'default')
+* MILESTONES_CACHE_TIMEOUT: seconds to keep versioned entries (default: 1 day)
+
+This module should only be called directly by the data layer (data.py, queries.py,
+transfer.py and propagation.py), receivers.py and middleware.py, in order to maintain
+the intended data layer abstractions/contracts.
+"""
+
+import contextlib
+import contextvars
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models, transaction
+
+from . import models as internal
+
+CACHE_KEY_PREFIX = 'milestones'
+DEFAULT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Process-local registry of active MilestoneRelationshipType records, keyed by name
+_relationship_types = {}
+
+# Process-local index of course ids with active milestone links:
+# (links version, links log epoch, links log position, frozenset)
+_course_index = None  # pylint: disable=invalid-name
+# Hits are lookups answered by the index alone, misses are those which fell through to the caches
+_course_index_stats = {'hits': 0, 'misses': 0, 'updates': 0, 'rebuilds': 0}
+# Changed courses reloaded to bring the index up to date, before rebuilding it instead
+COURSE_INDEX_MAX_UPDATE = 1000
+
+# Process-local prerequisite graph: (links log epoch, links log position, graph)
+_prerequisite_graph = None  # pylint: disable=invalid-name
+_prerequisite_graph_stats = {'builds': 0, 'updates': 0}
+
+# Slots probed by a writer past the last known end of the links log, before it starts a new epoch
+LINKS_LOG_PROBES = 16
+# Slots read to bring a graph up to date, before giving up and rebuilding it instead
+LINKS_LOG_MAX_READ = 1000
+
+# Request-scoped memo; None unless a request_cache() block is active
+_request_cache = contextvars.ContextVar('milestones_request_cache', default=None)
+
+
+def _load_relationship_types():
+    """
+    (Re)populates the relationship type registry from the backend datastore
+    """
+    global _relationship_types  # pylint: disable=global-statement
+    _relationship_types = {
+        relationship_type.name: relationship_type
+        for relationship_type in internal.MilestoneRelationshipType.objects.filter(active=True)
+    }
+
+
+def get_relationship_type(name):
+    """
+    Retrieves an active MilestoneRelationshipType object by name from the process-local registry
+    The registry is loaded lazily and reloaded once on a miss, to pick up types created elsewhere
+    Returns None if no active relationship type exists with the specified name
+    """
+    relationship_type = _relationship_types.get(name)
+    if relationship_type is None:
+        _load_relationship_types()
+        relationship_type = _relationship_types.get(name)
+    return relationship_type
+
+
+def clear_relationship_types():
+    """
+    Empties the relationship type registry (ref: receivers.py)
+    """
+    global _relationship_types  # pylint: disable=global-statement
+    _relationship_types = {}
+
+
+# SHARED (DJANGO) CACHE
+def _get_cache():
+    """
+    Returns the Django cache backend configured for this app
+    """
+    return caches[getattr(settings, 'MILESTONES_CACHE_ALIAS', 'default')]
+
+
+def _get_timeout():
+    """
+    Returns the lifetime of versioned cache entries, in seconds
+    """
+    return getattr(settings, 'MILESTONES_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT)
+
+
+def _make_key(*parts):
+    """
+    Builds a cache key which is safe for every backend (ex. memcached's length/charset limits)
+    Free-form parts such as course keys are hashed rather than embedded
+    """
+    digest = hashlib.md5('\n'.join(str(part) for part in parts).encode('utf-8'), usedforsecurity=False).hexdigest()
+    return f'{CACHE_KEY_PREFIX}.{parts[0]}.{digest}'
+
+
+def _new_version():
+    """
+    Generates a version token which cannot collide with one issued before an eviction
+    """
+    return uuid.uuid4().hex
+
+
+def _issue_version(key):
+    """
+    Issues a fresh version token for the specified key, unless one was issued concurrently
+    Returns the token in effect for the key
+    """
+    cache = _get_cache()
+    version = _new_version()
+    # Never clobber a token issued concurrently by a writer
+    if not cache.add(key, version, timeout=None):
+        version = cache.get(key, version)
+    return version
+
+
+def _course_version_key(course_id):
+    """
+    Cache key holding the current version token for a course
+    """
+    return _make_key('course_version', course_id)
+
+
+def get_course_versions(course_ids):
+    """
+    Retrieves the current version token for each of the specified course ids
+    Courses without a token (never written, or evicted) are issued a fresh one, all in one
+    write, so that the round-trips do not grow with the number of courses
+    Returns a dict of course_id -> version
+    """
+    cache = _get_cache()
+    keys = {course_id: _course_version_key(course_id) for course_id in course_ids}
+    versions = cache.get_many(list(keys.values()))
+    issued = {key: _new_version() for key in keys.values() if not versions.get(key)}
+    if issued:
+        # Overwriting a token issued concurrently only orphans entries, so this need not be atomic;
+        # re-reading the tokens makes racing readers settle on whichever token was written last
+        cache.set_many(issued, timeout=None)
+        versions.update(issued)
+        versions.update(cache.get_many(list(issued)))
+    return {course_id: versions[key] for course_id, key in keys.items()}
+
+
+def invalidate_courses(course_ids):
+    """
+    Bumps the version token of each specified course, orphaning all entries cached for it
+    The bump is repeated once the surrounding transaction commits, so that a reader racing
+    the write cannot re-cache the pre-commit state under the new version
+    """
+    course_ids = {str(course_id) for course_id in course_ids}
+    if not course_ids:
+        return
+    invalidate_course_index(course_ids)
+
+    def _bump():
+        _get_cache().set_many(
+            {_course_version_key(course_id): _new_version() for course_id in course_ids},
+            timeout=None
+        )
+
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def _links_version_key():
+    """
+    Cache key holding the version token of the course index, shared by all processes
+    """
+    return _make_key('links_version')
+
+
+def _fetch_indexed_courses(course_ids=None):
+    """
+    Queries which of the specified course ids (None: any course) have active milestone links
+    """
+    querysets = []
+    for model in (internal.CourseMilestone, internal.CourseContentMilestone):
+        queryset = model.objects.filter(active=models.Value(True))
+        if course_ids is not None:
+            queryset = queryset.filter(
+                course_id_hash__in=[internal.key_hash(course_id) for course_id in course_ids],
+                course_id__in=course_ids,
+            )
+        querysets.append(queryset.values_list('course_id', flat=True))
+    return frozenset(querysets[0].union(querysets[1]))
+
+
+def _get_course_index():
+    """
+    Returns the set of course ids which have any active CourseMilestone/CourseContentMilestone
+    If the links version has moved on, the process-local index is brought up to date by reloading
+    the links of the courses named in the links log since, or rebuilt (one scan) if the log
+    cannot tell which courses changed
+    """
+    global _course_index  # pylint: disable=global-statement
+    key = _links_version_key()
+    # The version and the log are read before the links, so a write racing the load is applied again later
+    version = _get_cache().get(key) or _issue_version(key)
+    index = _course_index
+    if index is not None and index[0] == version:
+        return index[3]
+    epoch, position, course_ids = _read_links_log(*(index[1:3] if index else (None, 0)))
+    if index is None or course_ids is None or len(course_ids) > COURSE_INDEX_MAX_UPDATE:
+        courses = _fetch_indexed_courses()
+        _course_index_stats['rebuilds'] += 1
+    elif course_ids:
+        courses = index[3].difference(course_ids).union(_fetch_indexed_courses(sorted(course_ids)))
+        _course_index_stats['updates'] += 1
+    else:
+        courses = index[3]
+    _course_index = (version, epoch, position, courses)
+    return courses
+
+
+def filter_indexed_courses(course_ids):
+    """
+    Returns the specified course ids, less those known to have no active milestone links
+    The index never yields false negatives, as long as every process shares the cache which
+    carries the links version and log: each link write is applied to it before its next use
+    """
+    index = _get_course_index()
+    indexed = [course_id for course_id in course_ids if course_id in index]
+    _course_index_stats['hits'] += len(course_ids) - len(indexed)
+    _course_index_stats['misses'] += len(indexed)
+    return indexed
+
+
+def get_course_index_stats():
+    """
+    Returns the hit/miss/update/rebuild counters of the course index for this process
+    """
+    return dict(_course_index_stats)
+
+
+def invalidate_course_index(course_ids=None):
+    """
+    Logs the ids of the courses whose links changed (None if they are not known), then bumps the
+    links version, causing every process to apply the log to its course index on next use (the
+    prerequisite graph reads the log on every use, ref: get_prerequisite_graph)
+    As with course versions, the bump is repeated once the surrounding transaction commits
+    """
+    clear_request_cache()
+    if course_ids is not None:
+        course_ids = sorted({str(course_id) for course_id in course_ids})
+
+    def _bump():
+        # A reader which sees the new version must find the entry in the log
+        _log_course_links(course_ids)
+        _get_cache().set(_links_version_key(), _new_version(), timeout=None)
+
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def clear_course_index():
+    """
+    Discards the course index of this process, along with its counters
+    """
+    global _course_index  # pylint: disable=global-statement
+    _course_index = None
+    _course_index_stats.update(hits=0, misses=0, updates=0, rebuilds=0)
+
+
+# LINKS LOG
+def _links_log_epoch_key():
+    """
+    Cache key holding the current epoch of the links log; a new epoch invalidates every graph
+    """
+    return _make_key('links_log_epoch')
+
+
+def _links_log_head_key(epoch):
+    """
+    Cache key holding the position of the last slot known to be written in the links log
+    """
+    return _make_key('links_log_head', epoch)
+
+
+def _links_log_key(epoch, position):
+    """
+    Cache key of a slot of the links log, holding the ids of the courses changed by one write
+    """
+    return _make_key('links_log', epoch, position)
+
+
+def _start_links_log_epoch():
+    """
+    Starts a new (empty) epoch of the links log, returning it
+    """
+    epoch = _new_version()
+    cache = _get_cache()
+    cache.set(_links_log_head_key(epoch), 0, timeout=_get_timeout())
+    cache.set(_links_log_epoch_key(), epoch, timeout=None)
+    return epoch
+
+
+def _get_links_log_epoch():
+    """
+    Retrieves the current epoch of the links log, starting one if necessary
+    """
+    epoch = _get_cache().get(_links_log_epoch_key())
+    return epoch or _start_links_log_epoch()
+
+
+def _log_course_links(course_ids):
+    """
+    Appends the ids of the courses whose links changed (None: any course) to the links log
+    Slots are claimed with add(), so that concurrent writers cannot overwrite one another's;
+    a writer which cannot claim a slot (ex. after an eviction) starts a new epoch instead
+    """
+    cache = _get_cache()
+    epoch = _get_links_log_epoch()
+    head = cache.get(_links_log_head_key(epoch))
+    if head is not None:
+        for position in range(head + 1, head + 1 + LINKS_LOG_PROBES):
+            if cache.add(_links_log_key(epoch, position), course_ids, timeout=_get_timeout()):
+                cache.set(_links_log_head_key(epoch), position, timeout=_get_timeout())
+                return
+    _start_links_log_epoch()
+
+
+def _read_links_log(epoch, position):
+    """
+    Reads the links log past the specified position of the specified epoch
+    Returns an (epoch, position, course_ids) tuple: the position reached, and the ids of the
+    courses changed since, or None if they cannot be told (new epoch, evicted or unknown entries)
+    """
+    cache = _get_cache()
+    current = _get_links_log_epoch()
+    head = cache.get(_links_log_head_key(current))
+    if head is None:
+        return _start_links_log_epoch(), 0, None
+    if current != epoch or head - position > LINKS_LOG_MAX_READ:
+        return current, head, None
+
+    # Slots may be written past the head, which is only a hint
+    keys = [_links_log_key(current, slot) for slot in range(position + 1, max(head, position) + LINKS_LOG_PROBES + 1)]
+    entries = cache.get_many(keys)
+    found = [index for index, key in enumerate(keys) if key in entries]
+    last = position + 1 + found[-1] if found else position
+    # Slots are claimed in order, so a missing slot before the last one (or the head) was evicted
+    if len(found) != last - position or last < head:
+        return current, max(head, last), None
+    course_ids = set()
+    for key in keys[:len(found)]:
+        if entries[key] is None:
+            return current, last, None
+        course_ids.update(entries[key])
+    return current, last, course_ids
+
+
+def get_prerequisite_graph(build, update):
+    """
+    Returns the prerequisite graph of this process, kept in step with the links log:
+    build() returns a new graph, update(graph, course_ids) one in which the links of the specified
+    courses are reloaded, for when the log tells which courses changed since the graph was built
+    """
+    global _prerequisite_graph  # pylint: disable=global-statement
+    state = _prerequisite_graph
+    # The log is read before the graph is loaded, so a write racing the load is applied again later
+    epoch, position, course_ids = _read_links_log(*(state[:2] if state else (None, 0)))
+    if state is None or course_ids is None:
+        graph = build()
+        _prerequisite_graph_stats['builds'] += 1
+    elif course_ids:
+        graph = update(state[2], course_ids)
+        _prerequisite_graph_stats['updates'] += 1
+    else:
+        graph = state[2]
+    _prerequisite_graph = (epoch, position, graph)
+    return graph
+
+
+def get_prerequisite_graph_stats():
+    """
+    Returns the build/update counters of the prerequisite graph for this process
+    """
+    return dict(_prerequisite_graph_stats)
+
+
+def clear_prerequisite_graph():
+    """
+    Discards the prerequisite graph of this process, along with its counters
+    """
+    global _prerequisite_graph  # pylint: disable=global-statement
+    _prerequisite_graph = None
+    _prerequisite_graph_stats.update(builds=0, updates=0)
+
+
+def _user_milestones_generation_key():
+    """
+    Cache key holding the current generation token shared by all per-user entries
+    """
+    return _make_key('user_milestones_generation')
+
+
+def _user_version_key(user_id):
+    """
+    Cache key holding the current version token for a user
+    """
+    return _make_key('user_version', user_id)
+
+
+def user_milestones_key(user_id):
+    """
+    Cache key for the serialized milestones collected by a user, under the current generation
+    and user version tokens
+    As with course versions, the key must be built before querying the backend datastore, so that
+    an entry built from the pre-write state is stored under a version the writer has bumped
+    """
+    keys = [_user_milestones_generation_key(), _user_version_key(user_id)]
+    tokens = _get_cache().get_many(keys)
+    versions = [tokens.get(key) or _issue_version(key) for key in keys]
+    return _make_key('user_milestones', user_id, *versions)
+
+
+def invalidate_users(user_ids):
+    """
+    Bumps the version token of each specified user, orphaning their collected-milestone entries
+    As with course versions, the bump is repeated once the surrounding transaction commits
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    clear_request_cache()
+
+    def _bump():
+        _get_cache().set_many({_user_version_key(user_id): _new_version() for user_id in user_ids}, timeout=None)
+
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def invalidate_all_users():
+    """
+    Orphans the collected-milestone entries of every user, by way of a new generation token
+    Used for milestone-wide changes, which may touch any number of users
+    """
+    clear_request_cache()
+
+    def _bump():
+        _get_cache().set(_user_milestones_generation_key(), _new_version(), timeout=None)
+
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def course_milestones_key(course_id, relationship, version):
+    """
+    Cache key for the serialized milestones linked to a course, for a given relationship
+    """
+    return _make_key('course_milestones', course_id, relationship or '*', version)
+
+
+def get_entry(key):
+    """
+    Retrieves the specified entry from the shared cache, or None if it is not present
+    """
+    return _get_cache().get(key)
+
+
+def set_entry(key, value):
+    """
+    Stores the specified entry in the shared cache
+    """
+    _get_cache().set(key, value, timeout=_get_timeout())
+
+
+def get_many(keys):
+    """
+    Retrieves the specified entries from the shared cache
+    Returns a dict containing only the keys which were found
+    """
+    return _get_cache().get_many(list(keys))
+
+
+def set_many(entries):
+    """
+    Stores the specified key -> value entries in the shared cache
+    """
+    _get_cache().set_many(entries, timeout=_get_timeout())
+
+
+# REQUEST-SCOPED MEMO
+@contextlib.contextmanager
+def request_cache():
+    """
+    Context manager which enables request-scoped memoization for the duration of the block
+    Nested blocks share the memo of the outermost one
+    """
+    if _request_cache.get() is not None:
+        yield
+        return
+    token = _request_cache.set({})
+    try:
+        yield
+    finally:
+        _request_cache.reset(token)
+
+
+def get_request_cache():
+    """
+    Returns the active request-scoped memo (a dict), or None outside of a request_cache() block
+    """
+    return _request_cache.get()
+
+
+def clear_request_cache():
+    """
+    Empties the active request-scoped memo, if any
+    """
+    memo = _request_cache.get()
+    if memo is not None:
+        memo.clear()
@@ -25,31 +25,23 @@ if getattr(settings, 'TEST_MODE', False) or os.getenv('TRAVIS_MODE', False):
 else:
     import milestones.resources as remote
 """
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
+from . import caching
 from . import exceptions
+from . import graph
 from . import models as internal
+from . import propagation
+from . import queries
 from . import serializers
 
 
-# PRIVATE/INTERNAL METHODS (public methods located further down)
-def _get_milestone_relationship_type(relationship):
-    """
-    Retrieves milestone relationship type object from backend datastore
-    """
-    try:
-        return internal.MilestoneRelationshipType.objects.get(
-            name=relationship,
-            active=True
-        )
-    except internal.MilestoneRelationshipType.DoesNotExist:
-        exceptions.raise_exception(
-            "MilestoneRelationshipType",
-            {'name': relationship},
-            exceptions.InvalidMilestoneRelationshipTypeException
-        )
+# Position of content_id in the serializers.MILESTONE_WITH_COURSE_CONTENT_COLUMNS rows
+_CONTENT_ID_COLUMN = len(serializers.MILESTONE_WITH_COURSE_COLUMNS)
 
 
+# PRIVATE/INTERNAL METHODS (public methods located further down)
 def _activate_record(record):
     """
     Enables database records by setting the 'active' attribute to True
@@ -70,45 +62,54 @@ def _inactivate_record(record):
     record.save()
 
 
-def _activate_milestone(milestone, propagate=True):
+def _set_milestone_relationships_active(milestone, active):
     """
-    Activates an inactivated (soft-deleted) milestone as well as any inactive relationships
+    Flips the 'active' flag of every course, course content and user link of a milestone
+    Returns a dict of model name -> number of records which were updated
     """
-    # We use models.Value(False) to make use of the indexing on the field. MySQL does not
+    # We use models.Value(True/False) to make use of the indexing on the field. MySQL does not
     # support boolean types natively, and checking for False will cause a table scan.
-    if propagate:
-        [_activate_record(record) for record
-         in internal.CourseMilestone.objects.filter(milestone_id=milestone.id, active=models.Value(False))]
-
-        [_activate_record(record) for record
-         in internal.CourseContentMilestone.objects.filter(milestone_id=milestone.id, active=models.Value(False))]
+    # The affected courses are collected before the update, but only invalidated after it: outside
+    # of a transaction, invalidating first would let a reader re-cache the state being replaced
+    course_ids = list(internal.CourseMilestone.objects.filter(
+        milestone_id=milestone.id,
+        active=models.Value(not active)
+    ).values_list('course_id', flat=True).distinct())
+
+    counts = {
+        model.__name__: queries.set_records_active(model.objects.filter(milestone_id=milestone.id), active)
+        for model in (internal.CourseMilestone, internal.CourseContentMilestone, internal.UserMilestone)
+    }
+    caching.invalidate_courses(course_ids)
+    caching.invalidate_all_users()
+    caching.invalidate_course_index()
+    return counts
 
-        [_activate_record(record) for record
-         in internal.UserMilestone.objects.filter(milestone_id=milestone.id, active=models.Value(False))]
 
-    [_activate_record(record) for record
-     in internal.Milestone.objects.filter(id=milestone.id, active=models.Value(False))]
+def _activate_milestone(milestone, propagate=True):
+    """
+    Activates an inactivated (soft-deleted) milestone as well as any inactive relationships
+    Returns a dict of model name -> number of records which were activated
+    """
+    counts = _set_milestone_relationships_active(milestone, True) if propagate else {}
+    counts['Milestone'] = queries.set_records_active(internal.Milestone.objects.filter(id=milestone.id), True)
+    return counts
 
 
 def _inactivate_milestone(milestone):
     """
     Inactivates an activated milestone as well as any active relationships
+    Returns a dict of model name -> number of records which were inactivated
     """
-    [_inactivate_record(record) for record
-     in internal.CourseMilestone.objects.filter(milestone_id=milestone.id, active=models.Value(True))]
-
-    [_inactivate_record(record) for record
-     in internal.CourseContentMilestone.objects.filter(milestone_id=milestone.id, active=models.Value(True))]
-
-    [_inactivate_record(record) for record
-     in internal.UserMilestone.objects.filter(milestone_id=milestone.id, active=models.Value(True))]
-
-    [_inactivate_record(record) for record
-     in internal.Milestone.objects.filter(id=milestone.id, active=models.Value(True))]
+    counts = _set_milestone_relationships_active(milestone, False)
+    counts['Milestone'] = queries.set_records_active(internal.Milestone.objects.filter(id=milestone.id), False)
+    # A propagation job still pending for the milestone would otherwise reactivate its relationships
+    propagation.clear_propagation(milestone.id)
+    return counts
 
 
 # PUBLIC METHODS
-def create_milestone(milestone, propagate=True):
+def create_milestone(milestone, propagate=True, background=False):
     """
     Inserts a new milestone into app/local state given the following dictionary:
     {
@@ -117,6 +118,8 @@ def create_milestone(milestone, propagate=True):
         'namespace': string,
         'description': string
     }
+    When reactivating a milestone with 'background', its relationships are left for
+    propagation.propagate_milestone to reactivate
     Returns an updated dictionary including a new 'id': integer field/value
     """
     # Trust, but verify...
@@ -131,7 +134,12 @@ def create_milestone(milestone, propagate=True):
             name=milestone_obj.name,
         )
         # If the milestone exists, but was inactivated, we can simply turn it back on
-        if not milestone.active:
+        if not milestone.active and propagate and background:
+            # The job is recorded along with the reactivation, so that one is never left without the other
+            with transaction.atomic():
+                _activate_milestone(milestone, propagate=False)
+                propagation.start_propagation(milestone.id)
+        elif not milestone.active:
             _activate_milestone(milestone, propagate)
     except internal.Milestone.DoesNotExist:
         milestone = internal.Milestone.objects.create(
@@ -164,10 +172,10 @@ def update_milestone(milestone):
 def delete_milestone(milestone):
     """
     Inactivates an existing milestone from app/local state
-    No return currently defined for this operation
+    Returns a dict of model name -> number of records which were inactivated
     """
     milestone_obj = serializers.deserialize_milestone(milestone)
-    _inactivate_milestone(milestone_obj)
+    return _inactivate_milestone(milestone_obj)
 
 
 def fetch_milestone(milestone_id):
@@ -193,20 +201,33 @@ def fetch_milestones(milestone):
         exceptions.raise_exception("Milestone", milestone, exceptions.InvalidMilestoneException)
     milestone_obj = serializers.deserialize_milestone(milestone)
     if milestone_obj.id is not None:
-        return serializers.serialize_milestones(internal.Milestone.objects.filter(
+        return [serializers.serialize_milestone_row(row) for row in internal.Milestone.objects.filter(
             id=milestone_obj.id,
             active=models.Value(True),
-        ))
+        ).values_list(*serializers.MILESTONE_COLUMNS)]
     if milestone_obj.namespace:
-        return serializers.serialize_milestones(internal.Milestone.objects.filter(
+        return [serializers.serialize_milestone_row(row) for row in internal.Milestone.objects.filter(
             namespace=str(milestone_obj.namespace),
             active=models.Value(True)
-        ))
+        ).values_list(*serializers.MILESTONE_COLUMNS)]
 
     # If we get to this point the caller is attempting to match on an unsupported field
     exceptions.raise_exception("Milestone", milestone, exceptions.InvalidMilestoneException)
 
 
+def fetch_milestones_page(namespace, *, after_pk=None, page_size=None):
+    """
+    Retrieves one page of the active milestones in the specified namespace (ref: queries.fetch_page)
+    """
+    queryset = internal.Milestone.objects.filter(
+        namespace=str(namespace),
+        active=models.Value(True)
+    )
+    return queries.fetch_page(
+        queryset, serializers.MILESTONE_COLUMNS, serializers.serialize_milestone_row, after_pk, page_size
+    )
+
+
 def fetch_milestone_relationship_types():
     """
     Model accessor method to return supported milestone relationship types
@@ -219,7 +240,7 @@ def create_course_milestone(course_key, relationship, milestone):
     Inserts a new course-milestone into app/local state
     No response currently defined for this operation
     """
-    relationship_type = _get_milestone_relationship_type(relationship)
+    relationship_type = queries.get_milestone_relationship_type(relationship)
     milestone_obj = serializers.deserialize_milestone(milestone)
     try:
         relationship = internal.CourseMilestone.objects.get(
@@ -230,6 +251,7 @@ def create_course_milestone(course_key, relationship, milestone):
         # If the relationship exists, but was inactivated, we can simply turn it back on
         if not relationship.active:
             _activate_record(relationship)
+            caching.invalidate_courses([course_key])
     except internal.CourseMilestone.DoesNotExist:
         internal.CourseMilestone.objects.create(
             course_id=str(course_key),
@@ -237,6 +259,7 @@ def create_course_milestone(course_key, relationship, milestone):
             milestone_relationship_type=relationship_type,
             active=models.Value(True)
         )
+        caching.invalidate_courses([course_key])
 
 
 def delete_course_milestone(course_key, milestone):
@@ -251,41 +274,90 @@ def delete_course_milestone(course_key, milestone):
             active=models.Value(True),
         )
         _inactivate_record(relationship)
+        caching.invalidate_courses([course_key])
     except internal.CourseMilestone.DoesNotExist:
         # If we're being asked to delete a course-milestone link
         # that does not exist in the database then our work is done
         pass
 
 
+def _fetch_cached_courses_milestones(course_ids, relationship_type):
+    """
+    Read-through cache for the serialized milestones linked to each of the specified courses
+    Entries are keyed by course version (ref: caching.py), so writers never have to find them
+    Returns a dict of course_id -> list of serialized course milestones
+    """
+    relationship = relationship_type.name if relationship_type is not None else None
+    versions = caching.get_course_versions(course_ids)
+    keys = {
+        course_id: caching.course_milestones_key(course_id, relationship, versions[course_id])
+        for course_id in course_ids
+    }
+    cached = caching.get_many(keys.values())
+    courses_milestones = {course_id: cached.get(key) for course_id, key in keys.items()}
+
+    missing = [course_id for course_id, milestones in courses_milestones.items() if milestones is None]
+    if missing:
+        queryset = internal.CourseMilestone.objects.filter(
+            active=models.Value(True)
+        )
+        if relationship_type is not None:
+            queryset = queryset.filter(milestone_relationship_type=relationship_type.id)
+
+        for course_id in missing:
+            courses_milestones[course_id] = []
+        for chunk in queries.chunks(missing, queries.get_batch_size()):
+            for row in queryset.filter(queries.key_lookup('course_id', chunk)).values_list(
+                *serializers.MILESTONE_WITH_COURSE_COLUMNS
+            ):
+                milestone = serializers.serialize_milestone_with_course_row(row)
+                courses_milestones[milestone['course_id']].append(milestone)
+        caching.set_many({keys[course_id]: courses_milestones[course_id] for course_id in missing})
+
+    return courses_milestones
+
+
 def fetch_courses_milestones(course_keys, relationship=None, user=None):
     """
     Retrieves the set of milestones currently linked to the specified courses
     Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
     Optionally pass in 'user' to constrain the set to those which the user has collected
     """
-    queryset = internal.CourseMilestone.objects.filter(
-        course_id__in=course_keys,
-        active=models.Value(True)
-    ).select_related('milestone')
+    courses_milestones = fetch_courses_milestones_by_course(course_keys, relationship, user)
+    return [milestone for milestones in courses_milestones.values() for milestone in milestones]
 
+
+def fetch_courses_milestones_by_course(course_keys, relationship=None, user=None):
+    """
+    Retrieves the milestones currently linked to each of the specified courses
+    Optionally pass in 'relationship' and 'user', as for fetch_courses_milestones
+    Returns a dict of course_id -> list of serialized course milestones (for every course)
+    """
     # if milestones relationship type found then apply the filter
+    mrt = None
     if relationship is not None:
-        mrt = _get_milestone_relationship_type(relationship)
-        queryset = queryset.filter(
-            milestone_relationship_type=mrt.id,
-        )
+        mrt = queries.get_milestone_relationship_type(relationship)
 
     # To pull the list of milestones a user HAS, use get_user_milestones
     # Use fetch_courses_milestones to pull the list of milestones that a user does not yet
     # have for the specified course
+    courses_milestones = {str(course_key): [] for course_key in course_keys}
+    # Most courses have no milestones at all, which the course index can tell without a lookup
+    course_ids = caching.filter_indexed_courses(list(courses_milestones))
+    if not course_ids:
+        return courses_milestones
+    courses_milestones.update(_fetch_cached_courses_milestones(course_ids, mrt))
+
     relationships = fetch_milestone_relationship_types()
-    if relationship == relationships['REQUIRES'] and user and user.get('id', 0) > 0:
-        queryset = queryset.exclude(
-            milestone__usermilestone__in=internal.UserMilestone.objects.filter(user_id=user['id'],
-                                                                               active=models.Value(True))
-        )
+    if relationship == relationships['REQUIRES'] and user and user.get('id', 0) > 0 and \
+            any(courses_milestones[course_id] for course_id in course_ids):
+        collected = _fetch_cached_user_milestones(user)
+        for course_id in course_ids:
+            courses_milestones[course_id] = [
+                milestone for milestone in courses_milestones[course_id] if milestone['id'] not in collected
+            ]
 
-    return [serializers.serialize_milestone_with_course(milestone) for milestone in queryset]
+    return courses_milestones
 
 
 def create_course_content_milestone(course_key, content_key, relationship, milestone, requirements=None):
@@ -293,7 +365,7 @@ def create_course_content_milestone(course_key, content_key, relationship, miles
     Inserts a new course-content-milestone into app/local state
     No response currently defined for this operation
     """
-    relationship_type = _get_milestone_relationship_type(relationship)
+    relationship_type = queries.get_milestone_relationship_type(relationship)
     milestone_obj = serializers.deserialize_milestone(milestone)
     requirements = serializers.serialize_requirements(requirements)
     try:
@@ -307,10 +379,12 @@ def create_course_content_milestone(course_key, content_key, relationship, miles
         if not relationship.active:
             relationship.requirements = requirements
             _activate_record(relationship)
+            caching.invalidate_course_index([course_key])
         elif relationship.requirements != requirements:
             # Update requirements field if necessary
             relationship.requirements = requirements
             relationship.save()
+            caching.clear_request_cache()
     except internal.CourseContentMilestone.DoesNotExist:
         internal.CourseContentMilestone.objects.create(
             course_id=str(course_key),
@@ -320,6 +394,76 @@ def create_course_content_milestone(course_key, content_key, relationship, miles
             requirements=requirements,
             active=True
         )
+        caching.invalidate_course_index([course_key])
+
+
+def create_course_content_milestones(course_key, content_milestones):
+    """
+    Reconciles a batch of course-content-milestones for one course against app/local state
+    'content_milestones' is a list of (content_key, relationship, milestone, requirements) tuples
+    New links are inserted, and existing ones reactivated or updated (requirements/relationship)
+    in bulk, rather than with a lookup and a write per link
+    Returns a dict with counts of 'created', 'reactivated', 'updated' and 'unchanged' links
+    """
+    course_id = str(course_key)
+    desired = {
+        (str(content_key), int(milestone['id'])): (
+            queries.get_milestone_relationship_type(relationship),
+            serializers.serialize_requirements(requirements),
+        )
+        for content_key, relationship, milestone, requirements in content_milestones
+    }
+    counts = {'created': 0, 'reactivated': 0, 'updated': 0, 'unchanged': 0}
+    if not desired:
+        return counts
+
+    queryset = internal.CourseContentMilestone.objects.filter(
+        queries.key_lookup('course_id', [course_id]),
+        milestone_id__in={milestone_id for _, milestone_id in desired},
+    )
+    existing = {(record.content_id, record.milestone_id): record for record in queryset}
+
+    to_create = []
+    to_update = []
+    relinked = False
+    for (content_id, milestone_id), (relationship_type, requirements) in desired.items():
+        record = existing.get((content_id, milestone_id))
+        if record is None:
+            to_create.append(internal.CourseContentMilestone(
+                course_id=course_id,
+                content_id=content_id,
+                milestone_id=milestone_id,
+                milestone_relationship_type=relationship_type,
+                requirements=requirements,
+                active=True,
+            ))
+            continue
+        if record.active and record.requirements == requirements \
+                and record.milestone_relationship_type_id == relationship_type.id:
+            counts['unchanged'] += 1
+            continue
+        counts['updated' if record.active else 'reactivated'] += 1
+        relinked = relinked or record.milestone_relationship_type_id != relationship_type.id
+        record.active = True
+        record.requirements = requirements
+        record.milestone_relationship_type = relationship_type
+        record.modified = timezone.now()
+        to_update.append(record)
+
+    if to_update:
+        internal.CourseContentMilestone.objects.bulk_update(
+            to_update,
+            ['active', 'requirements', 'milestone_relationship_type', 'modified'],
+            batch_size=queries.get_batch_size(),
+        )
+    if to_create:
+        counts['created'] = queries.insert_records(queryset, to_create, ('content_id', 'milestone_id'))
+
+    if counts['created'] or counts['reactivated'] or relinked:
+        caching.invalidate_course_index([course_id])
+    elif counts['updated']:
+        caching.clear_request_cache()
+    return counts
 
 
 def delete_course_content_milestone(course_key, content_key, milestone):
@@ -335,6 +479,7 @@ def delete_course_content_milestone(course_key, content_key, milestone):
             active=models.Value(True),
         )
         _inactivate_record(relationship)
+        caching.invalidate_course_index([course_key])
     except internal.CourseContentMilestone.DoesNotExist:
         # If we're being asked to delete a course-content-milestone link
         # that does not exist in the database then our work is done
@@ -346,29 +491,131 @@ def fetch_course_content_milestones(content_key=None, course_key=None, relations
     Retrieves the set of milestones currently linked to the specified course content
     Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
     Optionally pass in 'user' to further-filter the set (ex. for retrieving unfulfilled milestones)
+
+    Within a request_cache() block (ref: caching.py, middleware.py), lookups for a course are
+    served from a single course-wide fetch, memoized for the rest of the request
     """
-    queryset = internal.CourseContentMilestone.objects.filter(
-        active=models.Value(True)
-    ).select_related('milestone')
+    content_keys = [content_key] if content_key is not None else None
+    if course_key is None:
+        return [
+            serializers.serialize_milestone_with_course_content_row(row)
+            for row in _query_course_content_milestone_rows(content_keys, course_key, relationship, user)
+        ]
 
-    if course_key is not None:
-        queryset = queryset.filter(course_id=str(course_key))
+    content_milestones = _fetch_course_content_milestones_by_content(course_key, content_keys, relationship, user)
+    return [milestone for milestones in content_milestones.values() for milestone in milestones]
 
+
+def iter_course_content_milestones(content_key=None, course_key=None, relationship=None, user=None,
+                                   batch_size=None):
+    """
+    Streams the milestones currently linked to the specified course content (ref: queries.iter_rows)
+    Takes the same filters as fetch_course_content_milestones, but always reads from the backend
+    datastore rather than the caches, which would have to hold the whole result
+    """
+    queryset = queries.course_content_milestones_queryset(course_key, relationship, user)
     if content_key is not None:
-        queryset = queryset.filter(content_id=str(content_key))
+        queryset = queryset.filter(queries.key_lookup('content_id', [content_key]))
+    return queries.iter_rows(
+        queryset,
+        serializers.MILESTONE_WITH_COURSE_CONTENT_COLUMNS,
+        serializers.serialize_milestone_with_course_content_row,
+        batch_size
+    )
 
-    if relationship is not None:
-        mrt = _get_milestone_relationship_type(relationship)
-        queryset = queryset.filter(milestone_relationship_type=mrt.id)
-
-        # Filter for unfulfilled milestones for the given user
-        if relationship == 'requires' and user and user.get('id'):
-            queryset = queryset.exclude(
-                milestone__usermilestone__in=internal.UserMilestone.objects.filter(user_id=user['id'],
-                                                                                   active=models.Value(True))
-            )
 
-    return [serializers.serialize_milestone_with_course_content(ccm) for ccm in queryset]
+def fetch_course_content_milestones_page(  # pylint: disable=too-many-arguments
+    content_key=None, course_key=None, relationship=None, user=None, *, after_pk=None, page_size=None
+):
+    """
+    Retrieves one page of the milestones currently linked to the specified course content
+    (ref: queries.fetch_page), with the same filters as fetch_course_content_milestones
+    """
+    queryset = queries.course_content_milestones_queryset(course_key, relationship, user)
+    if content_key is not None:
+        queryset = queryset.filter(queries.key_lookup('content_id', [content_key]))
+    return queries.fetch_page(
+        queryset,
+        serializers.MILESTONE_WITH_COURSE_CONTENT_COLUMNS,
+        serializers.serialize_milestone_with_course_content_row,
+        after_pk,
+        page_size
+    )
+
+
+def fetch_course_content_milestones_by_content(course_key, content_keys, relationship=None, user=None):
+    """
+    Retrieves the milestones currently linked to each of the specified content keys of a course
+    Optionally pass in 'relationship' and 'user', as for fetch_course_content_milestones
+    Returns a dict of content_id -> list of serialized course content milestones (for every key)
+    """
+    return _fetch_course_content_milestones_by_content(
+        course_key,
+        list(dict.fromkeys(str(content_key) for content_key in content_keys)),
+        relationship,
+        user
+    )
+
+
+def _fetch_course_content_milestones_by_content(course_key, content_keys, relationship, user):
+    """
+    Retrieves the milestones linked to the specified content (or all content, if None) of a course,
+    grouped by content id, short-circuiting courses without milestones and memoizing per request
+    """
+    content_milestones = {str(content_key): [] for content_key in content_keys or []}
+    if not caching.filter_indexed_courses([str(course_key)]):
+        if relationship is not None:
+            queries.get_milestone_relationship_type(relationship)
+        return content_milestones
+
+    memo = caching.get_request_cache()
+    if memo is None:
+        for row in _query_course_content_milestone_rows(content_keys, course_key, relationship, user):
+            milestone = serializers.serialize_milestone_with_course_content_row(row)
+            content_milestones.setdefault(milestone['content_id'], []).append(milestone)
+        return content_milestones
+
+    memo_key = (
+        'course_content_milestones',
+        str(course_key),
+        relationship,
+        user.get('id') if user else None,
+    )
+    memoized = memo.get(memo_key)
+    if memoized is None:
+        memoized = {}
+        for row in _query_course_content_milestone_rows(None, course_key, relationship, user):
+            memoized.setdefault(row[_CONTENT_ID_COLUMN], []).append(row)
+        memo[memo_key] = memoized
+
+    # The memo holds raw rows, so that only the requested content is decoded, and callers get
+    # their own dicts, which cannot alter what later lookups will see
+    for content_id in content_milestones if content_keys is not None else memoized:
+        content_milestones[content_id] = [
+            serializers.serialize_milestone_with_course_content_row(row) for row in memoized.get(content_id, [])
+        ]
+    return content_milestones
+
+
+def _query_course_content_milestone_rows(content_keys, course_key, relationship, user):
+    """
+    Queries the backend datastore for the milestones linked to the specified course content, as
+    values_list(*MILESTONE_WITH_COURSE_CONTENT_COLUMNS) rows
+    Content keys are matched in chunks, so that long lists do not produce oversized IN clauses
+    (ref: fetch_course_content_milestones)
+    """
+    queryset = queries.course_content_milestones_queryset(course_key, relationship, user).values_list(
+        *serializers.MILESTONE_WITH_COURSE_CONTENT_COLUMNS
+    )
+    if content_keys is None:
+        return list(queryset)
+
+    content_ids = [str(content_key) for content_key in content_keys]
+    return [
+        row
+        for chunk in queries.chunks(content_ids, queries.get_batch_size())
+        for row in queryset.filter(queries.key_lookup('content_id', chunk))
+    ]
 
 
 def fetch_milestone_courses(milestone, relationship=None):
@@ -376,19 +623,54 @@ def fetch_milestone_courses(milestone, relationship=None):
     Retrieves the set of courses currently linked to the specified milestone
     Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
     """
-    milestone_obj = serializers.deserialize_milestone(milestone)
-    queryset = internal.CourseMilestone.objects.filter(
-        milestone=milestone_obj,
-        active=models.Value(True)
-    ).select_related('milestone')
+    return fetch_milestones_courses([milestone], relationship)
 
-    # if milestones relationship type found then apply the filter
-    if relationship is not None:
-        queryset = queryset.filter(
-            milestone_relationship_type__name=relationship,
-        )
 
-    return [serializers.serialize_milestone_with_course(milestone) for milestone in queryset]
+def fetch_milestones_courses(milestones, relationship=None):
+    """
+    Retrieves the set of courses currently linked to any of the specified milestones, in one query
+    Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
+    """
+    queryset = queries.milestones_links_queryset(internal.CourseMilestone, milestones, relationship)
+    if queryset is None:
+        return []
+    return [
+        serializers.serialize_milestone_with_course_row(row)
+        for row in queryset.values_list(*serializers.MILESTONE_WITH_COURSE_COLUMNS)
+    ]
+
+
+def iter_milestone_courses(milestone, relationship=None, batch_size=None):
+    """
+    Streams the courses currently linked to the specified milestone (ref: queries.iter_rows)
+    Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
+    """
+    queryset = queries.milestones_links_queryset(internal.CourseMilestone, [milestone], relationship)
+    if queryset is None:
+        return iter(())
+    return queries.iter_rows(
+        queryset,
+        serializers.MILESTONE_WITH_COURSE_COLUMNS,
+        serializers.serialize_milestone_with_course_row,
+        batch_size
+    )
+
+
+def fetch_milestone_courses_page(milestone, relationship=None, *, after_pk=None, page_size=None):
+    """
+    Retrieves one page of the courses currently linked to the specified milestone (ref: queries.fetch_page)
+    Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
+    """
+    queryset = queries.milestones_links_queryset(internal.CourseMilestone, [milestone], relationship)
+    if queryset is None:
+        return [], None
+    return queries.fetch_page(
+        queryset,
+        serializers.MILESTONE_WITH_COURSE_COLUMNS,
+        serializers.serialize_milestone_with_course_row,
+        after_pk,
+        page_size
+    )
 
 
 def fetch_milestone_course_content(milestone, relationship=None):
@@ -396,19 +678,56 @@ def fetch_milestone_course_content(milestone, relationship=None):
     Retrieves the set of course content modules currently linked to the specified milestone
     Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
     """
-    milestone_obj = serializers.deserialize_milestone(milestone)
-    queryset = internal.CourseContentMilestone.objects.filter(
-        milestone=milestone_obj,
-        active=models.Value(True)
-    ).select_related('milestone')
+    return fetch_milestones_course_content([milestone], relationship)
+
+
+def fetch_milestones_course_content(milestones, relationship=None):
+    """
+    Retrieves the set of course content modules currently linked to any of the specified milestones,
+    in one query
+    Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
+    """
+    queryset = queries.milestones_links_queryset(internal.CourseContentMilestone, milestones, relationship)
+    if queryset is None:
+        return []
+    return [
+        serializers.serialize_milestone_with_course_content_row(row)
+        for row in queryset.values_list(*serializers.MILESTONE_WITH_COURSE_CONTENT_COLUMNS)
+    ]
+
+
+def iter_milestone_course_content(milestone, relationship=None, batch_size=None):
+    """
+    Streams the course content modules currently linked to the specified milestone (ref: queries.iter_rows)
+    Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
+    """
+    queryset = queries.milestones_links_queryset(internal.CourseContentMilestone, [milestone], relationship)
+    if queryset is None:
+        return iter(())
+    return queries.iter_rows(
+        queryset,
+        serializers.MILESTONE_WITH_COURSE_CONTENT_COLUMNS,
+        serializers.serialize_milestone_with_course_content_row,
+        batch_size
+    )
 
-    # if milestones relationship type found then apply the filter
-    if relationship is not None:
-        queryset = queryset.filter(
-            milestone_relationship_type__name=relationship,
-        )
 
-    return [serializers.serialize_milestone_with_course_content(milestone) for milestone in queryset]
+def fetch_milestone_course_content_page(milestone, relationship=None, *, after_pk=None, page_size=None):
+    """
+    Retrieves one page of the course content modules currently linked to the specified milestone
+    (ref: queries.fetch_page)
+    Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
+    """
+    queryset = queries.milestones_links_queryset(internal.CourseContentMilestone, [milestone], relationship)
+    if queryset is None:
+        return [], None
+    return queries.fetch_page(
+        queryset,
+        serializers.MILESTONE_WITH_COURSE_CONTENT_COLUMNS,
+        serializers.serialize_milestone_with_course_content_row,
+        after_pk,
+        page_size
+    )
 
 
 def create_user_milestone(user, milestone):
@@ -425,12 +744,53 @@ def create_user_milestone(user, milestone):
         # If the relationship exists, but was inactivated, we can simply turn it back on
         if not relationship.active:
             _activate_record(relationship)
+            caching.invalidate_users([user['id']])
     except internal.UserMilestone.DoesNotExist:
         relationship = internal.UserMilestone.objects.create(
             user_id=user['id'],
             milestone=milestone_obj,
             active=models.Value(True)
         )
+        caching.invalidate_users([user['id']])
+
+
+def create_user_milestones(users, milestones):
+    """
+    Inserts (or reactivates) the user-milestone links for every combination of the specified
+    users and milestones, in chunks of set-based statements rather than per-user queries
+    Returns a dict with counts of 'created', 'reactivated' and 'unchanged' links
+    """
+    user_ids = list(dict.fromkeys(int(user['id']) for user in users))
+    milestone_ids = list(dict.fromkeys(int(milestone['id']) for milestone in milestones))
+    counts = {'created': 0, 'reactivated': 0, 'unchanged': 0}
+
+    for milestone_id in milestone_ids:
+        for chunk in queries.chunks(user_ids, queries.get_batch_size()):
+            queryset = internal.UserMilestone.objects.filter(
+                milestone_id=milestone_id,
+                user_id__in=chunk,
+            )
+            existing = dict(queryset.values_list('user_id', 'active'))
+
+            inactive = [user_id for user_id, active in existing.items() if not active]
+            if inactive:
+                counts['reactivated'] += internal.UserMilestone.objects.filter(
+                    milestone_id=milestone_id,
+                    user_id__in=inactive,
+                    active=models.Value(False),
+                ).update(active=True, modified=timezone.now())
+            counts['unchanged'] += len(existing) - len(inactive)
+
+            missing = [
+                internal.UserMilestone(user_id=user_id, milestone_id=milestone_id, active=True)
+                for user_id in chunk if user_id not in existing
+            ]
+            if missing:
+                counts['created'] += queries.insert_records(queryset, missing, ('user_id', 'milestone_id'))
+
+    if counts['created'] or counts['reactivated']:
+        caching.invalidate_users(user_ids)
+    return counts
 
 
 def delete_user_milestone(user, milestone):
@@ -445,55 +805,180 @@ def delete_user_milestone(user, milestone):
             active=models.Value(True),
         )
         _inactivate_record(record)
+        caching.invalidate_users([user['id']])
     except internal.UserMilestone.DoesNotExist:
         # If we're being asked to delete a user-milestone link
         # that does not exist in the database then our work is done
         pass
 
 
+def _fetch_cached_user_milestones(user):
+    """
+    Read-through cache for the serialized milestones the specified user has collected
+    Returns a dict of milestone id -> serialized milestone, for O(1) membership checks
+    """
+    key = caching.user_milestones_key(user['id'])
+    user_milestones = caching.get_entry(key)
+    if user_milestones is None:
+        user_milestones = {
+            row[0]: serializers.serialize_milestone_row(row)
+            for row in internal.Milestone.objects.filter(
+                usermilestone__user_id=user['id'],
+                usermilestone__active=models.Value(True),
+            ).values_list(*serializers.MILESTONE_COLUMNS)
+        }
+        caching.set_entry(key, user_milestones)
+    return user_milestones
+
+
 def fetch_user_milestones(user, milestone_data):
     """
     Retrieves the set of milestones currently linked to the specified user
+    Served from the user's cached set when present (ref: _fetch_cached_user_milestones), and
+    otherwise with the filters applied by the backend datastore, rather than loading the whole set
     """
-    queryset = internal.Milestone.objects.filter(
-        usermilestone__user_id=user['id'],
-        usermilestone__active=models.Value(True),
-    )
-
     # We don't currently support a 'fetch all' use case -- must supply at least one filter
     if not milestone_data.get('id') and not milestone_data.get('namespace'):
         exceptions.raise_exception("Milestone", milestone_data, exceptions.InvalidMilestoneException)
 
+    user_milestones = caching.get_entry(caching.user_milestones_key(user['id']))
+    if user_milestones is None:
+        queryset = internal.Milestone.objects.filter(
+            usermilestone__user_id=user['id'],
+            usermilestone__active=models.Value(True),
+        )
+        if milestone_data.get('id'):
+            queryset = queryset.filter(id=milestone_data['id'])
+        if milestone_data.get('namespace'):
+            queryset = queryset.filter(namespace=milestone_data['namespace'])
+        return [
+            serializers.serialize_milestone_row(row) for row in queryset.values_list(*serializers.MILESTONE_COLUMNS)
+        ]
+
     if milestone_data.get('id'):
-        queryset.filter(id=milestone_data['id'])
+        # Ids may be passed as strings, which the datastore accepts; the cached set is keyed by int
+        milestone = user_milestones.get(int(milestone_data['id']))
+        user_milestones = {milestone['id']: milestone} if milestone else {}
 
     if milestone_data.get('namespace'):
-        queryset.filter(namespace=milestone_data['namespace'])
+        user_milestones = {
+            milestone_id: milestone for milestone_id, milestone in user_milestones.items()
+            if milestone['namespace'] == milestone_data['namespace']
+        }
+
+    return list(user_milestones.values())
+
 
-    return [serializers.serialize_milestone(milestone) for milestone in queryset]
+def fetch_user_has_milestone(user, milestone_data):
+    """
+    Checks whether the specified user has collected a milestone matching the specified data
+    Served from the user's cached set when present, and otherwise with an EXISTS probe of the
+    (user_id, active, milestone) index which returns as soon as a link is found
+    """
+    if not milestone_data.get('id'):
+        return bool(fetch_user_milestones(user, milestone_data))
+
+    user_milestones = caching.get_entry(caching.user_milestones_key(user['id']))
+    if user_milestones is not None:
+        milestone = user_milestones.get(int(milestone_data['id']))
+        return milestone is not None and milestone_data.get('namespace') in (None, '', milestone['namespace'])
+
+    queryset = internal.UserMilestone.objects.filter(
+        user_id=user['id'],
+        active=models.Value(True),
+        milestone_id=milestone_data['id'],
+    )
+    if milestone_data.get('namespace'):
+        queryset = queryset.filter(milestone__namespace=milestone_data['namespace'])
+    return queryset.exists()
+
+
+def fetch_users_milestone_ids(user_ids, milestone_ids):
+    """
+    Retrieves which of the specified milestones each of the specified users has collected
+    Runs one query per chunk of users, rather than one per user
+    User and milestone ids must be ints, as stored; the api layer normalizes them
+    Returns a dict of user_id -> set of collected milestone ids (for every specified user)
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    milestone_ids = list(dict.fromkeys(milestone_ids))
+    users_milestone_ids = {user_id: set() for user_id in user_ids}
+    if not milestone_ids:
+        return users_milestone_ids
+
+    for chunk in queries.chunks(user_ids, queries.get_batch_size()):
+        for user_id, milestone_id in internal.UserMilestone.objects.filter(
+            user_id__in=chunk,
+            milestone_id__in=milestone_ids,
+            active=models.Value(True),
+        ).values_list('user_id', 'milestone_id'):
+            users_milestone_ids[user_id].add(milestone_id)
+    return users_milestone_ids
+
+
+def _build_prerequisite_graph():
+    """
+    Builds the prerequisite graph of every course (ref: caching.get_prerequisite_graph)
+    """
+    return graph.PrerequisiteGraph(*queries.fetch_prerequisite_links())
+
+
+def _update_prerequisite_graph(prerequisite_graph, course_ids):
+    """
+    Reloads the links of the specified courses into the prerequisite graph
+    """
+    return prerequisite_graph.replace_courses(course_ids, *queries.fetch_prerequisite_links(course_ids))
+
+
+def _get_prerequisite_graph():
+    """
+    Retrieves the prerequisite graph of this process, built or updated as necessary
+    """
+    return caching.get_prerequisite_graph(_build_prerequisite_graph, _update_prerequisite_graph)
+
+
+def fetch_course_prerequisites(course_key):
+    """
+    Retrieves the ids of the courses which fulfill the milestones required by the specified course,
+    and transitively those which fulfill the milestones they require, nearest first
+    """
+    return _get_prerequisite_graph().prerequisites(str(course_key))
+
+
+def fetch_user_unlocked_courses(user):
+    """
+    Retrieves the ids of the courses (with requirements) which the milestones collected by the
+    specified user unlock, and transitively those unlocked by completing the courses they unlock
+    """
+    return _get_prerequisite_graph().unlocked(_fetch_cached_user_milestones(user))
 
 
 def delete_content_references(content_key):
     """
     Inactivates references to content keys within this app (ref: api.py)
     Supports the 'delete entrance exam' Studio use case, when Milestones is enabled
+    Returns a dict of model name -> number of records which were inactivated
     """
-    [_inactivate_record(record) for record in internal.CourseContentMilestone.objects.filter(
-        content_id=str(content_key),
-        active=models.Value(True)
-    )]
+    counts = {
+        'CourseContentMilestone': queries.set_records_active(
+            internal.CourseContentMilestone.objects.filter(queries.key_lookup('content_id', [content_key])), False
+        ),
+    }
+    caching.invalidate_course_index()
+    return counts
 
 
 def delete_course_references(course_key):
     """
     Inactivates references to course keys within this app (ref: receivers.py and api.py)
+    Returns a dict of model name -> number of records which were inactivated
     """
-    [_inactivate_record(record) for record in internal.CourseMilestone.objects.filter(
-        course_id=str(course_key),
-        active=models.Value(True)
-    )]
-
-    [_inactivate_record(record) for record in internal.CourseContentMilestone.objects.filter(
-        course_id=str(course_key),
-        active=models.Value(True)
-    )]
+    counts = {
+        model.__name__: queries.set_records_active(
+            model.objects.filter(queries.key_lookup('course_id', [course_key])), False
+        )
+        for model in (internal.CourseMilestone, internal.CourseContentMilestone)
+    }
+    # Invalidated once the links are updated, so that a reader cannot re-cache them meanwhile
+    caching.invalidate_courses([course_key])
+    return counts
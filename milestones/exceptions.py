@@ -29,6 +29,10 @@ class InvalidUserException(ValidationError):
     """ User validation exception class """
 
 
+class InvalidPageException(ValidationError):
+    """ Page cursor/size validation exception class """
+
+
 def raise_exception(entity_type, entity, exception):
     """ Exception helper """
     raise exception(
@@ -0,0 +1,273 @@
+"""
+In-memory course prerequisite graph, used by the data layer (data.py) to answer
+transitive questions which would otherwise take a round-trip per hop.
+
+Courses 'require' milestones which other courses 'fulfill' (directly, or through
+their content), so courses and milestones form a bipartite graph.  Both kinds of
+node are numbered densely, and each direction of each kind of edge is held in
+CSR (compressed sparse row) form: a pair of integer arrays in which the targets
+of node i are targets[offsets[i]:offsets[i + 1]].  This keeps a graph of 100k
+courses to a few MB, and its traversals to integer array lookups.
+
+The graph is immutable: data.py builds it from a few bulk queries, and derives a
+new one from the old (ref: PrerequisiteGraph.replace_courses) when the links of
+some courses change (ref: caching.get_prerequisite_graph), reading only the
+links of those courses.  Courses and milestones left without links are dropped
+along the way, so the graph does not grow between full builds.
+"""
+
+from array import array
+from collections import deque, namedtuple
+
+# The CSRs of a graph: course-to-milestone ones, and the milestone-to-course ones derived from them
+_Links = namedtuple('_Links', ['requires', 'fulfills', 'required_by', 'fulfilled_by'])
+
+
+def _number(index, key):
+    """
+    Returns the dense number of a key in an index (dict of key -> number), numbering it if new
+    """
+    return index.setdefault(key, len(index))
+
+
+def _csr(size, edges):
+    """
+    Packs (source, target) index pairs into CSR offset and target arrays, for 'size' sources
+    """
+    offsets = array('i', [0]) * (size + 1)
+    for source, _ in edges:
+        offsets[source + 1] += 1
+    for index in range(size):
+        offsets[index + 1] += offsets[index]
+    positions = offsets[:-1]
+    targets = array('i', [0]) * len(edges)
+    for source, target in edges:
+        targets[positions[source]] = target
+        positions[source] += 1
+    return offsets, targets
+
+
+def _transpose(size, csr):
+    """
+    Reverses the edges of a CSR, for 'size' targets
+    """
+    offsets, targets = csr
+    reversed_offsets = array('i', [0]) * (size + 1)
+    for target in targets:
+        reversed_offsets[target + 1] += 1
+    for index in range(size):
+        reversed_offsets[index + 1] += reversed_offsets[index]
+    positions = reversed_offsets[:-1]
+    reversed_targets = array('i', [0]) * len(targets)
+    for source in range(len(offsets) - 1):
+        for target in targets[offsets[source]:offsets[source + 1]]:
+            reversed_targets[positions[target]] = source
+            positions[target] += 1
+    return reversed_offsets, reversed_targets
+
+
+def _targets(csr, index):
+    """
+    Returns the targets of node 'index' in a CSR
+    """
+    offsets, targets = csr
+    return targets[offsets[index]:offsets[index + 1]]
+
+
+def _group_links(course_ids, requires, fulfills):
+    """
+    Groups (course_id, milestone_id) pairs by course, as a dict of course id -> pair of lists of
+    the milestone ids it requires and fulfills, with an entry for each of the specified courses
+    """
+    grouped = {course_id: ([], []) for course_id in course_ids}
+    for position, links in enumerate((requires, fulfills)):
+        for course_id, milestone_id in links:
+            grouped.setdefault(course_id, ([], []))[position].append(milestone_id)
+    return grouped
+
+
+def _copy_runs(csr, runs, renumbered=None):
+    """
+    Returns a copy of a CSR holding only the sources in the specified (start, end) runs, which are
+    copied in bulk, with their targets mapped through 'renumbered' (an array) if specified
+    """
+    old_offsets, old_targets = csr
+    offsets = array('i', [0])
+    targets = array('i')
+    for start, end in runs:
+        shift = len(targets) - old_offsets[start]
+        run = old_targets[old_offsets[start]:old_offsets[end]]
+        targets.extend(run if renumbered is None else array('i', (renumbered[target] for target in run)))
+        offsets.extend(offset + shift for offset in old_offsets[start + 1:end + 1])
+    return offsets, targets
+
+
+class PrerequisiteGraph:
+    """
+    Course prerequisite graph, built from (course_id, milestone_id) pairs of 'requires'
+    links and of 'fulfills' links (course-level, or content-level by the content's course)
+    """
+
+    def __init__(self, requires, fulfills):
+        course_index = {}
+        milestone_index = {}
+        requires = {(_number(course_index, course_id), _number(milestone_index, milestone_id))
+                    for course_id, milestone_id in requires}
+        fulfills = {(_number(course_index, course_id), _number(milestone_index, milestone_id))
+                    for course_id, milestone_id in fulfills}
+        self._set_links(
+            course_index,
+            milestone_index,
+            _csr(len(course_index), requires),
+            _csr(len(course_index), fulfills),
+        )
+
+    @classmethod
+    def _from_links(cls, course_index, milestone_index, requires, fulfills):
+        """
+        Returns a graph made of the specified indexes and course-to-milestone CSRs, as they are
+        """
+        graph = cls.__new__(cls)
+        graph._set_links(course_index, milestone_index, requires, fulfills)
+        return graph
+
+    def _set_links(self, course_index, milestone_index, requires, fulfills):
+        """
+        Sets the indexes (dicts of id -> number) of the courses and milestones, and the
+        course-to-milestone CSRs, and derives the milestone-to-course CSRs from them
+        """
+        self.course_ids = list(course_index)
+        self._course_index = course_index
+        self.milestone_ids = array('q', milestone_index)
+        self._milestone_index = milestone_index
+        self._links = _Links(
+            requires,
+            fulfills,
+            _transpose(len(milestone_index), requires),
+            _transpose(len(milestone_index), fulfills),
+        )
+
+    def _unlinked_milestones(self, changed):
+        """
+        Returns the numbers of the milestones which are only linked to the changed courses, and
+        are not linked to them by the new links ('changed' maps each course id to a pair of lists
+        of the milestone ids it now requires and fulfills)
+        """
+        linked = {
+            milestone_id for links in changed.values() for milestone_ids in links for milestone_id in milestone_ids
+        }
+        dropped_links = {}
+        for course_id in changed:
+            course = self._course_index.get(course_id)
+            if course is not None:
+                for csr in (self._links.requires, self._links.fulfills):
+                    for milestone in _targets(csr, course):
+                        dropped_links[milestone] = dropped_links.get(milestone, 0) + 1
+        unlinked = set()
+        for milestone, count in dropped_links.items():
+            if count == sum(len(_targets(csr, milestone)) for csr in self._links[2:]):
+                if self.milestone_ids[milestone] not in linked:
+                    unlinked.add(milestone)
+        return unlinked
+
+    def _renumber_milestones(self, changed):
+        """
+        Returns the index of the milestones of the new graph, along with an array mapping the old
+        numbers to the new ones, or None when the milestones keep their numbers (nothing dropped)
+        """
+        unlinked = self._unlinked_milestones(changed)
+        if not unlinked:
+            return dict(self._milestone_index), None
+        milestone_index = {}
+        renumbered = array('i', [-1]) * len(self.milestone_ids)
+        for milestone, milestone_id in enumerate(self.milestone_ids):
+            if milestone not in unlinked:
+                renumbered[milestone] = _number(milestone_index, milestone_id)
+        return milestone_index, renumbered
+
+    def _copy_unchanged_courses(self, changed, renumbered):
+        """
+        Returns the ids of the unchanged courses, along with copies of the course-to-milestone CSRs
+        holding only their links
+        """
+        changed_courses = sorted(
+            self._course_index[course_id] for course_id in changed if course_id in self._course_index
+        )
+        runs = list(zip([0] + [course + 1 for course in changed_courses], changed_courses + [len(self.course_ids)]))
+        course_ids = []
+        for start, end in runs:
+            course_ids.extend(self.course_ids[start:end])
+        return course_ids, tuple(_copy_runs(csr, runs, renumbered) for csr in self._links[:2])
+
+    def replace_courses(self, course_ids, requires, fulfills):
+        """
+        Returns a new graph in which the links of the specified courses are replaced by the
+        specified (course_id, milestone_id) pairs; the links of other courses are kept as they are
+        The arrays of the other courses are copied over rather than rebuilt from pairs, and only
+        renumbered when some milestone is left without links; courses left without links are dropped
+        """
+        changed = _group_links(course_ids, requires, fulfills)
+        milestone_index, renumbered = self._renumber_milestones(changed)
+        kept_course_ids, csrs = self._copy_unchanged_courses(changed, renumbered)
+        # The changed courses go last, unless they were left without links
+        for course_id, links in changed.items():
+            if not (links[0] or links[1]):
+                continue
+            kept_course_ids.append(course_id)
+            for (offsets, targets), milestone_ids in zip(csrs, links):
+                targets.extend({_number(milestone_index, milestone_id) for milestone_id in milestone_ids})
+                offsets.append(len(targets))
+        course_index = dict(zip(kept_course_ids, range(len(kept_course_ids))))
+        return self._from_links(course_index, milestone_index, *csrs)
+
+    def prerequisites(self, course_id):
+        """
+        Returns the ids of the courses which fulfill the milestones required by the specified
+        course, and transitively those which fulfill the milestones they require, nearest first
+        """
+        start = self._course_index.get(course_id)
+        if start is None:
+            return []
+        seen = bytearray(len(self.course_ids))
+        seen[start] = 1
+        queue = deque([start])
+        prerequisites = []
+        while queue:
+            for milestone in _targets(self._links.requires, queue.popleft()):
+                for course in _targets(self._links.fulfilled_by, milestone):
+                    if not seen[course]:
+                        seen[course] = 1
+                        queue.append(course)
+                        prerequisites.append(self.course_ids[course])
+        return prerequisites
+
+    def unlocked(self, milestone_ids):
+        """
+        Returns the ids of the courses (with requirements) unlocked by the specified milestones,
+        and transitively those unlocked by the milestones which the unlocked courses fulfill, in
+        the order they are unlocked
+        """
+        collected = bytearray(len(self.milestone_ids))
+        queue = deque()
+        for milestone_id in milestone_ids:
+            milestone = self._milestone_index.get(milestone_id)
+            if milestone is not None and not collected[milestone]:
+                collected[milestone] = 1
+                queue.append(milestone)
+
+        offsets = self._links.requires[0]
+        # Number of required milestones not collected yet, for each course reached so far
+        remaining = {}
+        unlocked = []
+        while queue:
+            for course in _targets(self._links.required_by, queue.popleft()):
+                count = remaining.get(course, offsets[course + 1] - offsets[course]) - 1
+                remaining[course] = count
+                if count:
+                    continue
+                unlocked.append(self.course_ids[course])
+                for milestone in _targets(self._links.fulfills, course):
+                    if not collected[milestone]:
+                        collected[milestone] = 1
+                        queue.append(milestone)
+        return unlocked
@@ -0,0 +1,44 @@
+"""
+Management command which exports the milestone graph as JSON Lines (one row per line)
+
+    $ ./manage.py export_milestones > milestones.jsonl
+    $ ./manage.py export_milestones --output milestones.jsonl --batch-size 5000
+"""
+
+import json
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from milestones import api
+
+
+class Command(BaseCommand):
+    """
+    Streams every milestone, course, course content and user link to a file or stdout
+    """
+    help = 'Exports milestones and their course, course content and user links as JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help='File to write to (default: stdout)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows read from the database at a time')
+
+    def _export(self, stream, batch_size):
+        """
+        Writes one line per record to the stream, returning the number of records per model
+        """
+        counts = {}
+        for record in api.export_milestone_records(batch_size=batch_size):
+            stream.write(json.dumps(record, cls=DjangoJSONEncoder) + '\n')
+            counts[record['model']] = counts.get(record['model'], 0) + 1
+        return counts
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            self._export(self.stdout, options['batch_size'])
+            return
+
+        with open(options['output'], 'w', encoding='utf-8') as stream:
+            counts = self._export(stream, options['batch_size'])
+        for model_name, count in counts.items():
+            self.stderr.write(f'{model_name}: {count} exported')
@@ -0,0 +1,57 @@
+"""
+Management command which imports a milestone graph exported by export_milestones
+
+    $ ./manage.py import_milestones milestones.jsonl
+    $ ./manage.py import_milestones - --batch-size 5000 < milestones.jsonl
+"""
+
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from milestones import api, exceptions
+
+
+class Command(BaseCommand):
+    """
+    Upserts the records of a JSON Lines export, one batch at a time
+    """
+    help = 'Imports milestones and their course, course content and user links from JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="File to read from ('-' for stdin)")
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows written to the database at a time')
+
+    @staticmethod
+    def _read(stream):
+        """
+        Yields the record of each non-blank line of the stream
+        """
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                raise CommandError(f'Line {line_number} is not valid JSON: {exc}') from exc
+
+    def _import(self, stream, batch_size):
+        """
+        Imports the records of the stream, returning the number of records written per model
+        """
+        # Each batch is committed on its own, so that locks and transactions stay small; an
+        # interrupted import can simply be run again, since rows which exist are overwritten
+        try:
+            return api.import_milestone_records(self._read(stream), batch_size=batch_size)
+        except (exceptions.InvalidMilestoneException, exceptions.InvalidMilestoneRelationshipTypeException) as exc:
+            raise CommandError(str(exc)) from exc
+
+    def handle(self, *args, **options):
+        if options['input'] == '-':
+            counts = self._import(sys.stdin, options['batch_size'])
+        else:
+            with open(options['input'], encoding='utf-8') as stream:
+                counts = self._import(stream, options['batch_size'])
+        for model_name, count in counts.items():
+            self.stdout.write(f'{model_name}: {count} imported')
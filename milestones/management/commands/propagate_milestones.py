@@ -0,0 +1,68 @@
+"""
+Management command which runs (or resumes) the jobs reactivating the relationships of
+milestones reactivated with background propagation (ref: api.add_milestone)
+
+    $ ./manage.py propagate_milestones                  # every pending job
+    $ ./manage.py propagate_milestones 12 34            # the jobs of milestones 12 and 34
+    $ ./manage.py propagate_milestones --max-batches 10
+
+Jobs left behind by milestones which are no longer active are dropped, and reported on stderr,
+without stopping the other jobs.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from milestones import api, exceptions
+
+
+class Command(BaseCommand):
+    """
+    Runs (or resumes) milestone propagation jobs, reporting progress after each batch
+    """
+    help = 'Reactivates the relationships of milestones reactivated with background propagation'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'milestone_ids',
+            nargs='*',
+            type=int,
+            help='Milestones to propagate (default: every milestone with a pending job)'
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Number of batches of records after which to stop each job (it can be resumed later)'
+        )
+
+    def _report(self, checkpoint):
+        """
+        Writes the progress of a job to stdout
+        """
+        counts = ', '.join(f'{model}: {count}' for model, count in checkpoint['counts'].items())
+        status = 'done' if checkpoint['done'] else f"at {checkpoint['model']} #{checkpoint['last_pk']}"
+        self.stdout.write(f"Milestone {checkpoint['milestone_id']} {status} ({counts})")
+
+    def handle(self, *args, **options):
+        milestone_ids = options['milestone_ids'] or api.get_pending_milestone_propagations()
+        if not milestone_ids:
+            self.stdout.write('No pending milestone propagations')
+            return
+
+        stale = []
+        for milestone_id in milestone_ids:
+            try:
+                checkpoint = api.propagate_milestone(
+                    milestone_id,
+                    max_batches=options['max_batches'],
+                    progress=self._report
+                )
+            except exceptions.InvalidMilestoneException:
+                self.stderr.write(f'Milestone {milestone_id} is not an active milestone; its job was dropped')
+                stale.append(milestone_id)
+                continue
+            if not checkpoint['done']:
+                self.stdout.write(f'Milestone {milestone_id} paused; run this command again to resume')
+
+        if stale and options['milestone_ids']:
+            raise CommandError(f"Milestones {', '.join(map(str, stale))} are not active milestones")
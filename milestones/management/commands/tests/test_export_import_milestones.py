@@ -0,0 +1,154 @@
+# pylint: disable=no-member
+"""
+Tests for the export_milestones and import_milestones management commands
+"""
+
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+
+from milestones import api, models
+from milestones.tests import utils
+
+
+class ExportImportMilestonesTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestCaseBase):
+    """
+    Test Case module for the export_milestones and import_milestones management commands
+    """
+
+    def setUp(self):
+        """
+        Scaffolding: a milestone with course, course content and user links
+        """
+        super().setUp()
+        self.relationship_types = api.get_milestone_relationship_types()
+        self.milestone = self.add_test_milestone(
+            course_relationship=self.relationship_types['REQUIRES'],
+            content_relationship=self.relationship_types['FULFILLS'],
+            requirements={'min_score': 50},
+        )
+        api.add_user_milestones([{'id': user_id} for user_id in range(1, 6)], self.milestone)
+        models.UserMilestone.objects.filter(user_id=1).update(collected=timezone.now(), source='exam')
+        api.remove_user_milestone({'id': 5}, self.milestone)
+
+    def _export(self, **kwargs):
+        """ Runs export_milestones, returning the exported records """
+        out = StringIO()
+        call_command('export_milestones', stdout=out, **kwargs)
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def _import(self, lines, **kwargs):
+        """ Runs import_milestones on the specified lines, returning its output """
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as stream:
+            stream.write('\n'.join(lines) + '\n')
+        self.addCleanup(os.remove, stream.name)
+        out = StringIO()
+        call_command('import_milestones', stream.name, stdout=out, **kwargs)
+        return out.getvalue()
+
+    def test_export(self):
+        """ Unit Test: test_export """
+        # One query per page of each table (the five user links take three), and one for relationship types
+        with self.assertNumQueries(7):
+            records = self._export(batch_size=2)
+        self.assertEqual([record['model'] for record in records], [
+            'Milestone', 'CourseMilestone', 'CourseContentMilestone',
+            'UserMilestone', 'UserMilestone', 'UserMilestone', 'UserMilestone', 'UserMilestone',
+        ])
+        self.assertEqual(records[0]['namespace'], str(self.test_course_key))
+        self.assertEqual(records[1]['milestone'], [str(self.test_course_key), 'test_milestone'])
+        self.assertEqual(records[1]['relationship'], 'requires')
+        self.assertEqual(records[2]['requirements'], {'min_score': 50})
+        self.assertEqual(records[3]['source'], 'exam')
+        self.assertIsNotNone(records[3]['collected'])
+        self.assertFalse(records[7]['active'])
+
+    def test_export_new_milestone(self):
+        """ Unit Test: test_export_new_milestone """
+        records = api.export_milestone_records()
+        self.assertEqual(next(records)['model'], 'Milestone')
+        milestone = api.add_milestone({
+            'name': 'new_milestone',
+            'display_name': 'New Milestone',
+            'namespace': str(self.test_course_key),
+            'description': 'New Milestone Description',
+        })
+        api.add_course_milestone(self.test_alternate_course_key, self.relationship_types['FULFILLS'], milestone)
+
+        # The new milestone is exported ahead of its link, so that the records can still be imported in order
+        records = list(records)
+        self.assertEqual(
+            [record['model'] for record in records[:3]], ['CourseMilestone', 'Milestone', 'CourseMilestone']
+        )
+        self.assertEqual(records[1]['name'], 'new_milestone')
+        self.assertEqual(records[2]['milestone'], [str(self.test_course_key), 'new_milestone'])
+
+    def test_round_trip(self):
+        """ Unit Test: test_round_trip """
+        lines = [json.dumps(record) for record in self._export()]
+        models.UserMilestone.objects.all().delete()
+        models.CourseContentMilestone.objects.all().delete()
+        models.CourseMilestone.objects.all().delete()
+        models.Milestone.objects.all().delete()
+
+        output = self._import(lines, batch_size=2)
+        self.assertIn('UserMilestone: 5 imported', output)
+        milestone = api.get_milestones(str(self.test_course_key))[0]
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 1)
+        self.assertEqual(
+            api.get_course_content_milestones(self.test_course_key, self.test_content_key)[0]['requirements'],
+            {'min_score': 50}
+        )
+        self.assertEqual(
+            api.users_have_milestone([1, 2, 3, 4, 5], milestone),
+            {1: True, 2: True, 3: True, 4: True, 5: False}
+        )
+        self.assertEqual(models.UserMilestone.objects.get(user_id=1).source, 'exam')
+
+        # Importing again overwrites the existing rows
+        self.assertIn('UserMilestone: 5 imported', self._import(lines))
+        self.assertEqual(models.UserMilestone.objects.count(), 5)
+
+    def test_import_requirements_text(self):
+        """ Unit Test: test_import_requirements_text """
+        records = self._export()
+        # Earlier exports carry the requirements as JSON text
+        records[2]['requirements'] = json.dumps({'min_score': 80})
+        self._import([json.dumps(record) for record in records])
+        self.assertEqual(
+            api.get_course_content_milestones(self.test_course_key, self.test_content_key)[0]['requirements'],
+            {'min_score': 80}
+        )
+
+    def test_import_unknown_milestone(self):
+        """ Unit Test: test_import_unknown_milestone """
+        record = {
+            'model': 'UserMilestone', 'user_id': 1, 'milestone': ['unknown', 'milestone'],
+            'source': '', 'collected': None, 'active': True,
+        }
+        with self.assertRaises(CommandError):
+            self._import([json.dumps(record)])
+        with self.assertRaises(CommandError):
+            self._import(['not json'])
+
+    def test_import_failure_invalidates(self):
+        """ Unit Test: test_import_failure_invalidates """
+        records = self._export()
+        models.CourseMilestone.objects.all().delete()
+        models.UserMilestone.objects.filter(user_id=2).delete()
+        # Cache the state before the import
+        self.assertEqual(api.get_course_milestones(self.test_course_key), [])
+        self.assertFalse(api.user_has_milestone({'id': 2}, self.milestone))
+
+        self.assertEqual(records[4]['user_id'], 2)
+        unknown = dict(records[1], milestone=['unknown', 'milestone'])
+        lines = [json.dumps(record) for record in (records[1], records[4], unknown)]
+        with self.assertRaises(CommandError):
+            self._import(lines, batch_size=1)
+        # The links flushed before the unknown milestone was found are visible through the api
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 1)
+        self.assertTrue(api.user_has_milestone({'id': 2}, self.milestone))
@@ -0,0 +1,71 @@
+# pylint: disable=no-member
+"""
+Tests for the propagate_milestones management command
+"""
+
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+
+from milestones import api, models
+from milestones.tests import utils
+
+
+class PropagateMilestonesTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestCaseBase):
+    """
+    Test Case module for the propagate_milestones management command
+    """
+
+    def setUp(self):
+        """
+        Scaffolding: a milestone reactivated with background propagation
+        """
+        super().setUp()
+        self.milestone = self.add_test_milestone()
+        api.add_user_milestones([{'id': user_id} for user_id in range(1, 4)], self.milestone)
+        api.remove_milestone(self.milestone['id'])
+        api.add_milestone(self.milestone, background=True)
+
+    def _call(self, *args, **kwargs):
+        """ Runs the command, returning its output """
+        out = StringIO()
+        call_command('propagate_milestones', *args, stdout=out, **kwargs)
+        return out.getvalue()
+
+    def test_propagate_pending(self):
+        """ Unit Test: test_propagate_pending """
+        with self.settings(MILESTONES_BATCH_SIZE=2):
+            output = self._call(max_batches=2)
+            self.assertIn('paused', output)
+            output = self._call()
+        self.assertIn(f"Milestone {self.milestone['id']} done", output)
+        self.assertIn('UserMilestone: 3', output)
+        self.assertEqual(self._call(), 'No pending milestone propagations\n')
+        self.assertTrue(all(api.users_have_milestone([1, 2, 3], self.milestone).values()))
+
+    def test_propagate_explicit_ids(self):
+        """ Unit Test: test_propagate_explicit_ids """
+        output = self._call(str(self.milestone['id']))
+        self.assertIn('done', output)
+        with self.assertRaises(CommandError):
+            self._call('999')
+
+    def test_stale_jobs_dropped(self):
+        """ Unit Test: test_stale_jobs_dropped """
+        stale = api.add_milestone({
+            'name': 'stale_milestone',
+            'display_name': 'Stale Milestone',
+            'namespace': str(self.test_course_key),
+            'description': 'Stale Milestone Description',
+        })
+        api.remove_milestone(stale['id'])
+        api.add_milestone(stale, background=True)
+        api.remove_milestone(stale['id'])
+        # A job left behind for a milestone removed since (ex. by an older release)
+        models.MilestonePropagation.objects.create(milestone_id=stale['id'], model='CourseMilestone')
+
+        err = StringIO()
+        output = self._call(stderr=err)
+        self.assertIn(f"Milestone {stale['id']} is not an active milestone", err.getvalue())
+        self.assertIn(f"Milestone {self.milestone['id']} done", output)
+        self.assertEqual(api.get_pending_milestone_propagations(), [])
@@ -0,0 +1,23 @@
+"""
+Django middleware provided by the Milestones app
+"""
+
+from . import caching
+
+
+class RequestCacheMiddleware:  # pylint: disable=too-few-public-methods
+    """
+    Opt-in middleware which memoizes Milestones lookups for the duration of each request
+
+    For example, a courseware render which asks for the content milestones of each block
+    (MilestonesService.get_course_content_milestones) issues one course-wide query instead
+    of one per block. Add 'milestones.middleware.RequestCacheMiddleware' to MIDDLEWARE, or
+    wrap non-request work in caching.request_cache() for the same effect.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with caching.request_cache():
+            return self.get_response(request)
@@ -0,0 +1,99 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('milestones', '0004_auto_20151221_1445'),
+    ]
+
+    # The composite indexes are created first, so that the foreign keys keep a covering
+    # index (required by MySQL) while their single-column indexes are dropped
+    operations = [
+        migrations.AddIndex(
+            model_name='coursecontentmilestone',
+            index=models.Index(fields=['course_id', 'active', 'milestone_relationship_type'], name='ccm_course_active_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursecontentmilestone',
+            index=models.Index(fields=['content_id', 'active'], name='ccm_content_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursecontentmilestone',
+            index=models.Index(fields=['milestone', 'active'], name='ccm_milestone_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursemilestone',
+            index=models.Index(fields=['course_id', 'active', 'milestone_relationship_type'], name='cm_course_active_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursemilestone',
+            index=models.Index(fields=['milestone', 'active'], name='cm_milestone_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usermilestone',
+            index=models.Index(fields=['user_id', 'active', 'milestone'], name='um_user_active_milestone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usermilestone',
+            index=models.Index(fields=['milestone', 'active'], name='um_milestone_active_idx'),
+        ),
+        migrations.AlterField(
+            model_name='coursecontentmilestone',
+            name='active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='coursecontentmilestone',
+            name='content_id',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='coursecontentmilestone',
+            name='course_id',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='coursecontentmilestone',
+            name='milestone',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='milestones.milestone'),
+        ),
+        migrations.AlterField(
+            model_name='coursemilestone',
+            name='active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='coursemilestone',
+            name='course_id',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='coursemilestone',
+            name='milestone',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='milestones.milestone'),
+        ),
+        migrations.AlterField(
+            model_name='milestone',
+            name='namespace',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='usermilestone',
+            name='active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='usermilestone',
+            name='milestone',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='milestones.milestone'),
+        ),
+        migrations.AlterField(
+            model_name='usermilestone',
+            name='user_id',
+            field=models.IntegerField(),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:00
+
+from django.db import migrations, models
+import milestones.models
+
+BATCH_SIZE = 1000
+
+
+def backfill_key_hashes(apps, schema_editor):
+    """
+    Computes the key hash columns of the existing rows, one batch of primary keys at a time
+    """
+    for model_name, fields in (
+        ('CourseMilestone', ('course_id',)),
+        ('CourseContentMilestone', ('course_id', 'content_id')),
+    ):
+        model = apps.get_model('milestones', model_name)
+        hash_fields = [f'{field}_hash' for field in fields]
+        last_pk = 0
+        while True:
+            records = list(model.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', *fields)[:BATCH_SIZE])
+            if not records:
+                break
+            for record in records:
+                for field in fields:
+                    setattr(record, f'{field}_hash', milestones.models.key_hash(getattr(record, field)))
+            model.objects.bulk_update(records, hash_fields)
+            last_pk = records[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Backfill batches are committed as they go, so that large tables are not locked throughout
+    atomic = False
+
+    dependencies = [
+        ('milestones', '0005_composite_indexes'),
+    ]
+
+    # The old indexes are only dropped once the hash columns are filled and indexed
+    operations = [
+        migrations.AddField(
+            model_name='coursecontentmilestone',
+            name='content_id_hash',
+            field=milestones.models.KeyHashField(editable=False, null=True, source='content_id'),
+        ),
+        migrations.AddField(
+            model_name='coursecontentmilestone',
+            name='course_id_hash',
+            field=milestones.models.KeyHashField(editable=False, null=True, source='course_id'),
+        ),
+        migrations.AddField(
+            model_name='coursemilestone',
+            name='course_id_hash',
+            field=milestones.models.KeyHashField(editable=False, null=True, source='course_id'),
+        ),
+        migrations.RunPython(backfill_key_hashes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='coursecontentmilestone',
+            index=models.Index(fields=['course_id_hash', 'active', 'milestone_relationship_type'], name='ccm_course_hash_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursecontentmilestone',
+            index=models.Index(fields=['content_id_hash', 'active'], name='ccm_content_hash_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursemilestone',
+            index=models.Index(fields=['course_id_hash', 'active', 'milestone_relationship_type'], name='cm_course_hash_active_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='coursecontentmilestone',
+            name='ccm_course_active_type_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='coursecontentmilestone',
+            name='ccm_content_active_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='coursemilestone',
+            name='cm_course_active_type_idx',
+        ),
+    ]
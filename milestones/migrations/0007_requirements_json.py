@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:11
+
+import json
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def normalize_blank_requirements(apps, schema_editor):
+    """
+    Clears the requirements which are blank (or otherwise not JSON), one batch of primary keys
+    at a time, so that the column can be converted to a native JSON type
+    """
+    model = apps.get_model('milestones', 'CourseContentMilestone')
+    last_pk = 0
+    while True:
+        rows = list(
+            model.objects.filter(pk__gt=last_pk, requirements__isnull=False).order_by('pk').values_list(
+                'pk', 'requirements'
+            )[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        invalid = []
+        for pk, requirements in rows:
+            try:
+                json.loads(requirements)
+            except ValueError:
+                invalid.append(pk)
+        if invalid:
+            model.objects.filter(pk__in=invalid).update(requirements=None)
+        last_pk = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+    # Backfill batches are committed as they go, so that large tables are not locked throughout
+    atomic = False
+
+    dependencies = [
+        ('milestones', '0006_key_hash_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_blank_requirements, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='coursecontentmilestone',
+            name='requirements',
+            field=models.JSONField(blank=True, help_text='Stores JSON data required to determine milestone fulfillment', null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('milestones', '0007_requirements_json'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='milestone',
+            index=models.Index(fields=['namespace', 'active'], name='milestone_namespace_active_idx'),
+        ),
+    ]
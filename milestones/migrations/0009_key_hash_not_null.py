@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:05
+
+from django.db import migrations
+import milestones.models
+
+BATCH_SIZE = 1000
+
+
+def backfill_missing_key_hashes(apps, schema_editor):
+    """
+    Computes the key hash columns left NULL (rows written by older code since 0006_key_hash_columns
+    ran), one batch of primary keys at a time, so that the columns can be made non-null
+    """
+    for model_name, fields in (
+        ('CourseMilestone', ('course_id',)),
+        ('CourseContentMilestone', ('course_id', 'content_id')),
+    ):
+        model = apps.get_model('milestones', model_name)
+        hash_fields = [f'{field}_hash' for field in fields]
+        missing = model.objects.none()
+        for hash_field in hash_fields:
+            missing |= model.objects.filter(**{f'{hash_field}__isnull': True})
+        last_pk = 0
+        while True:
+            records = list(missing.filter(pk__gt=last_pk).order_by('pk').only('pk', *fields)[:BATCH_SIZE])
+            if not records:
+                break
+            for record in records:
+                for field in fields:
+                    setattr(record, f'{field}_hash', milestones.models.key_hash(getattr(record, field)))
+            model.objects.bulk_update(records, hash_fields)
+            last_pk = records[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Backfill batches are committed as they go, so that large tables are not locked throughout
+    atomic = False
+
+    dependencies = [
+        ('milestones', '0008_milestone_namespace_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_missing_key_hashes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='coursecontentmilestone',
+            name='content_id_hash',
+            field=milestones.models.KeyHashField(editable=False, source='content_id'),
+        ),
+        migrations.AlterField(
+            model_name='coursecontentmilestone',
+            name='course_id_hash',
+            field=milestones.models.KeyHashField(editable=False, source='course_id'),
+        ),
+        migrations.AlterField(
+            model_name='coursemilestone',
+            name='course_id_hash',
+            field=milestones.models.KeyHashField(editable=False, source='course_id'),
+        ),
+    ]
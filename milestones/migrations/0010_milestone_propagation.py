@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('milestones', '0009_key_hash_not_null'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MilestonePropagation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('model', models.CharField(max_length=255)),
+                ('last_pk', models.IntegerField(blank=True, null=True)),
+                ('counts', models.JSONField(default=dict)),
+                ('milestone', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='milestones.milestone')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
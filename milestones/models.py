@@ -7,10 +7,44 @@ which leverages Django's signal framework.
 """
 
 
+import hashlib
+
 from django.db import models
 from model_utils.models import TimeStampedModel
 
 
+def key_hash(key):
+    """
+    64-bit digest of a course/content key string, signed to fit a BigIntegerField
+    """
+    return int.from_bytes(hashlib.blake2b(str(key).encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+class KeyHashField(models.BigIntegerField):
+    """
+    Fixed-width digest (ref: key_hash) of another key field of the model, which makes for far
+    more compact indexes than the key strings themselves.  Like model_utils' timestamp fields,
+    the value is computed whenever the row is saved, including by bulk_create (but not by
+    QuerySet.update or bulk_update, which do not alter keys in this app), so that it is never
+    NULL.  Digests may collide, so lookups must also compare the key strings.
+    """
+
+    def __init__(self, *args, source=None, **kwargs):
+        self.source = source
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['source'] = self.source
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = key_hash(getattr(model_instance, self.source))
+        setattr(model_instance, self.attname, value)
+        return value
+
+
 class Milestone(TimeStampedModel):
     """
     A Milestone is a representation of an accomplishment which can be
@@ -22,7 +56,7 @@ class Milestone(TimeStampedModel):
 
     .. no_pii:
     """
-    namespace = models.CharField(max_length=255, db_index=True)
+    namespace = models.CharField(max_length=255)  # Indexed by unique_together
     name = models.CharField(max_length=255, db_index=True)
     display_name = models.CharField(max_length=255)
     description = models.TextField()
@@ -31,6 +65,10 @@ class Milestone(TimeStampedModel):
     class Meta:
         """ Meta class for this Django model """
         unique_together = (("namespace", "name"),)
+        # Matched to the paged lookups in data.py, which seek on the (implicitly appended) primary key
+        indexes = [
+            models.Index(fields=['namespace', 'active'], name='milestone_namespace_active_idx'),
+        ]
 
     def __str__(self):
         return str(self.namespace)
@@ -89,15 +127,23 @@ class CourseMilestone(TimeStampedModel):
 
     .. no_pii:
     """
-    course_id = models.CharField(max_length=255, db_index=True)
-    milestone = models.ForeignKey(Milestone, db_index=True, on_delete=models.CASCADE)
+    course_id = models.CharField(max_length=255)
+    course_id_hash = KeyHashField(source='course_id')
+    milestone = models.ForeignKey(Milestone, db_index=False, on_delete=models.CASCADE)
     milestone_relationship_type = models.ForeignKey(MilestoneRelationshipType, db_index=True,
                                                     on_delete=models.CASCADE)
-    active = models.BooleanField(default=True, db_index=True)
+    active = models.BooleanField(default=True)
 
     class Meta:
         """ Meta class for this Django model """
         unique_together = (("course_id", "milestone"),)
+        # Matched to the lookups in data.py; these also cover the milestone column
+        indexes = [
+            models.Index(
+                fields=['course_id_hash', 'active', 'milestone_relationship_type'], name='cm_course_hash_active_idx'
+            ),
+            models.Index(fields=['milestone', 'active'], name='cm_milestone_active_idx'),
+        ]
 
     def __str__(self):
         return f"{self.course_id}:{self.milestone_relationship_type}:{self.milestone}"
@@ -116,22 +162,31 @@ class CourseContentMilestone(TimeStampedModel):
 
     .. no_pii:
     """
-    course_id = models.CharField(max_length=255, db_index=True)
-    content_id = models.CharField(max_length=255, db_index=True)
-    milestone = models.ForeignKey(Milestone, db_index=True, on_delete=models.CASCADE)
+    course_id = models.CharField(max_length=255)
+    course_id_hash = KeyHashField(source='course_id')
+    content_id = models.CharField(max_length=255)
+    content_id_hash = KeyHashField(source='content_id')
+    milestone = models.ForeignKey(Milestone, db_index=False, on_delete=models.CASCADE)
     milestone_relationship_type = models.ForeignKey(MilestoneRelationshipType, db_index=True,
                                                     on_delete=models.CASCADE)
-    requirements = models.CharField(
-        max_length=255,
+    requirements = models.JSONField(
         blank=True,
         null=True,
         help_text="Stores JSON data required to determine milestone fulfillment"
     )
-    active = models.BooleanField(default=True, db_index=True)
+    active = models.BooleanField(default=True)
 
     class Meta:
         """ Meta class for this Django model """
         unique_together = (("course_id", "content_id", "milestone"),)
+        # Matched to the lookups in data.py; these also cover the milestone column
+        indexes = [
+            models.Index(
+                fields=['course_id_hash', 'active', 'milestone_relationship_type'], name='ccm_course_hash_active_idx'
+            ),
+            models.Index(fields=['content_id_hash', 'active'], name='ccm_content_hash_active_idx'),
+            models.Index(fields=['milestone', 'active'], name='ccm_milestone_active_idx'),
+        ]
 
     def __str__(self):
         return f"{self.content_id}:{self.milestone_relationship_type}:{self.milestone}"
@@ -154,15 +209,38 @@ class UserMilestone(TimeStampedModel):
 
     .. no_pii:
     """
-    user_id = models.IntegerField(db_index=True)
-    milestone = models.ForeignKey(Milestone, db_index=True, on_delete=models.CASCADE)
+    user_id = models.IntegerField()
+    milestone = models.ForeignKey(Milestone, db_index=False, on_delete=models.CASCADE)
     source = models.TextField(blank=True)
     collected = models.DateTimeField(blank=True, null=True)
-    active = models.BooleanField(default=True, db_index=True)
+    active = models.BooleanField(default=True)
 
     class Meta:
         """ Meta class for this Django model """
         unique_together = ("user_id", "milestone")
+        # Matched to the lookups in data.py; these also cover the user_id and milestone columns
+        indexes = [
+            models.Index(fields=['user_id', 'active', 'milestone'], name='um_user_active_milestone_idx'),
+            models.Index(fields=['milestone', 'active'], name='um_milestone_active_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user_id}:{self.milestone}"
+
+
+class MilestonePropagation(TimeStampedModel):
+    """
+    A MilestonePropagation is the checkpoint of the pending job which reactivates the
+    relationships of a milestone reactivated with background propagation: the model and
+    the last primary key processed, with per-model counts of the reactivated records.
+    The record exists for as long as the job is pending, whichever process runs it.
+
+    .. no_pii:
+    """
+    milestone = models.OneToOneField(Milestone, on_delete=models.CASCADE)
+    model = models.CharField(max_length=255)
+    last_pk = models.IntegerField(blank=True, null=True)
+    counts = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f"{self.milestone}:{self.model}:{self.last_pk}"
@@ -0,0 +1,211 @@
+# pylint: disable=no-member
+"""
+Jobs which reactivate the relationships of a milestone reactivated with background
+propagation (ref: data.create_milestone), and the process-local runner for them.
+
+Jobs are resumable, so a job interrupted along with its process (ex. by a deployment)
+can be picked up again with the 'propagate_milestones' management command.  Their
+checkpoints are stored in the database (ref: models.MilestonePropagation), in the same
+transaction as the reactivation of the milestone, so that no job is lost to a cache
+eviction or to a cache which is not shared with the process running the command.
+
+Settings:
+* MILESTONES_PROPAGATION_WORKERS: threads available to run jobs (default: 1); 0 leaves
+  every job to the management command
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, models
+
+from . import caching
+from . import exceptions
+from . import models as internal
+from . import queries
+
+DEFAULT_PROPAGATION_WORKERS = 1
+
+# Relationships reactivated along with their milestone, in the order processed by propagate_milestone
+PROPAGATED_MODELS = (internal.CourseMilestone, internal.CourseContentMilestone, internal.UserMilestone)
+
+log = logging.getLogger(__name__)
+
+_executor = None  # pylint: disable=invalid-name
+_executor_lock = threading.Lock()
+
+
+def _new_propagation(milestone_id):
+    """
+    Returns the checkpoint of a propagation job which has not processed any records yet
+    """
+    return {
+        'milestone_id': milestone_id,
+        'model': PROPAGATED_MODELS[0].__name__,
+        'last_pk': None,
+        'counts': {model.__name__: 0 for model in PROPAGATED_MODELS},
+        'done': False,
+    }
+
+
+def _serialize_propagation(record):
+    """
+    Propagation job record-to-checkpoint serialization
+    """
+    return {
+        'milestone_id': record.milestone_id,
+        'model': record.model,
+        'last_pk': record.last_pk,
+        'counts': dict(record.counts),
+        'done': False,
+    }
+
+
+def _save_propagation(checkpoint):
+    """
+    Stores the checkpoint of the pending propagation job of a milestone
+    """
+    internal.MilestonePropagation.objects.update_or_create(
+        milestone_id=checkpoint['milestone_id'],
+        defaults={'model': checkpoint['model'], 'last_pk': checkpoint['last_pk'], 'counts': checkpoint['counts']},
+    )
+
+
+def clear_propagation(milestone_id):
+    """
+    Drops the checkpoint of the propagation job of a milestone (once the job is done, or stale)
+    """
+    internal.MilestonePropagation.objects.filter(milestone_id=milestone_id).delete()
+
+
+def _check_propagated_milestone(milestone_id):
+    """
+    Ensures that the milestone of a propagation job is (still) active, dropping the stale job if not
+    Raises InvalidMilestoneException if the milestone is missing or inactive
+    """
+    if not internal.Milestone.objects.filter(id=milestone_id, active=models.Value(True)).exists():
+        clear_propagation(milestone_id)
+        exceptions.raise_exception("Milestone", {'id': milestone_id}, exceptions.InvalidMilestoneException)
+
+
+def _invalidate_propagated_records(model, pks):
+    """
+    Invalidates the cached state affected by the (re)activation of the specified records
+    """
+    if model is internal.CourseMilestone:
+        caching.invalidate_courses(model.objects.filter(pk__in=pks).values_list('course_id', flat=True).distinct())
+    elif model is internal.CourseContentMilestone:
+        caching.invalidate_course_index()
+    else:
+        caching.invalidate_users(model.objects.filter(pk__in=pks).values_list('user_id', flat=True))
+
+
+def _get_workers():
+    """
+    Returns the number of threads available to run propagation jobs
+    """
+    return getattr(settings, 'MILESTONES_PROPAGATION_WORKERS', DEFAULT_PROPAGATION_WORKERS)
+
+
+def _get_executor():
+    """
+    Returns the thread pool which runs propagation jobs, creating it on first use
+    """
+    global _executor  # pylint: disable=global-statement
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_get_workers(), thread_name_prefix='milestones-propagation')
+        return _executor
+
+
+def _run(milestone_id):
+    """
+    Runs the propagation job of a milestone to completion, on a worker thread
+    """
+    try:
+        return propagate_milestone(milestone_id)
+    except Exception:  # pylint: disable=broad-except
+        log.exception('Propagation of milestone %s failed; it can be resumed with propagate_milestones', milestone_id)
+        raise
+    finally:
+        # Worker threads get their own connections, which Django would otherwise never close
+        connections.close_all()
+
+
+def submit(milestone_id):
+    """
+    Schedules the propagation job of a milestone on the thread pool
+    Returns a concurrent.futures.Future, or None if background workers are disabled
+    """
+    if _get_workers() <= 0:
+        return None
+    return _get_executor().submit(_run, milestone_id)
+
+
+def start_propagation(milestone_id):
+    """
+    Records the checkpoint of a new propagation job, which has not processed any records yet
+    """
+    _save_propagation(_new_propagation(milestone_id))
+
+
+def fetch_milestone_propagation(milestone_id):
+    """
+    Retrieves the checkpoint of the pending propagation job of a milestone (ref: propagate_milestone)
+    Returns None if the milestone has no pending job
+    """
+    record = internal.MilestonePropagation.objects.filter(milestone_id=milestone_id).first()
+    return _serialize_propagation(record) if record is not None else None
+
+
+def fetch_pending_milestone_propagations():
+    """
+    Retrieves the ids of the milestones with a pending propagation job, oldest first
+    """
+    return list(internal.MilestonePropagation.objects.order_by('pk').values_list('milestone_id', flat=True))
+
+
+def propagate_milestone(milestone_id, max_batches=None, progress=None):
+    """
+    Runs (or resumes) the job which reactivates the relationships of a milestone reactivated with
+    data.create_milestone(..., background=True), one batch of records at a time (ref: queries.get_batch_size)
+
+    The job records a checkpoint (the model and the last primary key processed) after each batch,
+    so that it can be resumed where it stopped; without a checkpoint, it starts over, which is safe
+    since only inactive records are updated.  Optionally pass in 'max_batches' to stop after
+    that many batches, and 'progress' to have a callable invoked with the checkpoint after each batch
+    Returns the last checkpoint, in which 'done' is True once every relationship has been processed
+
+    The milestone is checked before every batch, so that a job stops (and its checkpoint is dropped)
+    as soon as the milestone is removed again; InvalidMilestoneException is then raised
+    """
+    checkpoint = fetch_milestone_propagation(milestone_id) or _new_propagation(milestone_id)
+    model_names = [model.__name__ for model in PROPAGATED_MODELS]
+    batch_size = queries.get_batch_size()
+    batches = 0
+    for model in PROPAGATED_MODELS[model_names.index(checkpoint['model']):]:
+        if checkpoint['model'] != model.__name__:
+            checkpoint.update(model=model.__name__, last_pk=None)
+        queryset = model.objects.filter(milestone_id=milestone_id)
+        pks = [None] * batch_size
+        while len(pks) == batch_size:
+            _check_propagated_milestone(milestone_id)
+            if max_batches is not None and batches >= max_batches:
+                return checkpoint
+            pks, count = queries.set_records_active_batch(queryset, True, checkpoint['last_pk'], batch_size)
+            batches += 1
+            if pks:
+                _invalidate_propagated_records(model, pks)
+                checkpoint['last_pk'] = pks[-1]
+                checkpoint['counts'][model.__name__] += count
+                _save_propagation(checkpoint)
+                if progress is not None:
+                    progress(dict(checkpoint))
+
+    checkpoint['done'] = True
+    clear_propagation(milestone_id)
+    if progress is not None:
+        progress(dict(checkpoint))
+    return checkpoint
@@ -0,0 +1,243 @@
+# pylint: disable=no-member
+"""
+Query building blocks shared by the data layer modules (data.py, transfer.py and
+propagation.py): batching and keyset pagination, key and relationship type
+lookups, the querysets of the active links (and the links of the prerequisite graph),
+and set-based (de)activation of records.
+
+Like caching.py, this module should only be called by the data layer itself.
+
+Settings:
+* MILESTONES_BATCH_SIZE: rows handled per statement by bulk operations (default: 1000)
+"""
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from . import caching
+from . import exceptions
+from . import models as internal
+from . import serializers
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def get_batch_size():
+    """
+    Number of rows handled per statement by the bulk operations of the data layer
+    Configurable via the MILESTONES_BATCH_SIZE setting
+    """
+    return getattr(settings, 'MILESTONES_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+
+def chunks(items, size):
+    """
+    Splits a list into consecutive chunks of at most 'size' items
+    """
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
+
+def iter_rows(queryset, columns, serialize, batch_size=None):
+    """
+    Streams the rows of a queryset, serialized one at a time, with keyset pagination on the
+    primary key: each page of 'batch_size' rows (ref: get_batch_size) is a short, separate
+    query read through a database iterator, so memory use does not grow with the result
+    """
+    batch_size = batch_size or get_batch_size()
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        count = 0
+        for row in page.order_by('pk').values_list('pk', *columns)[:batch_size].iterator(chunk_size=batch_size):
+            last_pk = row[0]
+            count += 1
+            yield serialize(row[1:])
+        if count < batch_size:
+            return
+
+
+def fetch_page(queryset, columns, serialize, after_pk, page_size):
+    """
+    Retrieves one page of a queryset, serialized, with keyset pagination on the primary key:
+    the rows after 'after_pk', in one range query whatever the depth of the page
+    Pages hold DEFAULT_PAGE_SIZE rows unless specified, and never more than MAX_PAGE_SIZE
+    Returns a (results, last_pk) tuple, where last_pk is None once the last page is reached
+    """
+    page_size = min(page_size or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    if after_pk is not None:
+        queryset = queryset.filter(pk__gt=after_pk)
+    # One row past the page tells whether another page follows
+    rows = list(queryset.order_by('pk').values_list('pk', *columns)[:page_size + 1])
+    last_pk = rows[page_size - 1][0] if len(rows) > page_size else None
+    return [serialize(row[1:]) for row in rows[:page_size]], last_pk
+
+
+def key_lookup(field, keys):
+    """
+    Filter on a course/content key field which seeks through its compact hash column (ref:
+    models.KeyHashField), while still comparing the key strings to rule out digest collisions
+    """
+    keys = [str(key) for key in keys]
+    if len(keys) == 1:
+        return models.Q(**{f'{field}_hash': internal.key_hash(keys[0]), field: keys[0]})
+    return models.Q(**{f'{field}_hash__in': [internal.key_hash(key) for key in keys], f'{field}__in': keys})
+
+
+def get_milestone_relationship_type(relationship):
+    """
+    Retrieves milestone relationship type object from the process-local registry (ref: caching.py)
+    """
+    relationship_type = caching.get_relationship_type(relationship)
+    if relationship_type is None:
+        exceptions.raise_exception(
+            "MilestoneRelationshipType",
+            {'name': relationship},
+            exceptions.InvalidMilestoneRelationshipTypeException
+        )
+    return relationship_type
+
+
+def user_has_milestone(user_id, milestone_ref='milestone_id'):
+    """
+    Correlated EXISTS on the (user_id, active, milestone) index, true for the rows of the outer
+    query whose milestone ('milestone_ref') the specified user has collected
+    Negate it for an anti-join, which the database can stop probing at the first match
+    """
+    return models.Exists(internal.UserMilestone.objects.filter(
+        user_id=user_id,
+        active=models.Value(True),
+        milestone_id=models.OuterRef(milestone_ref),
+    ))
+
+
+def set_records_active_batch(queryset, active, after_pk, batch_size):
+    """
+    Flips the 'active' flag (and bumps 'modified') of the next batch of records in the queryset
+    which need it, taken in primary key order after 'after_pk' (None to start from the beginning)
+    Model signals are not sent for the updated records
+    Returns a tuple of (list of the primary keys in the batch, number of records which were updated)
+    """
+    batch = queryset.filter(active=models.Value(not active)).order_by('pk')
+    if after_pk is not None:
+        batch = batch.filter(pk__gt=after_pk)
+    pks = list(batch.values_list('pk', flat=True)[:batch_size])
+    if not pks:
+        return pks, 0
+    count = queryset.model.objects.filter(
+        pk__in=pks,
+        active=models.Value(not active)
+    ).update(active=active, modified=timezone.now())
+    return pks, count
+
+
+def set_records_active(queryset, active):
+    """
+    Set-based counterpart of data._activate_record/_inactivate_record, for potentially large sets of rows
+    Flips the 'active' flag of the records in the queryset which need it, one bounded batch of
+    primary keys at a time (ref: get_batch_size) so that row locks stay short
+    Returns the number of records which were updated
+    """
+    batch_size = get_batch_size()
+    total = 0
+    last_pk = None
+    while True:
+        pks, count = set_records_active_batch(queryset, active, last_pk, batch_size)
+        total += count
+        if len(pks) < batch_size:
+            return total
+        last_pk = pks[-1]
+
+
+def insert_records(queryset, records, key_fields):
+    """
+    Bulk inserts the records, skipping any which conflict with an existing row (ex. one inserted
+    concurrently, which is not an error: the link exists either way)
+    The records share one creation time, by which the rows actually inserted are told apart when
+    re-selected through 'queryset', which must cover them
+    Returns the number of records which were inserted
+    """
+    created = timezone.now()
+    for record in records:
+        record.created = created
+    queryset.model.objects.bulk_create(records, batch_size=get_batch_size(), ignore_conflicts=True)
+    keys = {tuple(getattr(record, field) for field in key_fields) for record in records}
+    return sum(1 for key in queryset.filter(created=created).values_list(*key_fields) if key in keys)
+
+
+def course_content_milestones_queryset(course_key, relationship, user):
+    """
+    Queryset of the active links to the content of the specified course (or of any course)
+    Raises InvalidMilestoneRelationshipTypeException for an unknown relationship type
+    """
+    queryset = internal.CourseContentMilestone.objects.filter(
+        active=models.Value(True)
+    )
+
+    if course_key is not None:
+        queryset = queryset.filter(key_lookup('course_id', [course_key]))
+
+    if relationship is not None:
+        mrt = get_milestone_relationship_type(relationship)
+        queryset = queryset.filter(milestone_relationship_type=mrt.id)
+
+        # Filter for unfulfilled milestones for the given user
+        if relationship == 'requires' and user and user.get('id'):
+            queryset = queryset.filter(~user_has_milestone(user['id']))
+
+    return queryset
+
+
+def milestones_links_queryset(model, milestones, relationship):
+    """
+    Queryset of the active course (or course content) links to any of the specified milestones
+    Returns None if no active relationship type exists with the specified name
+    """
+    queryset = model.objects.filter(
+        milestone__in=[serializers.deserialize_milestone(milestone).id for milestone in milestones],
+        active=models.Value(True)
+    )
+
+    # if milestones relationship type found then apply the filter
+    if relationship is not None:
+        mrt = caching.get_relationship_type(relationship)
+        if mrt is None:
+            return None
+        queryset = queryset.filter(
+            milestone_relationship_type=mrt.id,
+        )
+    return queryset
+
+
+def fetch_prerequisite_links(course_ids=None):
+    """
+    Queries the backend datastore for the (course_id, milestone_id) pairs of the active 'requires'
+    and 'fulfills' links of the specified courses (or of every course), as a (requires, fulfills)
+    tuple; content which fulfills a milestone counts as a link of its course
+    """
+    requires = caching.get_relationship_type('requires')
+    fulfills = caching.get_relationship_type('fulfills')
+    requires_links, fulfills_links = [], []
+    if requires is None or fulfills is None:
+        return requires_links, fulfills_links
+    links = {requires.id: requires_links, fulfills.id: fulfills_links}
+    batch_size = get_batch_size()
+
+    course_filters = [models.Q()] if course_ids is None else [
+        key_lookup('course_id', chunk) for chunk in chunks(sorted(course_ids), batch_size)
+    ]
+    for course_filter in course_filters:
+        for course_id, milestone_id, relationship_type_id in internal.CourseMilestone.objects.filter(
+            course_filter,
+            active=models.Value(True),
+        ).values_list('course_id', 'milestone_id', 'milestone_relationship_type_id').iterator(chunk_size=batch_size):
+            links.get(relationship_type_id, []).append((course_id, milestone_id))
+        fulfills_links.extend(internal.CourseContentMilestone.objects.filter(
+            course_filter,
+            active=models.Value(True),
+            milestone_relationship_type=fulfills.id,
+        ).values_list('course_id', 'milestone_id').distinct().iterator(chunk_size=batch_size))
+    return requires_links, fulfills_links
@@ -0,0 +1,19 @@
+"""
+Signal handlers which keep the caches maintained by caching.py in step with
+changes made to the underlying models (connected in apps.py)
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import caching
+from .models import MilestoneRelationshipType
+
+
+@receiver(post_save, sender=MilestoneRelationshipType)
+@receiver(post_delete, sender=MilestoneRelationshipType)
+def invalidate_relationship_types(sender, **kwargs):  # pylint: disable=unused-argument
+    """
+    Drops the process-local relationship type registry whenever a type is written or removed
+    """
+    caching.clear_relationship_types()
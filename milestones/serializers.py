@@ -5,6 +5,9 @@ python containers (mainly arrays and dicts).
 
 import json
 
+from django.db.models import TextField
+from django.db.models.functions import Cast
+
 from . import models
 
 
@@ -47,10 +50,59 @@ def serialize_milestone_with_course_content(course_content_milestone):
         'description': course_content_milestone.milestone.description,
         'course_id': course_content_milestone.course_id,
         'content_id': course_content_milestone.content_id,
-        'requirements': deserialize_requirements(course_content_milestone.requirements)
+        'requirements': (
+            course_content_milestone.requirements if course_content_milestone.requirements is not None else {}
+        )
     }
 
 
+# Columns fetched by the data layer with values_list(), so that the *_row serializers below can
+# build the same dicts as their model-based counterparts without instantiating any model
+MILESTONE_COLUMNS = ('id', 'name', 'display_name', 'namespace', 'description')
+MILESTONE_WITH_COURSE_COLUMNS = (
+    'milestone_id',
+    'milestone__name',
+    'milestone__display_name',
+    'milestone__namespace',
+    'milestone__description',
+    'course_id',
+)
+# Requirements are fetched as raw JSON text, rather than decoded by the field, so that rows can be
+# held undecoded until they are serialized (ref: deserialize_requirements)
+MILESTONE_WITH_COURSE_CONTENT_COLUMNS = MILESTONE_WITH_COURSE_COLUMNS + (
+    'content_id',
+    Cast('requirements', output_field=TextField()),
+)
+
+_MILESTONE_KEYS = ('id', 'name', 'display_name', 'namespace', 'description')
+_MILESTONE_WITH_COURSE_KEYS = _MILESTONE_KEYS + ('course_id',)
+_MILESTONE_WITH_COURSE_CONTENT_KEYS = _MILESTONE_WITH_COURSE_KEYS + ('content_id',)
+
+
+def serialize_milestone_row(row):
+    """
+    Milestone row-to-dict serialization, for a values_list(*MILESTONE_COLUMNS) row
+    """
+    return dict(zip(_MILESTONE_KEYS, row))
+
+
+def serialize_milestone_with_course_row(row):
+    """
+    CourseMilestone row-to-dict serialization, for a values_list(*MILESTONE_WITH_COURSE_COLUMNS) row
+    """
+    return dict(zip(_MILESTONE_WITH_COURSE_KEYS, row))
+
+
+def serialize_milestone_with_course_content_row(row):
+    """
+    CourseContentMilestone row-to-dict serialization,
+    for a values_list(*MILESTONE_WITH_COURSE_CONTENT_COLUMNS) row
+    """
+    milestone = dict(zip(_MILESTONE_WITH_COURSE_CONTENT_KEYS, row))
+    milestone['requirements'] = deserialize_requirements(row[-1])
+    return milestone
+
+
 def serialize_milestones(milestones):
     """
     Milestone serialization
@@ -74,10 +126,10 @@ def deserialize_milestone(milestone_dict):
 
 def serialize_requirements(requirements):
     """
-    Convert JSON serializable object to string
+    Convert JSON serializable object to the value stored in (and read back from) the JSON field
     """
     if requirements is not None:
-        requirements = json.dumps(requirements)
+        requirements = json.loads(json.dumps(requirements))
     return requirements
 
 
@@ -1,14 +1,19 @@
 # -*- coding: utf-8 -*- pylint: disable=too-many-lines
 # pylint: disable=invalid-name
 # pylint: disable=too-many-public-methods
+# pylint: disable=no-member
 """
 Milestones API Module Test Cases
 """
 
 
+from functools import partial
+from unittest import mock
+
+from django.core.cache import cache
 from opaque_keys.edx.keys import UsageKey
 
-from milestones import api, exceptions
+from milestones import api, exceptions, models
 from milestones.tests import utils
 
 
@@ -21,12 +26,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
         Milestones API Test Case scaffolding
         """
         super().setUp()
-        self.test_milestone = api.add_milestone({
-            'name': 'test_milestone',
-            'display_name': 'Test Milestone',
-            'namespace': str(self.test_course_key),
-            'description': 'Test Milestone Description',
-        })
+        self.test_milestone = self.add_test_milestone()
         self.relationship_types = api.get_milestone_relationship_types()
 
     def test_add_milestone(self):
@@ -65,7 +65,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
         self.assertGreater(milestone['id'], 0)
         api.remove_milestone(milestone['id'])
 
-        with self.assertNumQueries(6):
+        with self.assertNumQueries(7):
             milestone = api.add_milestone(milestone_data)
 
     def test_add_milestone_inactive_milestone_with_relationships(self):
@@ -92,7 +92,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
         self.assertGreater(milestone['id'], 0)
         api.remove_milestone(milestone['id'])
 
-        with self.assertNumQueries(9):
+        with self.assertNumQueries(10):
             milestone = api.add_milestone(milestone_data)
 
     def test_add_milestone_inactive_milestone_with_relationships_propagate_false(self):
@@ -224,26 +224,141 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
 
     def test_remove_milestone(self):
         """ Unit Test: test_remove_milestone """
-        with self.assertNumQueries(5):
+        # Along with the links, the pending propagation job (if any) is dropped
+        with self.assertNumQueries(7):
             api.remove_milestone(self.test_milestone['id'])
         with self.assertRaises(exceptions.InvalidMilestoneException):
             api.get_milestone(self.test_milestone['id'])
 
     def test_remove_milestone_bogus_milestone(self):
         """ Unit Test: test_remove_milestone_bogus_milestone """
-        with self.assertNumQueries(5):
+        # Along with the links, the pending propagation job (if any) is dropped
+        with self.assertNumQueries(7):
             api.remove_milestone(self.test_milestone['id'])
 
         with self.assertRaises(exceptions.InvalidMilestoneException):
             api.get_milestone(self.test_milestone['id'])
 
         # Do it again with the valid id to hit the exception workflow
-        with self.assertNumQueries(4):
+        with self.assertNumQueries(6):
             api.remove_milestone(self.test_milestone['id'])
 
         with self.assertRaises(exceptions.InvalidMilestoneException):
             api.get_milestone(self.test_milestone['id'])
 
+    def test_remove_milestone_batched(self):
+        """ Unit Test: test_remove_milestone_batched """
+        users = [{'id': user_id} for user_id in range(1, 6)]
+        api.add_user_milestones(users, self.test_milestone)
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.test_milestone)
+        # With batches of two rows, the five user links take three batches (one SELECT and one UPDATE each)
+        with self.settings(MILESTONES_BATCH_SIZE=2):
+            with self.assertNumQueries(13):
+                counts = api.remove_milestone(self.test_milestone['id'])
+        self.assertEqual(counts, {
+            'CourseMilestone': 1,
+            'CourseContentMilestone': 0,
+            'UserMilestone': 5,
+            'Milestone': 1,
+        })
+        self.assertEqual(api.get_course_milestones(self.test_course_key), [])
+        self.assertFalse(any(api.users_have_milestone([user['id'] for user in users], self.test_milestone).values()))
+
+        # Reactivation propagates to the same links, through the same batches
+        api.add_milestone(self.test_milestone)
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 1)
+        self.assertTrue(all(api.users_have_milestone([user['id'] for user in users], self.test_milestone).values()))
+
+    def test_add_milestone_background_propagation(self):
+        """ Unit Test: test_add_milestone_background_propagation """
+        users = [{'id': user_id} for user_id in range(1, 6)]
+        api.add_user_milestones(users, self.test_milestone)
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.test_milestone)
+        api.remove_milestone(self.test_milestone['id'])
+
+        with mock.patch('milestones.propagation.submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                milestone = api.add_milestone(self.test_milestone, background=True)
+        submit.assert_called_once_with(milestone['id'])
+
+        # The milestone is back, its relationships are not (yet)
+        self.assertEqual(api.get_milestone(milestone['id'])['id'], milestone['id'])
+        self.assertEqual(api.get_course_milestones(self.test_course_key), [])
+        self.assertEqual(api.get_pending_milestone_propagations(), [milestone['id']])
+        self.assertFalse(api.get_milestone_propagation(milestone['id'])['done'])
+
+        with self.settings(MILESTONES_BATCH_SIZE=2):
+            checkpoint = api.propagate_milestone(milestone['id'], max_batches=3)
+            self.assertFalse(checkpoint['done'])
+            self.assertEqual(checkpoint['model'], 'UserMilestone')
+            self.assertEqual(api.get_milestone_propagation(milestone['id']), checkpoint)
+            self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 1)
+
+            progress = []
+            checkpoint = api.propagate_milestone(milestone['id'], progress=progress.append)
+        self.assertTrue(checkpoint['done'])
+        self.assertEqual(checkpoint['counts'], {'CourseMilestone': 1, 'CourseContentMilestone': 0, 'UserMilestone': 5})
+        self.assertEqual([entry['done'] for entry in progress], [False, False, True])
+        self.assertIsNone(api.get_milestone_propagation(milestone['id']))
+        self.assertEqual(api.get_pending_milestone_propagations(), [])
+        self.assertTrue(all(api.users_have_milestone([user['id'] for user in users], milestone).values()))
+
+    def test_add_milestone_background_propagation_restarts(self):
+        """ Unit Test: test_add_milestone_background_propagation_restarts """
+        api.add_user_milestones([{'id': 1}, {'id': 2}], self.test_milestone)
+        api.remove_milestone(self.test_milestone['id'])
+        milestone = api.add_milestone(self.test_milestone, background=True)
+
+        # Jobs are recorded in the database, so a lost (or unshared) cache does not lose them
+        cache.clear()
+        self.assertEqual(api.get_pending_milestone_propagations(), [milestone['id']])
+        # A lost checkpoint only means starting over
+        models.MilestonePropagation.objects.all().delete()
+        checkpoint = api.propagate_milestone(milestone['id'])
+        self.assertTrue(checkpoint['done'])
+        self.assertEqual(checkpoint['counts']['UserMilestone'], 2)
+
+        api.remove_milestone(milestone['id'])
+        with self.assertRaises(exceptions.InvalidMilestoneException):
+            api.propagate_milestone(milestone['id'])
+
+    def test_add_milestone_background_propagation_without_cache(self):
+        """ Unit Test: test_add_milestone_background_propagation_without_cache """
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.test_milestone)
+        api.remove_milestone(self.test_milestone['id'])
+        with self.settings(
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'dummy': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+            },
+            MILESTONES_CACHE_ALIAS='dummy',
+            MILESTONES_PROPAGATION_WORKERS=0,
+        ):
+            milestone = api.add_milestone(self.test_milestone, background=True)
+            self.assertEqual(api.get_pending_milestone_propagations(), [milestone['id']])
+            self.assertTrue(api.propagate_milestone(milestone['id'])['done'])
+            self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 1)
+
+    def test_add_milestone_background_propagation_removed(self):
+        """ Unit Test: test_add_milestone_background_propagation_removed """
+        api.add_user_milestones([{'id': user_id} for user_id in range(1, 6)], self.test_milestone)
+        api.remove_milestone(self.test_milestone['id'])
+
+        # Removing the milestone again drops its pending job
+        milestone = api.add_milestone(self.test_milestone, background=True)
+        api.remove_milestone(milestone['id'])
+        self.assertEqual(api.get_pending_milestone_propagations(), [])
+
+        # A running job stops at the next batch once the milestone is removed
+        milestone = api.add_milestone(self.test_milestone, background=True)
+        with self.settings(MILESTONES_BATCH_SIZE=2):
+            with self.assertRaises(exceptions.InvalidMilestoneException):
+                api.propagate_milestone(
+                    milestone['id'], progress=lambda checkpoint: api.remove_milestone(checkpoint['milestone_id'])
+                )
+        self.assertEqual(api.get_pending_milestone_propagations(), [])
+        self.assertFalse(any(api.users_have_milestone(list(range(1, 6)), milestone).values()))
+
     def test_add_course_milestone(self):
         """ Unit Test: test_add_course_milestone """
         with self.assertNumQueries(3):
@@ -258,7 +373,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
         )
         self.assertEqual(len(requirer_milestones), 1)
 
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(2):
             api.add_course_milestone(
                 self.test_prerequisite_course_key,
                 self.relationship_types['FULFILLS'],
@@ -277,7 +392,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             self.relationship_types['REQUIRES'],
             self.test_milestone
         )
-        with self.assertNumQueries(2):
+        with self.assertNumQueries(1):
             api.add_course_milestone(
                 self.test_course_key,
                 self.relationship_types['REQUIRES'],
@@ -292,7 +407,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             self.test_milestone
         )
         api.remove_course_milestone(self.test_course_key, self.test_milestone)
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(2):
             api.add_course_milestone(
                 self.test_course_key,
                 self.relationship_types['REQUIRES'],
@@ -385,7 +500,8 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
         self.assertEqual(user_milestones[0]['id'], milestone2['id'])
 
         # Only Milestone 1 should be listed as 'required' for the course at this point
-        with self.assertNumQueries(2):
+        # (the course is cached, the user's collected set is reloaded after the write)
+        with self.assertNumQueries(1):
             required_milestones = api.get_course_required_milestones(
                 self.test_course_key,
                 self.serialized_test_user
@@ -399,13 +515,60 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
         self.assertEqual(len(user_milestones), 2)
 
         # And there should be no more Milestones required for this User+Course
-        with self.assertNumQueries(2):
+        with self.assertNumQueries(1):
             required_milestones = api.get_course_required_milestones(
                 self.test_course_key,
                 self.serialized_test_user
             )
         self.assertEqual(len(required_milestones), 0)
 
+    def test_get_course_required_milestones_for_users(self):
+        """ Unit Test: test_get_course_required_milestones_for_users """
+        local_milestone = api.add_milestone({
+            'display_name': 'Local Milestone',
+            'name': 'local_milestone',
+            'namespace': str(self.test_course_key),
+            'description': 'Local Milestone Description'
+        })
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.test_milestone)
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], local_milestone)
+        api.add_course_milestone(self.test_course_key, self.relationship_types['FULFILLS'], api.add_milestone({
+            'display_name': 'Fulfilled Milestone',
+            'name': 'fulfilled_milestone',
+            'namespace': str(self.test_course_key),
+            'description': 'Fulfilled Milestone Description'
+        }))
+        user_ids = list(range(1, 31))
+        api.add_user_milestones([{'id': user_id} for user_id in user_ids[:10]], self.test_milestone)
+        api.add_user_milestones([{'id': user_id} for user_id in user_ids[5:20]], local_milestone)
+
+        # Course index, required milestones and one collected-milestones query per chunk of users
+        with self.settings(MILESTONES_BATCH_SIZE=10):
+            with self.assertNumQueries(5):
+                required = api.get_course_required_milestones_for_users(self.test_course_key, user_ids)
+        self.assertEqual(sorted(required), user_ids)
+        for user_id in user_ids:
+            expected = api.get_course_required_milestones(self.test_course_key, {'id': user_id})
+            self.assertEqual(required[user_id], expected)
+        self.assertEqual(required[1], [local_milestone | {'course_id': str(self.test_course_key)}])
+        self.assertEqual(required[7], [])
+        self.assertEqual(len(required[25]), 2)
+
+        # String ids are normalized, and each user gets dicts of its own
+        required = api.get_course_required_milestones_for_users(self.test_course_key, ['25', 26])
+        self.assertEqual(sorted(required), [25, 26])
+        required[25][0]['display_name'] = 'Changed'
+        self.assertNotEqual(required[26][0]['display_name'], 'Changed')
+
+    def test_get_course_required_milestones_for_users_no_requirements(self):
+        """ Unit Test: test_get_course_required_milestones_for_users_no_requirements """
+        # Relationship types and course index only
+        with self.assertNumQueries(2):
+            required = api.get_course_required_milestones_for_users(self.test_course_key, [1, 2])
+        self.assertEqual(required, {1: [], 2: []})
+        with self.assertRaises(exceptions.InvalidUserException):
+            api.get_course_required_milestones_for_users(self.test_course_key, [1, None])
+
     def test_get_courses_milestones(self):
         """ Unit Test: test_get_courses_milestones """
         api.add_course_milestone(
@@ -442,6 +605,85 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             )
         self.assertEqual(len(requirer_milestones), 2)
 
+    def test_get_courses_milestones_by_course(self):
+        """ Unit Test: test_get_courses_milestones_by_course """
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.test_milestone)
+        local_milestone = api.add_milestone({
+            'display_name': 'Local Milestone',
+            'name': 'local_milestone',
+            'namespace': str(self.test_course_key),
+            'description': 'Local Milestone Description'
+        })
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], local_milestone)
+        api.add_course_milestone(self.test_alternate_course_key, self.relationship_types['REQUIRES'], local_milestone)
+        api.add_user_milestone({'id': self.test_user.id}, self.test_milestone)
+        course_keys = [self.test_course_key, self.test_alternate_course_key, self.test_prerequisite_course_key]
+
+        with self.assertNumQueries(2):
+            milestones = api.get_courses_milestones_by_course(course_keys, self.relationship_types['REQUIRES'])
+        self.assertEqual(list(milestones), [str(course_key) for course_key in course_keys])
+        self.assertEqual([len(milestones[str(course_key)]) for course_key in course_keys], [2, 1, 0])
+
+        milestones = api.get_courses_milestones_by_course(
+            course_keys, self.relationship_types['REQUIRES'], {'id': self.test_user.id}
+        )
+        self.assertEqual([len(milestones[str(course_key)]) for course_key in course_keys], [1, 1, 0])
+        self.assertEqual(milestones[str(self.test_course_key)][0]['id'], local_milestone['id'])
+
+        milestones = api.get_courses_milestones_by_course(course_keys, 'invalid_relationship')
+        self.assertEqual(milestones, {str(course_key): [] for course_key in course_keys})
+
+        with self.assertRaises(exceptions.InvalidCourseKeyException):
+            api.get_courses_milestones_by_course([self.test_course_key, 'bogus_course_key'])
+
+    def test_get_courses_milestones_by_course_many_courses(self):
+        """ Unit Test: test_get_courses_milestones_by_course_many_courses """
+        course_ids = [f'course-v1:org+course_{index}+run' for index in range(10000)]
+        # One milestone per course for a tenth of the courses, bypassing the API for speed
+        requires = models.MilestoneRelationshipType.objects.get(name=self.relationship_types['REQUIRES'])
+        models.CourseMilestone.objects.bulk_create([
+            models.CourseMilestone(
+                course_id=course_id, milestone_id=self.test_milestone['id'], milestone_relationship_type=requires
+            )
+            for course_id in course_ids[::10]
+        ])
+
+        # The relationship types and the course index, then one query per chunk of the 1000 courses with milestones;
+        # in the cache, the course versions are read, issued and read back, then the course entries read and written
+        with self.settings(MILESTONES_BATCH_SIZE=250), \
+                mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many, \
+                mock.patch.object(cache, 'set_many', wraps=cache.set_many) as set_many, \
+                mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            with self.assertNumQueries(6):
+                milestones = api.get_courses_milestones_by_course(course_ids, self.relationship_types['REQUIRES'])
+        # The one add issues the version of the course index
+        self.assertEqual((get_many.call_count, set_many.call_count, add.call_count), (3, 2, 1))
+        self.assertEqual(len(milestones), 10000)
+        self.assertEqual(sum(len(course_milestones) for course_milestones in milestones.values()), 1000)
+        self.assertEqual(milestones[course_ids[10]][0]['course_id'], course_ids[10])
+        self.assertEqual(milestones[course_ids[11]], [])
+
+    def test_get_courses_milestones_key_hash_collision(self):
+        """ Unit Test: test_get_courses_milestones_key_hash_collision """
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.test_milestone)
+        api.add_course_milestone(
+            self.test_alternate_course_key, self.relationship_types['REQUIRES'], self.test_milestone
+        )
+        api.add_course_content_milestone(
+            self.test_course_key, self.test_content_key, self.relationship_types['REQUIRES'], self.test_milestone
+        )
+        # Forge digest collisions: lookups must still compare the key strings
+        models.CourseMilestone.objects.filter(course_id=str(self.test_alternate_course_key)).update(
+            course_id_hash=models.key_hash(str(self.test_course_key))
+        )
+        models.CourseContentMilestone.objects.update(
+            content_id_hash=models.key_hash(str(self.test_alternate_content_key))
+        )
+
+        milestones = api.get_courses_milestones([self.test_course_key], self.relationship_types['REQUIRES'])
+        self.assertEqual([milestone['course_id'] for milestone in milestones], [str(self.test_course_key)])
+        self.assertEqual(api.get_course_content_milestones(self.test_course_key, self.test_alternate_content_key), [])
+
     def test_get_courses_milestones_with_invalid_relationship_type(self):
         """ Unit Test: test_get_courses_milestones_with_invalid_relationship_type """
         api.add_course_milestone(
@@ -512,7 +754,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             self.relationship_types['REQUIRES']
         )
         self.assertEqual(len(requirer_milestones), 1)
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(2):
             api.add_course_content_milestone(
                 self.test_prerequisite_course_key,
                 self.test_content_key,
@@ -535,7 +777,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             self.relationship_types['REQUIRES'],
             self.test_milestone
         )
-        with self.assertNumQueries(2):
+        with self.assertNumQueries(1):
             api.add_course_content_milestone(
                 self.test_course_key,
                 self.test_content_key,
@@ -556,7 +798,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             self.test_content_key,
             self.test_milestone
         )
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(2):
             api.add_course_content_milestone(
                 self.test_course_key,
                 self.test_content_key,
@@ -584,7 +826,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             self.test_milestone,
             {'min_score': 60}
         )
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(2):
             api.add_course_content_milestone(
                 self.test_course_key,
                 self.test_content_key,
@@ -614,7 +856,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             self.test_content_key,
             self.test_milestone
         )
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(2):
             api.add_course_content_milestone(
                 self.test_course_key,
                 self.test_content_key,
@@ -668,6 +910,87 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
                     self.test_milestone
                 )
 
+    def test_add_course_content_milestones(self):
+        """ Unit Test: test_add_course_content_milestones """
+        content_keys = [UsageKey.from_string(f'i4x://the/content/key/{index}') for index in range(20)]
+        api.add_course_content_milestone(
+            self.test_course_key, content_keys[0], self.relationship_types['REQUIRES'], self.test_milestone
+        )
+        api.add_course_content_milestone(
+            self.test_course_key, content_keys[1], self.relationship_types['REQUIRES'], self.test_milestone
+        )
+        api.add_course_content_milestone(
+            self.test_course_key, content_keys[2], self.relationship_types['REQUIRES'], self.test_milestone
+        )
+        api.remove_course_content_milestone(self.test_course_key, content_keys[2], self.test_milestone)
+
+        content_milestones = [
+            (content_key, self.relationship_types['REQUIRES'], self.test_milestone, {'min_score': 50})
+            for content_key in content_keys
+        ]
+        content_milestones[0] = (content_keys[0], self.relationship_types['REQUIRES'], self.test_milestone, None)
+        # One lookup, one bulk update, one bulk insert and a count of the rows it inserted, for any number of blocks
+        with self.assertNumQueries(4):
+            counts = api.add_course_content_milestones(self.test_course_key, content_milestones)
+        self.assertEqual(counts, {'created': 17, 'reactivated': 1, 'updated': 1, 'unchanged': 1})
+
+        milestones = api.get_course_content_milestones(self.test_course_key, relationship='requires')
+        self.assertEqual(len(milestones), 20)
+        requirements = {milestone['content_id']: milestone['requirements'] for milestone in milestones}
+        self.assertEqual(requirements[str(content_keys[0])], {})
+        self.assertEqual(requirements[str(content_keys[1])], {'min_score': 50})
+        self.assertEqual(requirements[str(content_keys[2])], {'min_score': 50})
+
+        with self.assertNumQueries(1):
+            counts = api.add_course_content_milestones(self.test_course_key, content_milestones)
+        self.assertEqual(counts, {'created': 0, 'reactivated': 0, 'updated': 0, 'unchanged': 20})
+
+    def test_add_course_content_milestones_concurrent_insert(self):
+        """ Unit Test: test_add_course_content_milestones_concurrent_insert """
+        manager = models.CourseContentMilestone.objects
+        bulk_create = manager.bulk_create
+
+        def _bulk_create(records, **kwargs):
+            # Another process inserts one of the links between the lookup and the insert
+            api.add_course_content_milestone(
+                self.test_course_key, self.test_content_key, self.relationship_types['REQUIRES'], self.test_milestone
+            )
+            return bulk_create(records, **kwargs)
+
+        content_milestones = [
+            (content_key, self.relationship_types['REQUIRES'], self.test_milestone, None)
+            for content_key in (self.test_content_key, self.test_alternate_content_key)
+        ]
+        with mock.patch.object(manager, 'bulk_create', side_effect=_bulk_create):
+            counts = api.add_course_content_milestones(self.test_course_key, content_milestones)
+        self.assertEqual(counts, {'created': 1, 'reactivated': 0, 'updated': 0, 'unchanged': 0})
+        self.assertEqual(len(api.get_course_content_milestones(self.test_course_key)), 2)
+
+    def test_add_course_content_milestones_invalid(self):
+        """ Unit Test: test_add_course_content_milestones_invalid """
+        with self.assertNumQueries(0):
+            with self.assertRaises(exceptions.InvalidContentKeyException):
+                api.add_course_content_milestones(self.test_course_key, [
+                    (self.test_content_key, self.relationship_types['REQUIRES'], self.test_milestone, None),
+                    ('bogus_content_key', self.relationship_types['REQUIRES'], self.test_milestone, None),
+                ])
+        with self.assertRaises(exceptions.InvalidCourseContentMilestoneRequirementsException):
+            api.add_course_content_milestones(self.test_course_key, [
+                (self.test_content_key, self.relationship_types['REQUIRES'], self.test_milestone, {'a': object()}),
+            ])
+        with self.assertRaises(exceptions.InvalidMilestoneRelationshipTypeException):
+            api.add_course_content_milestones(self.test_course_key, [
+                (self.test_content_key, 'invalid_relationship', self.test_milestone, None),
+            ])
+        # Milestones must be identified; rows written without one would be dropped silently
+        with self.assertRaises(exceptions.InvalidMilestoneException):
+            api.add_course_content_milestones(self.test_course_key, [
+                (self.test_content_key, self.relationship_types['REQUIRES'], {'name': 'x', 'namespace': 'ns'}, None),
+            ])
+        self.assertEqual(api.add_course_content_milestones(self.test_course_key, []),
+                         {'created': 0, 'reactivated': 0, 'updated': 0, 'unchanged': 0})
+        self.assertEqual(api.get_course_content_milestones(self.test_course_key), [])
+
     def test_get_course_content_milestones(self):
         """ Unit Test: test_get_course_content_milestones """
         api.add_course_content_milestone(
@@ -734,7 +1057,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             self.relationship_types['REQUIRES'],
             self.test_milestone
         )
-        with self.assertNumQueries(2):
+        with self.assertNumQueries(1):
             requirer_milestones = api.get_course_content_milestones(
                 None,
                 self.test_content_key,
@@ -778,7 +1101,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             self.relationship_types['REQUIRES'],
             self.test_milestone
         )
-        with self.assertNumQueries(1):
+        with self.assertNumQueries(2):
             requirer_milestones = api.get_course_content_milestones(
                 self.test_course_key,
                 self.test_content_key,
@@ -786,6 +1109,156 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             )
         self.assertEqual(len(requirer_milestones), 0)
 
+    def test_get_course_content_milestones_by_content(self):
+        """ Unit Test: test_get_course_content_milestones_by_content """
+        content_keys = [UsageKey.from_string(f'i4x://the/content/key/{index}') for index in range(5)]
+        other_milestone = api.add_milestone({
+            'name': 'other_milestone',
+            'display_name': 'Other Milestone',
+            'namespace': str(self.test_course_key),
+            'description': 'Other Milestone Description',
+        })
+        api.add_course_content_milestones(self.test_course_key, [
+            (content_keys[0], self.relationship_types['REQUIRES'], self.test_milestone, None),
+            (content_keys[1], self.relationship_types['REQUIRES'], self.test_milestone, None),
+            (content_keys[1], self.relationship_types['REQUIRES'], other_milestone, None),
+            (content_keys[2], self.relationship_types['FULFILLS'], self.test_milestone, None),
+        ])
+        api.add_user_milestone({'id': self.test_user.id}, self.test_milestone)
+
+        # One query for every piece of content (plus the course index)
+        with self.assertNumQueries(2):
+            milestones = api.get_course_content_milestones_by_content(
+                self.test_course_key, content_keys, self.relationship_types['REQUIRES']
+            )
+        self.assertEqual(list(milestones), [str(content_key) for content_key in content_keys])
+        self.assertEqual([len(milestones[str(content_key)]) for content_key in content_keys], [1, 2, 0, 0, 0])
+
+        milestones = api.get_course_content_milestones_by_content(
+            self.test_course_key, content_keys, self.relationship_types['REQUIRES'], {'id': self.test_user.id}
+        )
+        self.assertEqual([len(milestones[str(content_key)]) for content_key in content_keys], [0, 1, 0, 0, 0])
+        self.assertEqual(milestones[str(content_keys[1])][0]['id'], other_milestone['id'])
+
+        milestones = api.get_course_content_milestones_by_content(
+            self.test_course_key, content_keys, 'invalid_relationship'
+        )
+        self.assertEqual(milestones, {str(content_key): [] for content_key in content_keys})
+
+        with self.assertRaises(exceptions.InvalidContentKeyException):
+            api.get_course_content_milestones_by_content(self.test_course_key, ['bogus_content_key'])
+
+    def test_get_course_content_milestones_by_content_chunked(self):
+        """ Unit Test: test_get_course_content_milestones_by_content_chunked """
+        content_keys = [UsageKey.from_string(f'i4x://the/content/key/{index}') for index in range(5)]
+        api.add_course_content_milestones(self.test_course_key, [
+            (content_key, self.relationship_types['REQUIRES'], self.test_milestone, None)
+            for content_key in content_keys
+        ])
+        with self.settings(MILESTONES_BATCH_SIZE=2):
+            with self.assertNumQueries(4):
+                milestones = api.get_course_content_milestones_by_content(self.test_course_key, content_keys)
+        self.assertTrue(all(len(milestones[str(content_key)]) == 1 for content_key in content_keys))
+
+    def test_iter_course_content_milestones(self):
+        """ Unit Test: test_iter_course_content_milestones """
+        content_keys = [UsageKey.from_string(f'i4x://the/content/key/{index}') for index in range(5)]
+        api.add_course_content_milestones(self.test_course_key, [
+            (content_key, self.relationship_types['REQUIRES'], self.test_milestone, {'min_score': index})
+            for index, content_key in enumerate(content_keys)
+        ])
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.test_milestone)
+
+        # Nothing is read until the iterator is consumed, then one query per page of two rows
+        milestones = api.iter_course_content_milestones(self.test_course_key, batch_size=2)
+        with self.assertNumQueries(3):
+            milestones = list(milestones)
+        self.assertEqual(milestones, api.get_course_content_milestones(self.test_course_key))
+        self.assertEqual([milestone['requirements']['min_score'] for milestone in milestones], list(range(5)))
+
+        milestones = api.iter_course_content_milestones(self.test_course_key, content_keys[1])
+        self.assertEqual([milestone['content_id'] for milestone in milestones], [str(content_keys[1])])
+        api.add_user_milestone({'id': self.test_user.id}, self.test_milestone)
+        self.assertEqual(list(api.iter_course_content_milestones(
+            self.test_course_key, relationship=self.relationship_types['REQUIRES'], user={'id': self.test_user.id}
+        )), [])
+        self.assertEqual(list(api.iter_course_content_milestones(relationship='invalid_relationship')), [])
+
+        with self.assertNumQueries(2):
+            milestones = list(api.iter_milestone_course_content(self.test_milestone, batch_size=4))
+        self.assertEqual(len(milestones), 5)
+        self.assertEqual(
+            [milestone['course_id'] for milestone in api.iter_milestone_courses(self.test_milestone)],
+            [str(self.test_course_key)]
+        )
+        self.assertEqual(list(api.iter_milestone_courses(self.test_milestone, 'invalid_relationship')), [])
+
+        with self.assertRaises(exceptions.InvalidMilestoneException):
+            api.iter_milestone_courses({'id': None})
+
+    def test_get_pages(self):
+        """ Unit Test: test_get_pages """
+        content_keys = [UsageKey.from_string(f'i4x://the/content/key/{index}') for index in range(5)]
+        api.add_course_content_milestones(self.test_course_key, [
+            (content_key, self.relationship_types['FULFILLS'], self.test_milestone, None)
+            for content_key in content_keys
+        ])
+        for index in range(4):
+            api.add_milestone({
+                'name': f'paged_milestone_{index}',
+                'display_name': 'Paged Milestone',
+                'namespace': self.test_milestone['namespace'],
+                'description': 'Paged Milestone Description',
+            })
+        api.add_course_milestone(self.test_course_key, self.relationship_types['FULFILLS'], self.test_milestone)
+
+        for get_page, expected in (
+            (partial(api.get_course_content_milestones_page, self.test_course_key),
+             api.get_course_content_milestones(self.test_course_key)),
+            (partial(api.get_milestones_page, self.test_milestone['namespace']),
+             api.get_milestones(self.test_milestone['namespace'])),
+            (partial(api.get_milestone_course_content_page, self.test_milestone, self.relationship_types['FULFILLS']),
+             list(api.iter_milestone_course_content(self.test_milestone, self.relationship_types['FULFILLS']))),
+        ):
+            # One query per page, whatever its depth
+            results, cursor = [], None
+            while True:
+                with self.assertNumQueries(1):
+                    page = get_page(cursor=cursor, page_size=2)
+                results.extend(page['results'])
+                cursor = page['next_cursor']
+                if cursor is None:
+                    break
+                self.assertEqual(len(page['results']), 2)
+            self.assertEqual(
+                results, sorted(expected, key=lambda milestone: milestone.get('content_id', milestone['id']))
+            )
+
+        # Page sizes are capped
+        with mock.patch('milestones.queries.MAX_PAGE_SIZE', 3):
+            page = api.get_milestones_page(self.test_milestone['namespace'], page_size=10)
+        self.assertEqual(len(page['results']), 3)
+        self.assertIsNotNone(page['next_cursor'])
+
+        page = api.get_milestone_courses_page(self.test_milestone, self.relationship_types['FULFILLS'])
+        self.assertEqual([milestone['course_id'] for milestone in page['results']], [str(self.test_course_key)])
+        self.assertIsNone(page['next_cursor'])
+        self.assertEqual(
+            api.get_milestone_courses_page(self.test_milestone, 'invalid_relationship'),
+            {'results': [], 'next_cursor': None}
+        )
+        self.assertEqual(
+            api.get_course_content_milestones_page(relationship='invalid_relationship'),
+            {'results': [], 'next_cursor': None}
+        )
+
+        for cursor in ('bogus', 'LTE=', 42):
+            with self.assertRaises(exceptions.InvalidPageException):
+                api.get_milestones_page(self.test_milestone['namespace'], cursor=cursor)
+        for page_size in (0, '2'):
+            with self.assertRaises(exceptions.InvalidPageException):
+                api.get_course_content_milestones_page(self.test_course_key, page_size=page_size)
+
     def test_remove_course_content_milestone(self):
         """ Unit Test: test_remove_course_content_milestone """
         api.add_course_content_milestone(
@@ -856,6 +1329,81 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             with self.assertRaises(exceptions.InvalidUserException):
                 api.add_user_milestone(None, self.test_milestone)
 
+    def test_add_user_milestones(self):
+        """ Unit Test: test_add_user_milestones """
+        users = [{'id': user_id} for user_id in range(1, 51)]
+        api.add_user_milestone(users[0], self.test_milestone)
+        api.add_user_milestone(users[1], self.test_milestone)
+        api.remove_user_milestone(users[1], self.test_milestone)
+
+        # One lookup, one reactivation, one insert and a count of the rows it inserted, for any number of users
+        with self.assertNumQueries(4):
+            counts = api.add_user_milestones(users, self.test_milestone)
+        self.assertEqual(counts, {'created': 48, 'reactivated': 1, 'unchanged': 1})
+        for user in users:
+            self.assertTrue(api.user_has_milestone(user, self.test_milestone))
+
+        with self.assertNumQueries(1):
+            counts = api.add_user_milestones(users, self.test_milestone)
+        self.assertEqual(counts, {'created': 0, 'reactivated': 0, 'unchanged': 50})
+
+    def test_add_user_milestones_chunked(self):
+        """ Unit Test: test_add_user_milestones_chunked """
+        users = [{'id': user_id} for user_id in range(1, 26)]
+        with self.settings(MILESTONES_BATCH_SIZE=10):
+            with self.assertNumQueries(9):
+                counts = api.add_user_milestones(users, self.test_milestone)
+        self.assertEqual(counts, {'created': 25, 'reactivated': 0, 'unchanged': 0})
+
+    def test_add_user_milestones_counts_inserted(self):
+        """ Unit Test: test_add_user_milestones_counts_inserted """
+        manager = models.UserMilestone.objects
+        bulk_create = manager.bulk_create
+
+        def _bulk_create(records, **kwargs):
+            # Another process awards the milestone to one of the users between the lookup and the insert
+            api.add_user_milestone({'id': 1}, self.test_milestone)
+            return bulk_create(records, **kwargs)
+
+        with mock.patch.object(manager, 'bulk_create', side_effect=_bulk_create):
+            counts = api.add_user_milestones([{'id': 1}, {'id': 2}], self.test_milestone)
+        self.assertEqual(counts, {'created': 1, 'reactivated': 0, 'unchanged': 0})
+
+        # String ids match the stored links
+        counts = api.add_user_milestones([{'id': '1'}, {'id': '3'}], self.test_milestone)
+        self.assertEqual(counts, {'created': 1, 'reactivated': 0, 'unchanged': 1})
+
+    def test_add_users_milestones(self):
+        """ Unit Test: test_add_users_milestones """
+        local_milestone = api.add_milestone({
+            'display_name': 'Local Milestone',
+            'name': 'local_milestone',
+            'namespace': str(self.test_course_key),
+            'description': 'Local Milestone Description'
+        })
+        users = [self.serialized_test_user, {'id': self.test_user.id + 1}]
+        api.add_user_milestone(self.serialized_test_user, self.test_milestone)
+        self.assertFalse(api.user_has_milestone(self.serialized_test_user, local_milestone))
+
+        counts = api.add_users_milestones(users, [self.test_milestone, local_milestone])
+        self.assertEqual(counts, {'created': 3, 'reactivated': 0, 'unchanged': 1})
+        for user in users:
+            self.assertTrue(api.user_has_milestone(user, self.test_milestone))
+            self.assertTrue(api.user_has_milestone(user, local_milestone))
+
+    def test_add_user_milestones_bogus_user(self):
+        """ Unit Test: test_add_user_milestones_bogus_user """
+        with self.assertNumQueries(0):
+            with self.assertRaises(exceptions.InvalidUserException):
+                api.add_user_milestones([self.serialized_test_user, {'id': 0}], self.test_milestone)
+        with self.assertNumQueries(0):
+            with self.assertRaises(exceptions.InvalidMilestoneException):
+                api.add_user_milestones([self.serialized_test_user], None)
+        # Milestones must be identified; links written without one would be dropped silently
+        with self.assertNumQueries(0):
+            with self.assertRaises(exceptions.InvalidMilestoneException):
+                api.add_user_milestones([{'id': 3}], {'name': 'x', 'namespace': 'ns'})
+
     def test_get_user_milestones(self):
         """ Unit Test: test_get_user_milestones """
         with self.assertNumQueries(2):
@@ -885,6 +1433,74 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
         with self.assertNumQueries(1):
             self.assertFalse(api.user_has_milestone(self.serialized_test_user, self.test_milestone))
 
+    def test_users_have_milestone(self):
+        """ Unit Test: test_users_have_milestone """
+        user_ids = list(range(1, 21))
+        api.add_user_milestones([{'id': user_id} for user_id in user_ids[::2]], self.test_milestone)
+        with self.assertNumQueries(1):
+            holders = api.users_have_milestone(user_ids, self.test_milestone)
+        self.assertEqual(holders, {user_id: user_id % 2 == 1 for user_id in user_ids})
+
+        with self.settings(MILESTONES_BATCH_SIZE=5):
+            with self.assertNumQueries(4):
+                self.assertEqual(api.users_have_milestone(user_ids, self.test_milestone), holders)
+
+    def test_users_have_milestones(self):
+        """ Unit Test: test_users_have_milestones """
+        local_milestone = api.add_milestone({
+            'display_name': 'Local Milestone',
+            'name': 'local_milestone',
+            'namespace': str(self.test_course_key),
+            'description': 'Local Milestone Description'
+        })
+        api.add_user_milestone({'id': 1}, self.test_milestone)
+        api.add_user_milestone({'id': 2}, local_milestone)
+        api.add_user_milestone({'id': 3}, local_milestone)
+        api.remove_user_milestone({'id': 3}, local_milestone)
+        milestone_ids = [self.test_milestone['id'], local_milestone['id']]
+        with self.assertNumQueries(1):
+            matrix = api.users_have_milestones([1, 2, 3], milestone_ids)
+        self.assertEqual(matrix, {
+            1: {self.test_milestone['id']: True, local_milestone['id']: False},
+            2: {self.test_milestone['id']: False, local_milestone['id']: True},
+            3: {self.test_milestone['id']: False, local_milestone['id']: False},
+        })
+        with self.assertNumQueries(0):
+            self.assertEqual(api.users_have_milestones([1], []), {1: {}})
+
+    def test_users_have_milestone_string_ids(self):
+        """ Unit Test: test_users_have_milestone_string_ids """
+        api.add_user_milestone({'id': 5}, self.test_milestone)
+        milestone_id = self.test_milestone['id']
+        # Ids are normalized to ints, as stored, and the results keyed by them
+        self.assertEqual(
+            api.users_have_milestone(['5', 6], dict(self.test_milestone, id=str(milestone_id))),
+            {5: True, 6: False}
+        )
+        self.assertEqual(api.users_have_milestones([5, '6'], [str(milestone_id)]), {
+            5: {milestone_id: True},
+            6: {milestone_id: False},
+        })
+        with self.assertRaises(exceptions.InvalidUserException):
+            api.users_have_milestone(['bogus'], self.test_milestone)
+        with self.assertRaises(exceptions.InvalidMilestoneException):
+            api.users_have_milestones([5], ['bogus'])
+
+    def test_users_have_milestone_bogus_users(self):
+        """ Unit Test: test_users_have_milestone_bogus_users """
+        with self.assertNumQueries(0):
+            with self.assertRaises(exceptions.InvalidUserException):
+                api.users_have_milestone([1, 0], self.test_milestone)
+        with self.assertNumQueries(0):
+            with self.assertRaises(exceptions.InvalidUserException):
+                api.users_have_milestones(None, [self.test_milestone['id']])
+        with self.assertNumQueries(0):
+            with self.assertRaises(exceptions.InvalidMilestoneException):
+                api.users_have_milestones([1], [None])
+        with self.assertNumQueries(0):
+            with self.assertRaises(exceptions.InvalidMilestoneException):
+                api.users_have_milestone([1], {'name': 'test_milestone', 'namespace': str(self.test_course_key)})
+
     def test_remove_course_references(self):
         """ Unit Test: test_remove_course_references """
         # Add a course dependency on the test milestone
@@ -907,7 +1523,8 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
 
         # Remove the course dependency
         with self.assertNumQueries(4):
-            api.remove_course_references(self.test_course_key)
+            counts = api.remove_course_references(self.test_course_key)
+        self.assertEqual(counts, {'CourseMilestone': 1, 'CourseContentMilestone': 1})
         self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 0)
 
     def test_remove_content_references(self):
@@ -963,7 +1580,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             self.relationship_types['FULFILLS'],
             local_milestone_1
         )
-        with self.assertNumQueries(4):
+        with self.assertNumQueries(5):
             paths = api.get_course_milestones_fulfillment_paths(
                 self.test_course_key,
                 self.serialized_test_user
@@ -973,6 +1590,39 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
         milestone_key_1 = f"{local_milestone_1['namespace']}.{local_milestone_1['name']}"
         self.assertEqual(len(paths[milestone_key_1]['courses']), 1)
 
+    def test_get_course_milestones_fulfillment_paths_query_count_independent_of_milestones(self):
+        """
+        Unit Test: test_get_course_milestones_fulfillment_paths_query_count_independent_of_milestones
+        """
+        namespace = str(self.test_course_key)
+        for milestone_count in (1, 10):
+            course_key = f'the/course_{milestone_count}/key'
+            for index in range(milestone_count):
+                milestone = api.add_milestone({
+                    'display_name': f'Milestone {milestone_count}.{index}',
+                    'name': f'milestone_{milestone_count}_{index}',
+                    'namespace': namespace,
+                    'description': f'Milestone {milestone_count}.{index} Description'
+                })
+                api.add_course_milestone(course_key, self.relationship_types['REQUIRES'], milestone)
+                api.add_course_milestone(self.test_prerequisite_course_key, self.relationship_types['FULFILLS'],
+                                         milestone)
+                api.add_course_content_milestone(
+                    self.test_prerequisite_course_key,
+                    UsageKey.from_string(f'i4x://the/content/key/{milestone_count}{index}'),
+                    self.relationship_types['FULFILLS'],
+                    milestone
+                )
+
+            # Course index, required milestones, collected milestones, fulfilling courses, fulfilling content
+            cache.clear()
+            with self.assertNumQueries(5):
+                paths = api.get_course_milestones_fulfillment_paths(course_key, self.serialized_test_user)
+            self.assertEqual(len(paths), milestone_count)
+            for path in paths.values():
+                self.assertEqual(path['courses'], [str(self.test_prerequisite_course_key)])
+                self.assertEqual(len(path['content']), 1)
+
     def test_get_course_milestones_fulfillment_paths(self):  # pylint: disable=too-many-statements
         """
         Unit Test: test_get_course_milestones_fulfillment_paths
@@ -1053,7 +1703,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             3
         )
         # Check the possible fulfillment paths for the milestones for this course
-        with self.assertNumQueries(8):
+        with self.assertNumQueries(2):
             paths = api.get_course_milestones_fulfillment_paths(
                 self.test_course_key,
                 self.serialized_test_user
@@ -1081,7 +1731,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             2
         )
         # Check the remaining fulfillment paths for the milestones for this course
-        with self.assertNumQueries(6):
+        with self.assertNumQueries(2):
             paths = api.get_course_milestones_fulfillment_paths(
                 self.test_course_key,
                 self.serialized_test_user
@@ -1101,7 +1751,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             1
         )
         # Check the remaining fulfillment paths for the milestones for this course
-        with self.assertNumQueries(4):
+        with self.assertNumQueries(2):
             paths = api.get_course_milestones_fulfillment_paths(
                 self.test_course_key,
                 self.serialized_test_user
@@ -1120,7 +1770,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestC
             0
         )
         # Check the remaining fulfillment paths for the milestones for this course
-        with self.assertNumQueries(2):
+        with self.assertNumQueries(0):
             paths = api.get_course_milestones_fulfillment_paths(
                 self.test_course_key,
                 self.serialized_test_user
@@ -0,0 +1,439 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+# pylint: disable=no-member
+"""
+Milestones Caching Module Test Cases
+
+Note: 'Unit Test: ' labels are output to the console during test runs
+"""
+
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from opaque_keys.edx.keys import UsageKey
+
+from milestones import api, caching, data, exceptions
+from milestones.models import MilestoneRelationshipType
+from milestones.tests import utils
+
+
+class RelationshipTypeRegistryTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test Case module for the process-local MilestoneRelationshipType registry
+    """
+
+    def test_get_relationship_type_loads_once(self):
+        """ Unit Test: test_get_relationship_type_loads_once """
+        with self.assertNumQueries(1):
+            requires = caching.get_relationship_type('requires')
+        with self.assertNumQueries(0):
+            self.assertEqual(caching.get_relationship_type('requires'), requires)
+            self.assertEqual(caching.get_relationship_type('fulfills').name, 'fulfills')
+
+    def test_get_relationship_type_missing(self):
+        """ Unit Test: test_get_relationship_type_missing """
+        caching.get_relationship_type('requires')
+        with self.assertNumQueries(1):
+            self.assertIsNone(caching.get_relationship_type('invalid_relationship'))
+
+    def test_get_relationship_type_inactive(self):
+        """ Unit Test: test_get_relationship_type_inactive """
+        MilestoneRelationshipType.objects.create(name='inactive_type', active=False)
+        self.assertIsNone(caching.get_relationship_type('inactive_type'))
+
+    def test_registry_invalidated_on_save(self):
+        """ Unit Test: test_registry_invalidated_on_save """
+        requires = caching.get_relationship_type('requires')
+        requires.active = False
+        requires.save()
+        self.assertIsNone(caching.get_relationship_type('requires'))
+
+        requires.active = True
+        requires.save()
+        self.assertEqual(caching.get_relationship_type('requires').id, requires.id)
+
+    def test_registry_invalidated_on_delete(self):
+        """ Unit Test: test_registry_invalidated_on_delete """
+        MilestoneRelationshipType.objects.create(name='temporary')
+        self.assertIsNotNone(caching.get_relationship_type('temporary'))
+        MilestoneRelationshipType.objects.filter(name='temporary').delete()
+        self.assertIsNone(caching.get_relationship_type('temporary'))
+
+
+class CourseMilestonesCacheTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestCaseBase):
+    """
+    Test Case module for the versioned per-course milestones cache
+    """
+
+    def setUp(self):
+        """
+        Course milestones cache Test Case scaffolding
+        """
+        super().setUp()
+        self.relationship_types = api.get_milestone_relationship_types()
+        self.test_milestone = self.add_test_milestone(course_relationship=self.relationship_types['REQUIRES'])
+
+    def test_get_course_milestones_cached(self):
+        """ Unit Test: test_get_course_milestones_cached """
+        with self.assertNumQueries(2):
+            milestones = api.get_course_milestones(self.test_course_key, self.relationship_types['REQUIRES'])
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                api.get_course_milestones(self.test_course_key, self.relationship_types['REQUIRES']),
+                milestones
+            )
+        self.assertEqual(milestones[0]['id'], self.test_milestone['id'])
+        self.assertEqual(milestones[0]['course_id'], str(self.test_course_key))
+
+    def test_get_courses_milestones_partial_hit(self):
+        """ Unit Test: test_get_courses_milestones_partial_hit """
+        api.add_course_milestone(self.test_alternate_course_key, self.relationship_types['FULFILLS'],
+                                 self.test_milestone)
+        api.get_courses_milestones([self.test_course_key])
+        with self.assertNumQueries(1):
+            milestones = api.get_courses_milestones([self.test_course_key, self.test_alternate_course_key])
+        self.assertEqual(len(milestones), 2)
+        with self.assertNumQueries(0):
+            api.get_courses_milestones([self.test_course_key, self.test_alternate_course_key])
+
+    def test_cache_invalidated_by_course_milestone_writes(self):
+        """ Unit Test: test_cache_invalidated_by_course_milestone_writes """
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 1)
+        api.add_course_milestone(self.test_course_key, self.relationship_types['FULFILLS'], api.add_milestone({
+            'name': 'other_milestone',
+            'display_name': 'Other Milestone',
+            'namespace': str(self.test_course_key),
+            'description': 'Other Milestone Description',
+        }))
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 2)
+
+        api.remove_course_milestone(self.test_course_key, self.test_milestone)
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 1)
+
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.test_milestone)
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 2)
+
+        api.remove_course_references(self.test_course_key)
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 0)
+
+    def test_cache_invalidated_by_milestone_removal(self):
+        """ Unit Test: test_cache_invalidated_by_milestone_removal """
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 1)
+        api.remove_milestone(self.test_milestone['id'])
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 0)
+        api.add_milestone(self.test_milestone)
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 1)
+
+    def test_courses_invalidated_after_updates(self):
+        """ Unit Test: test_courses_invalidated_after_updates """
+        # Outside of a transaction, a reader racing an invalidation issued before the update
+        # would re-cache the links being replaced
+        invalidate_courses = caching.invalidate_courses
+        seen = []
+
+        def _invalidate_courses(course_ids):
+            seen.append(len(data.fetch_milestone_courses(self.test_milestone)))
+            invalidate_courses(course_ids)
+
+        with mock.patch('milestones.caching.invalidate_courses', side_effect=_invalidate_courses):
+            api.remove_milestone(self.test_milestone['id'])
+            api.add_milestone(self.test_milestone)
+            api.remove_course_references(self.test_course_key)
+        self.assertEqual(seen, [0, 1, 0])
+
+    def test_course_version_reissued_after_eviction(self):
+        """ Unit Test: test_course_version_reissued_after_eviction """
+        course_id = str(self.test_course_key)
+        version = caching.get_course_versions([course_id])[course_id]
+        self.assertEqual(caching.get_course_versions([course_id])[course_id], version)
+        cache.clear()
+        self.assertNotEqual(caching.get_course_versions([course_id])[course_id], version)
+
+
+class UserMilestonesCacheTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestCaseBase):
+    """
+    Test Case module for the per-user collected milestones cache
+    """
+
+    def setUp(self):
+        """
+        User milestones cache Test Case scaffolding
+        """
+        super().setUp()
+        self.relationship_types = api.get_milestone_relationship_types()
+        self.milestone1 = api.add_milestone({
+            'name': 'milestone_1',
+            'display_name': 'Milestone 1',
+            'namespace': 'namespace_1',
+            'description': 'Milestone 1 Description',
+        })
+        self.milestone2 = api.add_milestone({
+            'name': 'milestone_2',
+            'display_name': 'Milestone 2',
+            'namespace': 'namespace_2',
+            'description': 'Milestone 2 Description',
+        })
+        api.add_user_milestone(self.serialized_test_user, self.milestone1)
+
+    def _warm_user_cache(self):
+        """ Loads the user's collected set, as the required-milestones paths do """
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.milestone2)
+        api.get_course_required_milestones(self.test_course_key, self.serialized_test_user)
+
+    def test_user_has_milestone_cached(self):
+        """ Unit Test: test_user_has_milestone_cached """
+        # Without a cached set, each check is an EXISTS probe
+        with self.assertNumQueries(2):
+            self.assertTrue(api.user_has_milestone(self.serialized_test_user, self.milestone1))
+            self.assertFalse(api.user_has_milestone(self.serialized_test_user, self.milestone2))
+        self._warm_user_cache()
+        with self.assertNumQueries(0):
+            self.assertTrue(api.user_has_milestone(self.serialized_test_user, self.milestone1))
+            self.assertFalse(api.user_has_milestone(self.serialized_test_user, self.milestone2))
+            self.assertFalse(api.user_has_milestone(
+                self.serialized_test_user, dict(self.milestone1, namespace='namespace_2')
+            ))
+
+    def test_string_ids_match_cached_set(self):
+        """ Unit Test: test_string_ids_match_cached_set """
+        milestone_data = {'id': str(self.milestone1['id'])}
+        for cached in (False, True):
+            if cached:
+                self._warm_user_cache()
+            with self.assertNumQueries(0 if cached else 2):
+                self.assertTrue(data.fetch_user_has_milestone(self.serialized_test_user, milestone_data))
+                milestones = data.fetch_user_milestones(self.serialized_test_user, milestone_data)
+                self.assertEqual([milestone['id'] for milestone in milestones], [self.milestone1['id']])
+
+    def test_get_user_milestones_filters_namespace(self):
+        """ Unit Test: test_get_user_milestones_filters_namespace """
+        api.add_user_milestone(self.serialized_test_user, self.milestone2)
+        with self.assertNumQueries(1):
+            milestones = api.get_user_milestones(self.serialized_test_user, 'namespace_2')
+        self.assertEqual([milestone['id'] for milestone in milestones], [self.milestone2['id']])
+        self._warm_user_cache()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(api.get_user_milestones(self.serialized_test_user, 'namespace_1')), 1)
+            self.assertEqual(len(api.get_user_milestones(self.serialized_test_user, 'namespace_3')), 0)
+
+    def test_cache_invalidated_by_user_milestone_writes(self):
+        """ Unit Test: test_cache_invalidated_by_user_milestone_writes """
+        self.assertFalse(api.user_has_milestone(self.serialized_test_user, self.milestone2))
+        api.add_user_milestone(self.serialized_test_user, self.milestone2)
+        self.assertTrue(api.user_has_milestone(self.serialized_test_user, self.milestone2))
+        api.remove_user_milestone(self.serialized_test_user, self.milestone2)
+        self.assertFalse(api.user_has_milestone(self.serialized_test_user, self.milestone2))
+
+    def test_racing_reader_entry_orphaned(self):
+        """ Unit Test: test_racing_reader_entry_orphaned """
+        # A reader which queried before a write, but caches its result after the write's
+        # invalidation, stores it under the version the write has bumped
+        # pylint: disable=protected-access
+        set_entry = caching.set_entry
+
+        def _set_entry(key, value):
+            api.add_user_milestone(self.serialized_test_user, self.milestone2)
+            set_entry(key, value)
+
+        with mock.patch('milestones.caching.set_entry', side_effect=_set_entry):
+            self.assertNotIn(self.milestone2['id'], data._fetch_cached_user_milestones(self.serialized_test_user))
+        self.assertIn(self.milestone2['id'], data._fetch_cached_user_milestones(self.serialized_test_user))
+
+    def test_cache_invalidated_by_milestone_removal(self):
+        """ Unit Test: test_cache_invalidated_by_milestone_removal """
+        self.assertTrue(api.user_has_milestone(self.serialized_test_user, self.milestone1))
+        api.remove_milestone(self.milestone1['id'])
+        self.assertFalse(api.user_has_milestone(self.serialized_test_user, self.milestone1))
+        api.add_milestone(self.milestone1)
+        self.assertTrue(api.user_has_milestone(self.serialized_test_user, self.milestone1))
+
+    def test_required_milestones_filtered_in_memory(self):
+        """ Unit Test: test_required_milestones_filtered_in_memory """
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.milestone1)
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.milestone2)
+        api.get_course_required_milestones(self.test_course_key, self.serialized_test_user)
+        with self.assertNumQueries(0):
+            required = api.get_course_required_milestones(self.test_course_key, self.serialized_test_user)
+        self.assertEqual([milestone['id'] for milestone in required], [self.milestone2['id']])
+
+
+class RequestCacheTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestCaseBase):
+    """
+    Test Case module for the request-scoped memoization of course content milestones
+    """
+
+    def setUp(self):
+        """
+        Request cache Test Case scaffolding
+        """
+        super().setUp()
+        self.relationship_types = api.get_milestone_relationship_types()
+        self.test_milestone = self.add_test_milestone()
+        for content_key in (self.test_content_key, self.test_alternate_content_key):
+            api.add_course_content_milestone(
+                self.test_course_key,
+                content_key,
+                self.relationship_types['REQUIRES'],
+                self.test_milestone,
+                {'min_score': 50}
+            )
+
+    def _get_content_milestones(self, content_key):
+        """ Helper which mimics a per-block MilestonesService lookup """
+        return api.get_course_content_milestones(
+            self.test_course_key,
+            content_key,
+            self.relationship_types['REQUIRES'],
+            {'id': self.test_user.id}
+        )
+
+    def test_lookups_served_from_one_fetch(self):
+        """ Unit Test: test_lookups_served_from_one_fetch """
+        with caching.request_cache():
+            with self.assertNumQueries(2):
+                first = self._get_content_milestones(self.test_content_key)
+                second = self._get_content_milestones(self.test_alternate_content_key)
+                missing = self._get_content_milestones(
+                    UsageKey.from_string('i4x://the/content/key/87654321')
+                )
+                everything = self._get_content_milestones(None)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(first[0]['content_id'], str(self.test_content_key))
+        self.assertEqual(first[0]['requirements'], {'min_score': 50})
+        self.assertEqual(len(second), 1)
+        self.assertEqual(missing, [])
+        self.assertEqual(len(everything), 2)
+
+    def test_keyed_lookups_share_memo(self):
+        """ Unit Test: test_keyed_lookups_share_memo """
+        content_keys = [self.test_content_key, UsageKey.from_string('i4x://the/content/key/87654321')]
+        with caching.request_cache():
+            with self.assertNumQueries(2):
+                milestones = api.get_course_content_milestones_by_content(
+                    self.test_course_key, content_keys, self.relationship_types['REQUIRES'], {'id': self.test_user.id}
+                )
+                single = self._get_content_milestones(self.test_alternate_content_key)
+        self.assertEqual(len(milestones[str(content_keys[0])]), 1)
+        self.assertEqual(milestones[str(content_keys[1])], [])
+        self.assertEqual(len(single), 1)
+
+    def test_lookups_not_memoized_outside_request(self):
+        """ Unit Test: test_lookups_not_memoized_outside_request """
+        self.assertIsNone(caching.get_request_cache())
+        with self.assertNumQueries(3):
+            self._get_content_milestones(self.test_content_key)
+            self._get_content_milestones(self.test_content_key)
+
+    def test_results_are_copies(self):
+        """ Unit Test: test_results_are_copies """
+        with caching.request_cache():
+            self._get_content_milestones(self.test_content_key)[0]['name'] = 'altered'
+            self.assertEqual(self._get_content_milestones(self.test_content_key)[0]['name'], 'test_milestone')
+
+    def test_memo_cleared_by_writes(self):
+        """ Unit Test: test_memo_cleared_by_writes """
+        with caching.request_cache():
+            self.assertEqual(len(self._get_content_milestones(self.test_content_key)), 1)
+            api.add_user_milestone({'id': self.test_user.id}, self.test_milestone)
+            self.assertEqual(len(self._get_content_milestones(self.test_content_key)), 0)
+            api.remove_user_milestone({'id': self.test_user.id}, self.test_milestone)
+            self.assertEqual(len(self._get_content_milestones(self.test_content_key)), 1)
+            api.remove_content_references(self.test_content_key)
+            self.assertEqual(len(self._get_content_milestones(self.test_content_key)), 0)
+
+    def test_nested_blocks_share_memo(self):
+        """ Unit Test: test_nested_blocks_share_memo """
+        with caching.request_cache():
+            memo = caching.get_request_cache()
+            with caching.request_cache():
+                self.assertIs(caching.get_request_cache(), memo)
+            self.assertIs(caching.get_request_cache(), memo)
+        self.assertIsNone(caching.get_request_cache())
+
+
+class CourseIndexTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestCaseBase):
+    """
+    Test Case module for the negative-lookup index of courses with milestone links
+    """
+
+    def setUp(self):
+        """
+        Course index Test Case scaffolding
+        """
+        super().setUp()
+        self.relationship_types = api.get_milestone_relationship_types()
+        self.test_milestone = self.add_test_milestone()
+
+    def test_courses_without_milestones_skip_lookups(self):
+        """ Unit Test: test_courses_without_milestones_skip_lookups """
+        api.get_course_milestones(self.test_course_key, self.relationship_types['REQUIRES'])
+        with self.assertNumQueries(0):
+            self.assertEqual(api.get_course_milestones(self.test_alternate_course_key), [])
+            self.assertEqual(
+                api.get_course_required_milestones(self.test_alternate_course_key, self.serialized_test_user),
+                []
+            )
+            self.assertEqual(api.get_course_content_milestones(self.test_alternate_course_key), [])
+        self.assertEqual(caching.get_course_index_stats(), {'hits': 4, 'misses': 0, 'updates': 0, 'rebuilds': 1})
+
+    def test_index_updated_after_course_milestone_write(self):
+        """ Unit Test: test_index_updated_after_course_milestone_write """
+        self.assertEqual(api.get_course_milestones(self.test_course_key), [])
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.test_milestone)
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 1)
+        self.assertEqual(caching.get_course_index_stats(), {'hits': 1, 'misses': 1, 'updates': 1, 'rebuilds': 1})
+
+        api.remove_course_milestone(self.test_course_key, self.test_milestone)
+        self.assertEqual(api.get_course_milestones(self.test_course_key), [])
+        self.assertEqual(caching.get_course_index_stats()['hits'], 2)
+
+    def test_index_update_reloads_changed_courses(self):
+        """ Unit Test: test_index_update_reloads_changed_courses """
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.test_milestone)
+        caching.filter_indexed_courses([])
+        api.add_course_milestone(
+            self.test_alternate_course_key, self.relationship_types['REQUIRES'], self.test_milestone
+        )
+        # Only the links of the course named in the links log are reloaded
+        with CaptureQueriesContext(connection) as queries:
+            courses = caching.filter_indexed_courses([str(self.test_course_key), str(self.test_alternate_course_key)])
+        self.assertEqual(len(courses), 2)
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertIn('course_id_hash', queries.captured_queries[0]['sql'])
+        self.assertEqual(caching.get_course_index_stats()['rebuilds'], 1)
+
+    def test_index_rebuilt_without_links_log(self):
+        """ Unit Test: test_index_rebuilt_without_links_log """
+        caching.filter_indexed_courses([])
+        # Once the log is evicted, the changed courses cannot be told
+        cache.clear()
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.test_milestone)
+        self.assertEqual(caching.filter_indexed_courses([str(self.test_course_key)]), [str(self.test_course_key)])
+        self.assertEqual(caching.get_course_index_stats()['rebuilds'], 2)
+
+    def test_index_rebuilt_after_content_milestone_write(self):
+        """ Unit Test: test_index_rebuilt_after_content_milestone_write """
+        self.assertEqual(api.get_course_content_milestones(self.test_course_key), [])
+        api.add_course_content_milestone(
+            self.test_course_key, self.test_content_key, self.relationship_types['REQUIRES'], self.test_milestone
+        )
+        self.assertEqual(len(api.get_course_content_milestones(self.test_course_key)), 1)
+        api.remove_content_references(self.test_content_key)
+        self.assertEqual(api.get_course_content_milestones(self.test_course_key), [])
+
+    def test_index_rebuilt_after_milestone_reactivation(self):
+        """ Unit Test: test_index_rebuilt_after_milestone_reactivation """
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.test_milestone)
+        api.remove_milestone(self.test_milestone['id'])
+        self.assertEqual(api.get_course_milestones(self.test_course_key), [])
+        api.add_milestone(self.test_milestone)
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 1)
+
+    def test_invalid_relationship_still_raises(self):
+        """ Unit Test: test_invalid_relationship_still_raises """
+        with self.assertRaises(exceptions.InvalidMilestoneRelationshipTypeException):
+            data.fetch_courses_milestones([self.test_alternate_course_key], 'invalid_relationship')
+        with self.assertRaises(exceptions.InvalidMilestoneRelationshipTypeException):
+            data.fetch_course_content_milestones(None, self.test_alternate_course_key, 'invalid_relationship')
@@ -1,4 +1,5 @@
 # pylint: disable=invalid-name
+# pylint: disable=no-member
 # pylint: disable=too-many-public-methods
 """
 Milestones Data Module Test Cases
@@ -6,8 +7,9 @@ Milestones Data Module Test Cases
 Note: 'Unit Test: ' labels are output to the console during test runs
 """
 
+import json
 
-from milestones import api, data, exceptions
+from milestones import api, caching, data, exceptions, models, serializers
 from milestones.tests import utils
 
 
@@ -169,3 +171,54 @@ class MilestonesDataTestCase(utils.MilestonesTestCaseBase):
             self.serialized_test_user,
             {'id': milestone1['id']}
         )
+
+    def test_row_serializers_match_model_serializers(self):
+        """ Unit Test: test_row_serializers_match_model_serializers """
+        self.add_test_milestone(
+            course_relationship=self.relationship_types['REQUIRES'],
+            content_relationship=self.relationship_types['REQUIRES'],
+            requirements={'min_score': 50},
+        )
+        for model, columns, serialize, serialize_row in (
+            (models.Milestone, serializers.MILESTONE_COLUMNS,
+             serializers.serialize_milestone, serializers.serialize_milestone_row),
+            (models.CourseMilestone, serializers.MILESTONE_WITH_COURSE_COLUMNS,
+             serializers.serialize_milestone_with_course, serializers.serialize_milestone_with_course_row),
+            (models.CourseContentMilestone, serializers.MILESTONE_WITH_COURSE_CONTENT_COLUMNS,
+             serializers.serialize_milestone_with_course_content,
+             serializers.serialize_milestone_with_course_content_row),
+        ):
+            self.assertEqual(
+                serialize_row(model.objects.values_list(*columns).get()),
+                serialize(model.objects.get())
+            )
+
+    def test_requirements_decoded_per_row(self):
+        """ Unit Test: test_requirements_decoded_per_row """
+        milestone = self.add_test_milestone()
+        # Payloads are no longer limited to 255 characters
+        requirements = {'min_score': 50, 'notes': 'x' * 500, 'parts': ['a']}
+        content_keys = [f'{self.test_content_key}_{index}' for index in range(3)]
+        for content_key in content_keys:
+            api.add_course_content_milestone(
+                self.test_course_key, content_key, self.relationship_types['REQUIRES'], milestone, requirements
+            )
+        api.add_course_content_milestone(
+            self.test_course_key, self.test_content_key, self.relationship_types['REQUIRES'], milestone
+        )
+
+        with caching.request_cache():
+            milestones = data.fetch_course_content_milestones(course_key=self.test_course_key)
+            by_content = {milestone['content_id']: milestone['requirements'] for milestone in milestones}
+            self.assertEqual(by_content[str(self.test_content_key)], {})
+            for content_key in content_keys:
+                self.assertIs(type(by_content[content_key]), dict)
+                self.assertEqual(by_content[content_key], requirements)
+            self.assertEqual(json.loads(json.dumps(by_content[content_keys[0]])), requirements)
+
+            # Rows sharing a payload, and later reads of the same row, do not share objects
+            by_content[content_keys[0]]['min_score'] = 80
+            by_content[content_keys[0]]['parts'].append('b')
+            self.assertEqual(by_content[content_keys[1]], requirements)
+            milestones = data.fetch_course_content_milestones(content_keys[0], self.test_course_key)
+            self.assertEqual(milestones[0]['requirements'], requirements)
@@ -0,0 +1,155 @@
+"""
+Prerequisite graph test cases
+
+Note: 'Unit Test: ' labels are output to the console during test runs
+"""
+
+from django.core.cache import cache
+
+from milestones import api, caching
+from milestones.graph import PrerequisiteGraph
+from milestones.tests import utils
+
+
+class PrerequisiteGraphTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestCaseBase):
+    """
+    Test Case module for the prerequisite graph (ref: graph.py)
+    """
+
+    def setUp(self):
+        """
+        Scaffolding: the/course/key requires a milestone fulfilled by the/prerequisite/key, which
+        in turn requires one fulfilled by content of the/alternate_course/key
+        """
+        super().setUp()
+        self.relationship_types = api.get_milestone_relationship_types()
+        self.milestones = [
+            api.add_milestone({
+                'name': f'milestone_{index}',
+                'display_name': f'Milestone {index}',
+                'namespace': 'graph',
+                'description': f'Milestone {index} Description',
+            })
+            for index in range(3)
+        ]
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.milestones[0])
+        api.add_course_milestone(
+            self.test_prerequisite_course_key, self.relationship_types['FULFILLS'], self.milestones[0]
+        )
+        api.add_course_milestone(
+            self.test_prerequisite_course_key, self.relationship_types['REQUIRES'], self.milestones[1]
+        )
+        api.add_course_content_milestone(
+            self.test_alternate_course_key,
+            self.test_alternate_content_key,
+            self.relationship_types['FULFILLS'],
+            self.milestones[1]
+        )
+
+    def test_get_course_prerequisites(self):
+        """ Unit Test: test_get_course_prerequisites """
+        # The graph is built in two queries, then answers from memory
+        with self.assertNumQueries(2):
+            prerequisites = api.get_course_prerequisites(self.test_course_key)
+        self.assertEqual(prerequisites, [str(self.test_prerequisite_course_key), str(self.test_alternate_course_key)])
+        with self.assertNumQueries(0):
+            prerequisites = api.get_course_prerequisites(self.test_prerequisite_course_key)
+        self.assertEqual(prerequisites, [str(self.test_alternate_course_key)])
+        self.assertEqual(api.get_course_prerequisites('the/unknown/course'), [])
+        self.assertEqual(caching.get_prerequisite_graph_stats(), {'builds': 1, 'updates': 0})
+
+    def test_get_user_unlocked_courses(self):
+        """ Unit Test: test_get_user_unlocked_courses """
+        user = {'id': self.test_user.id}
+        self.assertEqual(api.get_user_unlocked_courses(user), [])
+
+        # Completing the prerequisite course would go on to unlock the/course/key
+        api.add_user_milestone(user, self.milestones[1])
+        self.assertEqual(
+            api.get_user_unlocked_courses(user),
+            [str(self.test_prerequisite_course_key), str(self.test_course_key)]
+        )
+
+        # A course is only unlocked once all of its requirements are met
+        api.add_course_milestone(self.test_course_key, self.relationship_types['REQUIRES'], self.milestones[2])
+        self.assertEqual(api.get_user_unlocked_courses(user), [str(self.test_prerequisite_course_key)])
+
+    def test_graph_updates(self):
+        """ Unit Test: test_graph_updates """
+        api.get_course_prerequisites(self.test_course_key)
+
+        # Links written for a course only reload the links of that course
+        api.add_course_milestone(self.test_course_key, self.relationship_types['FULFILLS'], self.milestones[1])
+        with self.assertNumQueries(2):
+            prerequisites = api.get_course_prerequisites(self.test_prerequisite_course_key)
+        self.assertCountEqual(prerequisites, [str(self.test_alternate_course_key), str(self.test_course_key)])
+        api.remove_course_content_milestone(
+            self.test_alternate_course_key, self.test_alternate_content_key, self.milestones[1]
+        )
+        self.assertEqual(api.get_course_prerequisites(self.test_course_key), [str(self.test_prerequisite_course_key)])
+        self.assertEqual(caching.get_prerequisite_graph_stats(), {'builds': 1, 'updates': 2})
+
+        # Milestone-wide changes, and lost log entries, rebuild the graph
+        api.remove_milestone(self.milestones[0]['id'])
+        self.assertEqual(api.get_course_prerequisites(self.test_course_key), [])
+        cache.clear()
+        self.assertEqual(api.get_course_prerequisites(self.test_course_key), [])
+        self.assertEqual(caching.get_prerequisite_graph_stats(), {'builds': 3, 'updates': 2})
+
+    def test_links_log_gap(self):
+        """ Unit Test: test_links_log_gap """
+        api.get_course_prerequisites(self.test_course_key)
+        for milestone in self.milestones:
+            api.add_course_milestone(self.test_alternate_course_key, self.relationship_types['REQUIRES'], milestone)
+
+        # An entry lost from the middle of the log rebuilds the graph
+        # pylint: disable=protected-access
+        epoch = cache.get(caching._links_log_epoch_key())
+        head = cache.get(caching._links_log_head_key(epoch))
+        cache.delete(caching._links_log_key(epoch, head - 1))
+        # A course is not its own prerequisite, even when its content fulfills one of its requirements
+        self.assertEqual(
+            api.get_course_prerequisites(self.test_alternate_course_key), [str(self.test_prerequisite_course_key)]
+        )
+        self.assertEqual(caching.get_prerequisite_graph_stats(), {'builds': 2, 'updates': 0})
+
+    def test_cycles(self):
+        """ Unit Test: test_cycles """
+        prerequisite_graph = PrerequisiteGraph(
+            requires=[('a', 1), ('b', 2), ('c', 3)],
+            fulfills=[('b', 1), ('a', 2), ('c', 2)],
+        )
+        self.assertEqual(prerequisite_graph.prerequisites('a'), ['b', 'c'])
+        self.assertEqual(sorted(prerequisite_graph.prerequisites('b')), ['a', 'c'])
+        self.assertEqual(prerequisite_graph.unlocked([1]), ['a', 'b'])
+        self.assertEqual(prerequisite_graph.unlocked([3]), ['c', 'b', 'a'])
+
+        prerequisite_graph = prerequisite_graph.replace_courses(['c'], requires=[], fulfills=[('c', 1)])
+        self.assertEqual(sorted(prerequisite_graph.prerequisites('a')), ['b', 'c'])
+        self.assertEqual(prerequisite_graph.prerequisites('b'), ['a', 'c'])
+        self.assertEqual(prerequisite_graph.unlocked([3]), [])
+
+    def test_unlinked_nodes_dropped(self):
+        """ Unit Test: test_unlinked_nodes_dropped """
+        prerequisite_graph = PrerequisiteGraph(
+            requires=[('a', 1), ('b', 2)],
+            fulfills=[('b', 1), ('c', 2), ('c', 3)],
+        )
+        # Moving a link keeps the numbering of the milestones
+        updated = prerequisite_graph.replace_courses(['c'], requires=[], fulfills=[('c', 2), ('d', 3)])
+        self.assertCountEqual(updated.course_ids, ['a', 'b', 'c', 'd'])
+        self.assertEqual(list(updated.milestone_ids), [1, 2, 3])
+        self.assertEqual(updated.prerequisites('a'), ['b', 'c'])
+
+        # Courses and milestones left without links are dropped
+        updated = updated.replace_courses(['b', 'd'], requires=[], fulfills=[('b', 1)])
+        self.assertCountEqual(updated.course_ids, ['a', 'b', 'c'])
+        self.assertEqual(list(updated.milestone_ids), [1, 2])
+        self.assertEqual(updated.prerequisites('a'), ['b'])
+        self.assertEqual(updated.unlocked([1]), ['a'])
+        self.assertEqual(updated.prerequisites('d'), [])
+        updated = updated.replace_courses(['a', 'b', 'c'], requires=[], fulfills=[])
+        self.assertEqual((updated.course_ids, list(updated.milestone_ids)), ([], []))
+        # The original graph is left as it was
+        self.assertEqual(prerequisite_graph.prerequisites('a'), ['b', 'c'])
+        self.assertEqual(prerequisite_graph.course_ids, ['a', 'b', 'c'])
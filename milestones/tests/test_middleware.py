@@ -0,0 +1,32 @@
+"""
+Milestones Middleware Module Test Cases
+"""
+
+
+import unittest
+
+from milestones import caching
+from milestones.middleware import RequestCacheMiddleware
+
+
+class RequestCacheMiddlewareTestCase(unittest.TestCase):
+    """
+    Tests for RequestCacheMiddleware
+    """
+
+    def test_memo_scoped_to_request(self):
+        """
+        The request-scoped memo should be active while (and only while) the request is handled
+        """
+        memos = []
+
+        def get_response(request):  # pylint: disable=unused-argument
+            memos.append(caching.get_request_cache())
+            return 'response'
+
+        middleware = RequestCacheMiddleware(get_response)
+        self.assertEqual(middleware(object()), 'response')
+        self.assertEqual(middleware(object()), 'response')
+        self.assertEqual(memos, [{}, {}])
+        self.assertIsNot(memos[0], memos[1])
+        self.assertIsNone(caching.get_request_cache())
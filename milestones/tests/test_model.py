@@ -4,7 +4,7 @@ Models test cases
 """
 
 from django.test import TestCase
-from milestones.models import MilestoneRelationshipType, Milestone
+from milestones.models import CourseContentMilestone, CourseMilestone, MilestoneRelationshipType, Milestone, key_hash
 
 
 class MilestonesTestCaseMixin(TestCase):
@@ -21,3 +21,24 @@ class MilestonesTestCaseMixin(TestCase):
 
         self.assertEqual(str(milestone_relation_ship), 'milestone_relation_ship')
         self.assertEqual(str(milestone), 'milestone')
+
+    def test_key_hash_fields(self):
+        """
+        checking that key hashes are maintained on save and bulk_create
+        """
+        relationship_type, _ = MilestoneRelationshipType.objects.get_or_create(name='requires')
+        milestone = Milestone.objects.create(namespace='milestone', name='milestone')
+        course_milestone = CourseMilestone.objects.create(
+            course_id='the/course/key', milestone=milestone, milestone_relationship_type=relationship_type
+        )
+        CourseContentMilestone.objects.bulk_create([CourseContentMilestone(
+            course_id='the/course/key', content_id='i4x://the/content/key/1',
+            milestone=milestone, milestone_relationship_type=relationship_type
+        )])
+        course_content_milestone = CourseContentMilestone.objects.get()
+
+        self.assertEqual(key_hash('the/course/key'), key_hash('the/course/key'))
+        self.assertNotEqual(key_hash('the/course/key'), key_hash('the/course/key2'))
+        self.assertEqual(CourseMilestone.objects.get(pk=course_milestone.pk).course_id_hash, key_hash('the/course/key'))
+        self.assertEqual(course_content_milestone.course_id_hash, key_hash('the/course/key'))
+        self.assertEqual(course_content_milestone.content_id_hash, key_hash('i4x://the/content/key/1'))
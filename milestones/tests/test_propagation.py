@@ -0,0 +1,36 @@
+"""
+Milestones Propagation Runner Test Cases
+"""
+
+import unittest
+from unittest import mock
+
+from django.test import override_settings
+
+from milestones import propagation
+
+
+class PropagationRunnerTestCase(unittest.TestCase):
+    """
+    Tests for the thread pool which runs propagation jobs
+    """
+
+    def test_submit(self):
+        """
+        Jobs should run on a worker thread, which closes its connections when done
+        """
+        with mock.patch('milestones.propagation.propagate_milestone', return_value={'done': True}) as propagate:
+            with mock.patch('milestones.propagation.connections') as connections:
+                future = propagation.submit(12)
+                self.assertEqual(future.result(timeout=10), {'done': True})
+        propagate.assert_called_once_with(12)
+        connections.close_all.assert_called_once_with()
+
+    @override_settings(MILESTONES_PROPAGATION_WORKERS=0)
+    def test_submit_disabled(self):
+        """
+        Without workers, jobs are left to the management command
+        """
+        with mock.patch('milestones.propagation.propagate_milestone') as propagate:
+            self.assertIsNone(propagation.submit(12))
+        propagate.assert_not_called()
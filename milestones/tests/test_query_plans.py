@@ -0,0 +1,137 @@
+# pylint: disable=invalid-name
+"""
+Query plan test cases: the lookups made by the data layer should be served by an index
+"""
+
+import unittest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from milestones import api, caching, data, transfer
+from milestones.tests import utils
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is specific to SQLite')
+class QueryPlanTestCase(utils.MilestonesTestCaseMixin, utils.MilestonesTestCaseBase):
+    """
+    Runs each public fetch, then asserts that none of its queries scans a milestones table
+    """
+
+    def setUp(self):
+        """
+        Query plan Test Case scaffolding
+        """
+        super().setUp()
+        self.relationship_types = api.get_milestone_relationship_types()
+        self.milestone = self.add_test_milestone(
+            course_relationship=self.relationship_types['REQUIRES'],
+            content_relationship=self.relationship_types['REQUIRES'],
+        )
+        api.add_user_milestone({'id': self.test_user.id}, self.milestone)
+        self.user = {'id': self.test_user.id}
+
+    def assertUsesIndexes(self, fetch, ordered=False):
+        """
+        Runs the fetch with cold caches (but a warm course index, which is built with a scan
+        by design, then only updated) and asserts that the plan of each of its queries avoids full table scans
+        With 'ordered', also asserts that rows come in index order, rather than being sorted
+        """
+        caching.clear_relationship_types()
+        caching.get_relationship_type(self.relationship_types['REQUIRES'])
+        caching.filter_indexed_courses([])
+        caching.invalidate_all_users()
+        caching.invalidate_courses([self.test_course_key])
+        caching.filter_indexed_courses([])
+
+        with CaptureQueriesContext(connection) as queries:
+            fetch()
+        self.assertTrue(queries.captured_queries)
+        for query in queries.captured_queries:
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plan = [row[-1] for row in cursor.fetchall()]
+            # SEARCH steps seek into an index; SCAN steps read a whole table (or a whole index)
+            scans = [step for step in plan if step.startswith('SCAN milestones_')]
+            self.assertEqual(scans, [], f"{query['sql']}\n{plan}")
+            if ordered:
+                self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan, f"{query['sql']}\n{plan}")
+
+    def test_fetch_courses_milestones(self):
+        """ Unit Test: test_fetch_courses_milestones """
+        self.assertUsesIndexes(lambda: data.fetch_courses_milestones(
+            [self.test_course_key], self.relationship_types['REQUIRES'], self.user
+        ))
+
+    def test_fetch_course_content_milestones(self):
+        """ Unit Test: test_fetch_course_content_milestones """
+        self.assertUsesIndexes(lambda: data.fetch_course_content_milestones(
+            self.test_content_key, self.test_course_key, self.relationship_types['REQUIRES'], self.user
+        ))
+        self.assertUsesIndexes(lambda: data.fetch_course_content_milestones_by_content(
+            self.test_course_key, [self.test_content_key], self.relationship_types['REQUIRES']
+        ))
+
+    def test_fetch_milestone_links(self):
+        """ Unit Test: test_fetch_milestone_links """
+        self.assertUsesIndexes(lambda: data.fetch_milestones_courses([self.milestone]))
+        self.assertUsesIndexes(lambda: data.fetch_milestones_course_content([self.milestone]))
+        self.assertUsesIndexes(lambda: list(data.iter_milestone_courses(self.milestone)))
+        self.assertUsesIndexes(lambda: list(data.iter_milestone_course_content(self.milestone)))
+        self.assertUsesIndexes(lambda: list(data.iter_course_content_milestones(course_key=self.test_course_key)))
+
+    def test_fetch_pages(self):
+        """ Unit Test: test_fetch_pages """
+        # Pages seek straight to the rows after the cursor, in primary key order
+        for after_pk in (None, 1):
+            self.assertUsesIndexes(lambda after_pk=after_pk: data.fetch_milestones_page(
+                self.milestone['namespace'], after_pk=after_pk
+            ), ordered=True)
+            self.assertUsesIndexes(lambda after_pk=after_pk: data.fetch_course_content_milestones_page(
+                content_key=self.test_content_key, after_pk=after_pk
+            ), ordered=True)
+            self.assertUsesIndexes(lambda after_pk=after_pk: data.fetch_course_content_milestones_page(
+                course_key=self.test_course_key, relationship=self.relationship_types['REQUIRES'],
+                user=self.user, after_pk=after_pk
+            ), ordered=True)
+            self.assertUsesIndexes(lambda after_pk=after_pk: data.fetch_milestone_courses_page(
+                self.milestone, self.relationship_types['FULFILLS'], after_pk=after_pk
+            ), ordered=True)
+            self.assertUsesIndexes(lambda after_pk=after_pk: data.fetch_milestone_course_content_page(
+                self.milestone, self.relationship_types['FULFILLS'], after_pk=after_pk
+            ), ordered=True)
+
+    def test_fetch_user_milestones(self):
+        """ Unit Test: test_fetch_user_milestones """
+        self.assertUsesIndexes(lambda: data.fetch_user_milestones(
+            self.user, {'namespace': self.milestone['namespace']}
+        ))
+        self.assertUsesIndexes(lambda: data.fetch_users_milestone_ids([self.test_user.id], [self.milestone['id']]))
+
+    def test_fetch_milestones(self):
+        """ Unit Test: test_fetch_milestones """
+        self.assertUsesIndexes(lambda: data.fetch_milestones({'namespace': self.milestone['namespace']}))
+
+    def test_delete_references(self):
+        """ Unit Test: test_delete_references """
+        self.assertUsesIndexes(lambda: data.delete_content_references(self.test_content_key))
+        self.assertUsesIndexes(lambda: data.delete_course_references(self.test_course_key))
+        self.assertUsesIndexes(lambda: data.delete_milestone(self.milestone))
+
+    def test_course_index_update(self):
+        """ Unit Test: test_course_index_update """
+        def _update():
+            caching.invalidate_courses([self.test_course_key])
+            caching.filter_indexed_courses([])
+        self.assertUsesIndexes(_update)
+
+    def test_relationship_filters_without_joins(self):
+        """ Unit Test: test_relationship_filters_without_joins """
+        # Relationship types are resolved by the process-local registry, then filtered by id
+        caching.get_relationship_type(self.relationship_types['REQUIRES'])
+        with CaptureQueriesContext(connection) as queries:
+            data.fetch_milestones_courses([self.milestone], self.relationship_types['REQUIRES'])
+            data.fetch_milestones_course_content([self.milestone], self.relationship_types['REQUIRES'])
+            list(transfer.fetch_milestone_records())
+        for query in queries.captured_queries:
+            self.assertNotIn('JOIN "milestones_milestonerelationshiptype"', query['sql'])
@@ -4,8 +4,10 @@ Utility module for Milestones test cases
 """
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
 from opaque_keys.edx.keys import CourseKey, UsageKey
+from milestones import api, caching
 from milestones.models import MilestoneRelationshipType
 
 
@@ -19,6 +21,10 @@ class MilestonesTestCaseBase(TestCase):
         Helper method for test case scaffolding
         """
         super().setUp()
+        caching.clear_relationship_types()
+        caching.clear_course_index()
+        caching.clear_prerequisite_graph()
+        cache.clear()
         self.test_course_key = CourseKey.from_string('the/course/key')
         self.test_alternate_course_key = CourseKey.from_string('the/alternate_course/key')
         self.test_prerequisite_course_key = CourseKey.from_string('the/prerequisite/key')
@@ -33,6 +39,26 @@ class MilestonesTestCaseBase(TestCase):
         )
         self.serialized_test_user = self.test_user.__dict__
 
+    def add_test_milestone(self, course_relationship=None, content_relationship=None, requirements=None):
+        """
+        Helper method which adds the test milestone, in the namespace of the test course, and
+        optionally links it to the test course and to the test content with the specified
+        relationship types (e.g. 'requires')
+        """
+        milestone = api.add_milestone({
+            'name': 'test_milestone',
+            'display_name': 'Test Milestone',
+            'namespace': str(self.test_course_key),
+            'description': 'Test Milestone Description',
+        })
+        if course_relationship is not None:
+            api.add_course_milestone(self.test_course_key, course_relationship, milestone)
+        if content_relationship is not None:
+            api.add_course_content_milestone(
+                self.test_course_key, self.test_content_key, content_relationship, milestone, requirements
+            )
+        return milestone
+
 
 class MilestonesTestCaseMixin(TestCase):
     """
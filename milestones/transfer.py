@@ -0,0 +1,177 @@
+# pylint: disable=no-member
+"""
+Data layer for the export and import of the milestone graph (ref: the export_milestones
+and import_milestones management commands): every Milestone, CourseMilestone,
+CourseContentMilestone and UserMilestone row, as a stream of plain dict records.
+
+Links refer to their milestone by its natural key (namespace, name) rather than by id,
+so that records can be imported into another datastore.
+"""
+import json
+
+from django.utils import dateparse
+
+from . import caching
+from . import exceptions
+from . import models as internal
+from . import queries
+
+
+# Fields of the records exchanged by fetch_milestone_records/create_milestone_records, by model
+# Links refer to their milestone by its natural key, and to their relationship type by name
+RECORD_FIELDS = {
+    'Milestone': ('namespace', 'name', 'display_name', 'description', 'active'),
+    'CourseMilestone': ('course_id', 'milestone', 'relationship', 'active'),
+    'CourseContentMilestone': ('course_id', 'content_id', 'milestone', 'relationship', 'requirements', 'active'),
+    'UserMilestone': ('user_id', 'milestone', 'source', 'collected', 'active'),
+}
+
+# Unique (upsert) keys of each model, and the fields overwritten when a row already exists
+_RECORD_UPSERTS = {
+    'Milestone': (('namespace', 'name'), ('display_name', 'description', 'active', 'modified')),
+    'CourseMilestone': (
+        ('course_id', 'milestone'),
+        ('milestone_relationship_type', 'active', 'modified', 'course_id_hash')
+    ),
+    'CourseContentMilestone': (
+        ('course_id', 'content_id', 'milestone'),
+        ('milestone_relationship_type', 'requirements', 'active', 'modified', 'course_id_hash', 'content_id_hash')
+    ),
+    'UserMilestone': (('user_id', 'milestone'), ('source', 'collected', 'active', 'modified')),
+}
+
+
+def fetch_milestone_records(batch_size=None):
+    """
+    Streams every Milestone, CourseMilestone, CourseContentMilestone and UserMilestone row
+    (active or not) as a plain dict with a 'model' key and the fields listed in RECORD_FIELDS
+
+    Each table is read in keyset pages of 'batch_size' rows (ref: queries.iter_rows), so memory use
+    does not grow with the number of rows, whatever the database.  Milestones come first, so
+    records can be imported in order; a link to a milestone created while the export runs is
+    preceded by a record of that milestone.
+    """
+    milestone_columns = ('id',) + RECORD_FIELDS['Milestone']
+    # Links are read without joins: milestones and relationship types are few, and mapped in memory
+    milestone_keys = {}
+
+    def _serialize_milestone(row):
+        record = dict(zip(milestone_columns, row), model='Milestone')
+        milestone_keys[record.pop('id')] = [record['namespace'], record['name']]
+        return record
+
+    yield from queries.iter_rows(internal.Milestone.objects.all(), milestone_columns, _serialize_milestone, batch_size)
+    relationship_names = dict(internal.MilestoneRelationshipType.objects.values_list('id', 'name'))
+
+    for model in (internal.CourseMilestone, internal.CourseContentMilestone, internal.UserMilestone):
+        fields = tuple(field for field in RECORD_FIELDS[model.__name__] if field not in ('milestone', 'relationship'))
+        with_relationship = 'relationship' in RECORD_FIELDS[model.__name__]
+        id_fields = ('milestone_id', 'milestone_relationship_type_id') if with_relationship else ('milestone_id',)
+        for row in queries.iter_rows(model.objects.all(), fields + id_fields, lambda row: row, batch_size):
+            record = dict(zip(fields, row), model=model.__name__)
+            milestone_id = row[len(fields)]
+            if milestone_id not in milestone_keys:
+                yield from queries.iter_rows(
+                    internal.Milestone.objects.filter(id=milestone_id), milestone_columns, _serialize_milestone
+                )
+                if milestone_id not in milestone_keys:
+                    # Deleted along with its links since the link was read
+                    continue
+            record['milestone'] = milestone_keys[milestone_id]
+            if with_relationship:
+                record['relationship'] = relationship_names[row[-1]]
+            yield record
+
+
+def _upsert_records(model, objects):
+    """
+    Inserts the specified (unsaved) model objects, overwriting the rows which already exist
+    """
+    unique_fields, update_fields = _RECORD_UPSERTS[model.__name__]
+    # A batch may not touch the same row twice (ex. PostgreSQL's ON CONFLICT); the last record wins
+    objects = list({
+        tuple(getattr(obj, field if field != 'milestone' else 'milestone_id') for field in unique_fields): obj
+        for obj in objects
+    }.values())
+    model.objects.bulk_create(
+        objects,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=update_fields,
+    )
+    return len(objects)
+
+
+def create_milestone_records(records, batch_size=None):
+    """
+    Imports records as streamed by fetch_milestone_records, with one bulk upsert per batch
+    of 'batch_size' records of a model (ref: queries.get_batch_size), so memory use is bounded by
+    the batch size and the number of milestones and courses, not by the number of records
+    Raises InvalidMilestoneException for links to a milestone which is not in the datastore
+    (nor earlier in the records), and InvalidMilestoneRelationshipTypeException for links of
+    an unknown relationship type
+    Returns a dict of model name -> number of records written
+    """
+    batch_size = batch_size or queries.get_batch_size()
+    counts = {model_name: 0 for model_name in RECORD_FIELDS}
+    batches = {model_name: [] for model_name in RECORD_FIELDS}
+    milestone_ids = {}
+    course_ids = set()
+
+    def _flush(model_name):
+        if batches[model_name]:
+            counts[model_name] += _upsert_records(getattr(internal, model_name), batches[model_name])
+            batches[model_name] = []
+
+    def _get_milestone_id(natural_key):
+        nonlocal milestone_ids
+        natural_key = tuple(natural_key)
+        if natural_key not in milestone_ids:
+            # Milestones must be written before the links which refer to them
+            _flush('Milestone')
+            milestone_ids = {
+                (namespace, name): milestone_id
+                for namespace, name, milestone_id
+                in internal.Milestone.objects.values_list('namespace', 'name', 'id').iterator(chunk_size=batch_size)
+            }
+        if natural_key not in milestone_ids:
+            exceptions.raise_exception(
+                "Milestone",
+                {'namespace': natural_key[0], 'name': natural_key[1]},
+                exceptions.InvalidMilestoneException
+            )
+        return milestone_ids[natural_key]
+
+    # Batches are committed as they are flushed, so the caches are invalidated even when a later
+    # record is rejected
+    try:
+        for record in records:
+            model_name = record['model']
+            fields = {field: record.get(field) for field in RECORD_FIELDS[model_name]}
+            if model_name != 'Milestone':
+                fields['milestone_id'] = _get_milestone_id(fields.pop('milestone'))
+            if 'relationship' in fields:
+                fields['milestone_relationship_type'] = queries.get_milestone_relationship_type(
+                    fields.pop('relationship')
+                )
+            if isinstance(fields.get('collected'), str):
+                fields['collected'] = dateparse.parse_datetime(fields['collected'])
+            if isinstance(fields.get('requirements'), str):
+                # Exports taken before requirements were stored as JSON carry them as JSON text
+                try:
+                    fields['requirements'] = json.loads(fields['requirements'])
+                except ValueError:
+                    pass
+            if 'course_id' in fields:
+                course_ids.add(fields['course_id'])
+            batches[model_name].append(getattr(internal, model_name)(**fields))
+            if len(batches[model_name]) >= batch_size:
+                _flush(model_name)
+
+        for model_name in RECORD_FIELDS:
+            _flush(model_name)
+    finally:
+        caching.invalidate_courses(course_ids)
+        caching.invalidate_course_index()
+        caching.invalidate_all_users()
+    return counts
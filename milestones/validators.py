@@ -3,6 +3,7 @@ Validators confirm the integrity of inbound information prior to a data.py hando
 """
 
 
+import functools
 import json
 
 from opaque_keys import InvalidKeyError
@@ -11,19 +12,33 @@ from opaque_keys.edx.keys import CourseKey, UsageKey
 from .data import fetch_milestone_relationship_types
 
 
-def course_key_is_valid(course_key):
+# Number of course key strings whose validity is remembered (ref: course_key_is_valid)
+COURSE_KEY_CACHE_SIZE = 16384
+
+
+@functools.lru_cache(maxsize=COURSE_KEY_CACHE_SIZE)
+def _course_key_string_is_valid(course_key):
     """
-    Course key object validation
+    Course key string validation, memoized since parsing dominates the validation of long key lists
     """
-    if course_key is None:
-        return False
     try:
-        CourseKey.from_string(str(course_key))
+        CourseKey.from_string(course_key)
     except InvalidKeyError:
         return False
     return True
 
 
+def course_key_is_valid(course_key):
+    """
+    Course key object validation
+    """
+    if course_key is None:
+        return False
+    if isinstance(course_key, CourseKey):
+        return True
+    return _course_key_string_is_valid(str(course_key))
+
+
 def content_key_is_valid(content_key):
     """
     Course module/content/usage key object validation
@@ -85,3 +100,31 @@ def user_is_valid(user):
     if not user.get('id', 0):
         return False
     return True
+
+
+def _id_is_valid(record_id):
+    """
+    Record id validation: positive ints, or strings of them (as some callers pass)
+    """
+    try:
+        return int(record_id) > 0
+    except (TypeError, ValueError):
+        return False
+
+
+def user_ids_are_valid(user_ids):
+    """
+    User id batch validation (every id must be a positive int, or a string of one)
+    """
+    if user_ids is None:
+        return False
+    return all(_id_is_valid(user_id) for user_id in user_ids)
+
+
+def milestone_ids_are_valid(milestone_ids):
+    """
+    Milestone id batch validation (every id must be a positive int, or a string of one)
+    """
+    if milestone_ids is None:
+        return False
+    return all(_id_is_valid(milestone_id) for milestone_id in milestone_ids)